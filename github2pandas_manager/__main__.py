@@ -1,37 +1,80 @@
 import argparse
 from pathlib import Path
-import os
 
 from github2pandas_manager.config_parser import YAML_RequestDefinition
 from github2pandas_manager.repository_handler import RequestHandlerFactory
 from github2pandas_manager.data_extractor import Github_data_extractor
 from github2pandas_manager.data_merger import Github_data_merger
+from github2pandas_manager.merge_pipeline import MergePipeline
 from github2pandas_manager import utilities
+from github2pandas_manager import connection_pool
+from github2pandas_manager.http_cache import ConditionalRequestCache
+from github2pandas_manager.rate_limit import TokenPool
 
-def main(request_params, github_token):
+def main(request_params, github_token, resume=False):
     project_folder = Path(request_params.parameters.project_folder)
     project_folder.mkdir(parents=True, exist_ok=True)
 
     project_folder = Path(request_params.parameters.project_folder)
     project_folder.mkdir(parents=True, exist_ok=True)
 
+    cache = None
+    if utilities.get_parameter(request_params.parameters, "http_cache", False):
+        cache_size = utilities.get_parameter(request_params.parameters,
+                                             "http_cache_size_mb", 512)
+        cache = ConditionalRequestCache(project_folder, cache_size)
+        connection_pool.install(cache)
+    try:
+        run(request_params, github_token, resume)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def run(request_params, github_token, resume=False):
     request_handler = \
         RequestHandlerFactory.get_request_handler(
                 github_token=github_token,
                 request_params=request_params
             )
 
-    print(f"{len(request_handler.repository_list)} machting repositories found.")
+    if request_handler.stream_discovery:
+        print("Repositories are extracted while they are discovered.")
+    else:
+        print(f"{len(request_handler.repository_list)} machting repositories found.")
+
+    if request_handler.stream_discovery or \
+            len(request_handler.repository_list) > 0:
+        pipeline = None
+        on_repo_finished = None
+        if utilities.get_parameter(request_handler.request.parameters,
+                                   "pipeline", False):
+            if utilities.get_parameter(request_handler.request.parameters,
+                                       "streaming_merge", False):
+                # Repositories are merged while the extraction is running
+                pipeline = MergePipeline(request_handler)
+                pipeline.start()
+                on_repo_finished = pipeline.repo_finished
+            else:
+                print("The pipeline requires streaming_merge, the tables "
+                      "are merged after the extraction.")
 
-    if len(request_handler.repository_list) > 0:
         data_extractor = Github_data_extractor.start(
                 github_token=github_token,
-                request_handler=request_handler
+                request_handler=request_handler,
+                resume=resume,
+                on_repo_finished=on_repo_finished
         )
+        if request_handler.stream_discovery:
+            print(f"{len(request_handler.repository_list)} machting "
+                  "repositories found.")
         
-        df = Github_data_merger.merge(
-            request_handler=request_handler
-        )
+        if pipeline is not None:
+            df = pipeline.finish()
+        else:
+            df = Github_data_merger.merge(
+                request_handler=request_handler
+            )
 
 
 if __name__ == "__main__":
@@ -40,20 +83,30 @@ if __name__ == "__main__":
                         type=utilities.check_file_path,
                         required=True,
                         help='paste path to .yml config file')
+    parser.add_argument('--resume', dest='resume',
+                        action='store_true',
+                        help='skip tasks finished by a previous run and '
+                             'retry failed ones')
 
     arguments = parser.parse_args()
     request_params = YAML_RequestDefinition(arguments.config_file)
 
     print(request_params)
 
-    if os.getenv("TOKEN") is None:
+    github_tokens = utilities.get_github_tokens(request_params.parameters)
+
+    if len(github_tokens) == 0:
         print("Unauthenticated user: To get a higher request and search\n"
               "rate, be authenticated by getting a token from GitHub.\n"
               "https://docs.github.com/en/authentication/"+
               "keeping-your-account-and-data-secure/"+
               "creating-a-personal-access-token)")
     else:
-        github_token = os.getenv("TOKEN")
-        main(request_params=request_params, github_token=github_token)
+        token_reserve = utilities.get_parameter(request_params.parameters,
+                                                "token_reserve", 0.02)
+        github_token = TokenPool(github_tokens, reserve=token_reserve)
+        print(f"{len(github_tokens)} GitHub token(s) available.")
+        main(request_params=request_params, github_token=github_token,
+             resume=arguments.resume)
     
     print("Aus Maus")
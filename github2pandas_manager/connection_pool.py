@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import multiprocessing.util
+import threading
+import time
+
+import requests
+from github.Requester import Requester, RequestsResponse
+
+from github2pandas_manager import rate_limit
+
+
+def _no_auth(request):
+    # Prevents requests from replacing the token by .netrc credentials
+    return request
+
+
+class SharedSessionConnection():
+    """HTTPS connection class for PyGithub based on shared sessions.
+
+    PyGithub creates one connection, and thereby one requests session, per
+    client. The manager and github2pandas create many clients, so TCP and
+    TLS connections were set up again and again. Connections of this class
+    use one process-wide session per protocol and retry policy, which keeps
+    connections alive across all clients and threads. The rate limit
+    headers of all responses are passed to the rate limit governor and the
+    requests of every thread are counted. The Date headers keep the offset
+    between the local clock and the GitHub servers. If a conditional
+    request cache is installed, GET requests are revalidated against the
+    cached responses.
+
+    Methods
+    -------
+    request(verb, url, input, headers, stream):
+        Stores the request of the current thread, mimics the httplib
+        connection interface.
+    getresponse():
+        Sends the stored request with the shared session.
+    close():
+        Keeps the shared session open.
+
+    """
+
+    PROTOCOL = "https"
+    DEFAULT_PORT = 443
+    # Connections kept alive per host, large enough for all worker threads
+    POOL_SIZE = 32
+
+    sessions = {}
+    lock = threading.Lock()
+    thread_data = threading.local()
+    cache = None
+    # Seconds to add to the local clock to get the server time
+    clock_offset = 0.0
+
+    def __init__(self, host, port=None, strict=False, timeout=None,
+                 retry=None, pool_size=None, **kwargs):
+        self.host = host
+        self.port = port if port else self.DEFAULT_PORT
+        self.protocol = self.PROTOCOL
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        # Older PyGithub versions may hand one connection object to several
+        # threads, so the pending request is stored per thread
+        self.pending = threading.local()
+        self.session = SharedSessionConnection.get_session(self.protocol,
+                                                           retry, pool_size)
+
+    @staticmethod
+    def get_session(protocol, retry=None, pool_size=None):
+        """Returns the process-wide session of a protocol and retry
+        policy. Clients with equal policies share a session."""
+        if retry is None:
+            retry = requests.adapters.DEFAULT_RETRIES
+        key = (protocol, get_retry_key(retry))
+        with SharedSessionConnection.lock:
+            if key not in SharedSessionConnection.sessions:
+                session = requests.Session()
+                session.auth = _no_auth
+                session.hooks["response"].append(note_server_time)
+                pool_size = max(pool_size or 0,
+                                SharedSessionConnection.POOL_SIZE)
+                adapter = requests.adapters.HTTPAdapter(
+                    max_retries=retry,
+                    pool_connections=pool_size,
+                    pool_maxsize=pool_size,
+                )
+                session.mount(protocol + "://", adapter)
+                SharedSessionConnection.sessions[key] = session
+            return SharedSessionConnection.sessions[key]
+
+    def request(self, verb, url, input, headers, stream=False):
+        self.pending.verb = verb
+        self.pending.url = url
+        self.pending.input = input
+        self.pending.headers = headers
+        self.pending.stream = stream
+
+    def getresponse(self):
+        pending = self.pending
+        url = f"{self.protocol}://{self.host}:{self.port}{pending.url}"
+        headers = dict(pending.headers)
+        cache = SharedSessionConnection.cache
+        cache_entry = None
+        if cache is not None and pending.verb == "GET" and not pending.stream:
+            cache_key = cache.get_key(url, headers)
+            cache_entry = cache.get(cache_key)
+            if cache_entry is not None:
+                headers.update(cache.get_conditional_headers(cache_entry))
+        response = self.session.request(
+            pending.verb,
+            url,
+            headers=headers,
+            data=pending.input,
+            timeout=self.timeout,
+            verify=self.verify,
+            allow_redirects=False,
+            stream=pending.stream,
+        )
+        not_modified = (cache_entry is not None
+                        and response.status_code == 304)
+        github_token = get_token_from_headers(headers)
+        if github_token is not None:
+            rate_limit.GOVERNOR.update_from_headers(
+                github_token, response.headers, spent=int(not not_modified))
+        if not_modified:
+            # Not modified, answers do not count against the rate limit
+            return RequestsResponse(
+                get_cached_response(url, cache_entry, response.headers))
+        SharedSessionConnection.count_request()
+        if (cache is not None and pending.verb == "GET"
+                and not pending.stream and response.status_code == 200):
+            cache.store(cache_key, url, response.headers, response.content)
+        return RequestsResponse(response)
+
+    def close(self):
+        # The session is shared by all connections of the process
+        pass
+
+    @staticmethod
+    def count_request():
+        data = SharedSessionConnection.thread_data
+        data.request_count = getattr(data, "request_count", 0) + 1
+
+
+class SharedSessionHTTPConnection(SharedSessionConnection):
+    """HTTP variant of SharedSessionConnection."""
+
+    PROTOCOL = "http"
+    DEFAULT_PORT = 80
+
+
+def get_retry_key(retry):
+    """Returns a hashable description of a retry count or urllib3 Retry."""
+    if isinstance(retry, int):
+        return retry
+    return (type(retry),) + tuple(
+        (name, repr(sorted(value) if isinstance(value, (set, frozenset))
+                    else value))
+        for name, value in sorted(vars(retry).items()))
+
+
+def get_token_from_headers(headers):
+    """Returns the token of a token or bearer Authorization header."""
+    authorization = headers.get("Authorization", "")
+    for prefix in ("token ", "Bearer "):
+        if authorization.startswith(prefix):
+            return authorization[len(prefix):]
+    return None
+
+
+def note_server_time(response, *args, **kwargs):
+    """Response hook updating the clock offset from the Date header."""
+    try:
+        server_time = parsedate_to_datetime(response.headers["Date"])
+    except (KeyError, TypeError, ValueError):
+        return
+    SharedSessionConnection.clock_offset = \
+        server_time.timestamp() - time.time()
+
+
+def get_server_now():
+    """Returns the local time of the GitHub servers, going by the Date
+    header of the last response of the process."""
+    return datetime.now() + timedelta(
+        seconds=SharedSessionConnection.clock_offset)
+
+
+def get_cached_response(url, cache_entry, headers):
+    """Builds a response from a cached body and the fresh headers."""
+    response = requests.models.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = requests.structures.CaseInsensitiveDict(
+        cache_entry["headers"])
+    response.headers.update(headers)
+    response.encoding = "utf-8"
+    response._content = cache_entry["body"]
+    return response
+
+
+def get_request_count():
+    """Returns the number of requests sent by the current thread."""
+    return getattr(SharedSessionConnection.thread_data, "request_count", 0)
+
+
+def install(cache=None):
+    """Lets all PyGithub clients of the process use the shared sessions.
+
+    A ConditionalRequestCache passed once stays installed for the process
+    and is closed when the process exits.
+    """
+    if cache is not None and cache is not SharedSessionConnection.cache:
+        SharedSessionConnection.cache = cache
+        # Unlike atexit handlers, finalizers with an exit priority are also
+        # run by worker processes of a ProcessPoolExecutor
+        multiprocessing.util.Finalize(cache, cache.close, exitpriority=10)
+    Requester.injectConnectionClasses(SharedSessionHTTPConnection,
+                                      SharedSessionConnection)
+
+
+def get_cache():
+    """Returns the installed conditional request cache or None."""
+    return SharedSessionConnection.cache
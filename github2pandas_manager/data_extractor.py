@@ -1,7 +1,11 @@
 from pathlib import Path
-import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, \
+    wait, FIRST_COMPLETED
+import json
+import os
+import sys
+import threading
 import pandas as pd
-import numpy as np
 import logging
 
 from github2pandas.github2pandas import GitHub2Pandas
@@ -14,6 +18,82 @@ from github2pandas.git_releases import GitReleases
 from github2pandas.core import Core
 
 from github2pandas_manager import utilities
+from github2pandas_manager import connection_pool
+from github2pandas_manager.rate_limit import TokenPool
+from github2pandas_manager.graphql_client import GraphQLClient
+from github2pandas_manager.graphql_extractor import GraphQLExtractor
+from github2pandas_manager.task_ledger import TaskLedger
+from github2pandas_manager.incremental import Incremental_updater, \
+    UpdatedSinceRepository
+
+
+class RepositoryTasks():
+    """Open extraction tasks of every repository.
+
+    Reports each repository, whose tasks are all done, to a callback,
+    e.g. the merge pipeline. Repositories without pending tasks are
+    reported as soon as they are scheduled.
+    """
+
+    def __init__(self, on_repo_finished=None):
+        self.on_repo_finished = on_repo_finished
+        self.open_tasks = {}
+        self.lock = threading.Lock()
+
+    def add(self, repo_full_name, number_of_tasks):
+        if number_of_tasks == 0:
+            self._finished(repo_full_name)
+            return
+        with self.lock:
+            self.open_tasks[repo_full_name] = \
+                self.open_tasks.get(repo_full_name, 0) + number_of_tasks
+
+    def done(self, repo_full_name):
+        with self.lock:
+            self.open_tasks[repo_full_name] -= 1
+            finished = self.open_tasks[repo_full_name] == 0
+            if finished:
+                del self.open_tasks[repo_full_name]
+        if finished:
+            self._finished(repo_full_name)
+
+    def _finished(self, repo_full_name):
+        if self.on_repo_finished is not None:
+            self.on_repo_finished(repo_full_name)
+
+
+class RepositorySerializer():
+    """Holds back the tasks of repositories which have a running task.
+
+    Every content type of github2pandas rewrites the Users.p of its
+    repository by read-modify-write, so two tasks of the same repository
+    must not run at the same time, neither in threads nor in processes.
+    Only the thread submitting the tasks uses this class.
+    """
+
+    def __init__(self):
+        self.running = set()
+        self.waiting = {}
+
+    def add(self, task):
+        """Returns True if the task can be submitted now, otherwise it is
+        held back until the running task of its repository is done."""
+        repo_full_name = task[0]
+        if repo_full_name in self.running:
+            self.waiting.setdefault(repo_full_name, []).append(task)
+            return False
+        self.running.add(repo_full_name)
+        return True
+
+    def done(self, repo_full_name):
+        """Returns the next held back task of the repository or None."""
+        waiting = self.waiting.get(repo_full_name)
+        if not waiting:
+            self.waiting.pop(repo_full_name, None)
+            self.running.discard(repo_full_name)
+            return None
+        return waiting.pop(0)
+
 
 class Github_data_extractor():
 
@@ -53,54 +133,427 @@ class Github_data_extractor():
     
     AGG_HISTORY_FILE = "aggregation_history.csv"
 
+    # Content types which are processed in separate processes, all other
+    # content types are API-bound and run in threads
+    PROCESS_CONTENT = ["Version"]
+
+    # Task scheduling modes, SCHEDULE_REPOSITORY processes all content
+    # types of a repository with one client and one repository object
+    SCHEDULE_REPOSITORY = "repository"
+    SCHEDULE_CONTENT = "content"
+
+    # Requests reserved for a content type of a repository which was not
+    # extracted before, later tasks reserve the cost recorded in the ledger
+    DEFAULT_REQUEST_COST = 20
+
+    @staticmethod
+    def extract_content(repo_, github2pandas, repo_base_folder,
+                        content_element, since=None, graphql_extractor=None):
+        if graphql_extractor is not None:
+            if since is None:
+                graphql_extractor.extract(content_element)
+            else:
+                old_tables = Incremental_updater.load_tables(
+                    repo_base_folder, content_element)
+                graphql_extractor.extract(content_element, since)
+                Incremental_updater.upsert_tables(repo_base_folder,
+                                                  content_element, old_tables)
+        elif since is None or content_element not in Incremental_updater.CONTENT:
+            Github_data_extractor.CLASSES[content_element](repo_, github2pandas)
+        elif content_element == "Version":
+            # The local history has to be parsed again, if anything was pushed
+            if not Incremental_updater.is_unchanged(repo_, since):
+                Github_data_extractor.CLASSES[content_element](repo_, github2pandas)
+        else:
+            old_tables = Incremental_updater.load_tables(repo_base_folder,
+                                                         content_element)
+            Github_data_extractor.CLASSES[content_element](
+                UpdatedSinceRepository(repo_, since), github2pandas)
+            Incremental_updater.upsert_tables(repo_base_folder,
+                                              content_element, old_tables)
+
+    @staticmethod
+    def extract_repository(github_token, project_folder, repo_full_name,
+                           contents, graphql_content=(), graphql_url=None):
+        git_repo_owner = repo_full_name.split('/')[0]
+        git_repo_name = repo_full_name.split('/')[1]
+        base_folder = Path(project_folder)
+        # Provide sub folders for individual organizations
+        repo_base_folder = Path(project_folder, git_repo_owner, git_repo_name)
+        repo_base_folder.mkdir(parents=True, exist_ok=True)
+        # One client and one repository object for all content types
+        connection_pool.install()
+        github2pandas = GitHub2Pandas(github_token, 
+                                      base_folder, 
+                                      log_level=logging.DEBUG)
+        # GitHub2Pandas.get_repo rewrites Repos.json of the project, which
+        # is done by the main process only, see register_repositories
+        repo_ = github2pandas.github_connection.get_repo(repo_full_name)
+        # Content types extracted by GraphQL queries instead of github2pandas
+        graphql_extractor = None
+        if any(content[0] in graphql_content for content in contents):
+            graphql_extractor = GraphQLExtractor(
+                GraphQLClient(github_token, graphql_url), repo_,
+                repo_full_name, repo_base_folder)
+        results = []
+        for content_element, since in contents:
+            # Server time, the local clock may be off
+            started_at = pd.Timestamp(connection_pool.get_server_now())
+            requests_before = connection_pool.get_request_count()
+            # Run extraction
+            try:
+                Github_data_extractor.extract_content(
+                    repo_, github2pandas, repo_base_folder, content_element,
+                    since, graphql_extractor
+                    if content_element in graphql_content else None)
+            except Exception as error:
+                results.append((content_element, error))
+                continue
+            requests_after = connection_pool.get_request_count()
+            # Note timestamps, changes made since started_at are requested
+            # by the next incremental extraction
+            results.append((content_element, {
+                "started_at": started_at,
+                "finished_at": pd.Timestamp.now(),
+                "request_cost": requests_after - requests_before,
+            }))
+        return results
+
     @staticmethod
     def start(github_token, request_handler,
-              output_file_name = AGG_HISTORY_FILE):
+              output_file_name = AGG_HISTORY_FILE, resume=False,
+              on_repo_finished=None):
+
+        parameters = request_handler.request.parameters
+        output_path = Path(parameters.project_folder, output_file_name)
+        token_pool = TokenPool.from_tokens(github_token)
+        workers = utilities.get_parameter(parameters, "workers", 1)
+        version_workers = utilities.get_parameter(parameters,
+                                                  "version_workers", 1)
+        schedule = utilities.get_parameter(
+            parameters, "schedule", Github_data_extractor.SCHEDULE_REPOSITORY)
+        incremental = utilities.get_parameter(parameters, "incremental",
+                                              False)
+        history = Github_data_extractor.get_last_extractions(output_path)
+        last_extractions = history if incremental else {}
 
-        # Prepare data frame for providing aggregation history
-        repo_list = []
-        for index, repo in enumerate(request_handler.repository_list):
-            repo_content = dict.fromkeys(request_handler.request.parameters.content, np.nan)
-            repo_content['repo_name'] = repo.full_name
-            repo_list.append(repo_content)
-        status = pd.DataFrame(repo_list)
+        # Aggregation history, finishing times by repository and content
+        status = {}
+
+        ledger = TaskLedger(parameters.project_folder)
+        resumed = ledger.start_run(resume)
+        finished_tasks = ledger.get_finished_tasks() if resumed else {}
 
         # all classes of aggregation aims
-        for content_element in request_handler.request.parameters.content:
+        content_elements = []
+        for content_element in parameters.content:
             if content_element in Github_data_extractor.CLASSES:
-                number_of_repos = len(request_handler.repository_list)
-                # all relevant repositories
-                for index, repo in enumerate(request_handler.repository_list):
-                    requests_remaning = utilities.check_github_requests_limits(github_token)
-                    print("{0:10} - {1:3} / {2:3} - {3} ({4:4d})".format(
-                            content_element,
-                            index, number_of_repos, repo.full_name,
-                            requests_remaning)
-                         )
-                    git_repo_owner = repo.full_name.split('/')[0]
-                    git_repo_name = repo.full_name.split('/')[1]
-                    base_folder = Path(
-                        request_handler.request.parameters.project_folder,
-                    )
-                    # Provide sub folders for individual organizations
-                    repo_base_folder = Path(
-                        request_handler.request.parameters.project_folder,
-                        git_repo_owner, git_repo_name,
-                    )
-                    repo_base_folder.mkdir(parents=True, exist_ok=True)
-                    # Run extraction
-                    github2pandas = GitHub2Pandas(github_token, 
-                                                  base_folder, 
-                                                  log_level=logging.DEBUG)
-                    repo_ = github2pandas.get_repo(git_repo_owner, git_repo_name)
-                    Github_data_extractor.CLASSES[content_element](repo_, github2pandas)
-                    # Note timestamp 
-                    status.loc[status.repo_name == repo.full_name, content_element] = pd.Timestamp.now()
+                content_elements.append(content_element)
             else:
                 print(f"{content_element} not known in github2pandas toolchain!")
                 print("Please check spelling")
-        
-        output_path = Path(request_handler.request.parameters.project_folder, output_file_name)
+
+        # on_repo_finished is called with the full name of every repository
+        # whose tasks are all done
+        repository_tasks = RepositoryTasks(on_repo_finished)
+        tasks = Github_data_extractor.iter_tasks(
+            request_handler.iter_repository_list(), content_elements,
+            schedule, status, finished_tasks, last_extractions,
+            history=history, separate_process_content=workers > 1,
+            repository_tasks=repository_tasks)
+        tasks = Github_data_extractor.register_repositories(
+            tasks, parameters.project_folder)
+        if not request_handler.stream_discovery:
+            tasks = list(tasks)
+
+        if resumed:
+            print(f"Resuming: {len(finished_tasks)} finished tasks skipped.")
+        elif resume:
+            print("The last run finished, all tasks are extracted again.")
+
+        if workers > 1:
+            Github_data_extractor._run_concurrent(token_pool, parameters,
+                                                  tasks, status, ledger,
+                                                  workers, version_workers,
+                                                  repository_tasks)
+        else:
+            Github_data_extractor._run_sequential(token_pool, parameters,
+                                                  tasks, status, ledger,
+                                                  repository_tasks)
+        ledger.finish_run()
+        ledger.close()
+
+        repo_list = [dict(repo_content, repo_name=repo_full_name)
+                     for repo_full_name, repo_content in status.items()]
+        status = pd.DataFrame(repo_list,
+                              columns=list(parameters.content) + ["repo_name"])
         file = open(output_path, 'w+', newline='')
         status.to_csv(file)
-        return True
\ No newline at end of file
+        return True
+
+    def iter_tasks(repositories, content_elements, schedule, status,
+                   finished_tasks, last_extractions, history=None,
+                   separate_process_content=False, repository_tasks=None):
+        """Yields the tasks of the repositories as soon as they are
+        discovered. Content-major scheduling needs all repositories first.
+        The tasks of a repository are counted before the first of them is
+        yielded. The status starts with the timestamps of the history,
+        which failed tasks keep."""
+        if schedule == Github_data_extractor.SCHEDULE_CONTENT:
+            repositories = list(repositories)
+        pending = {}
+        for repo in repositories:
+            status[repo.full_name] = {}
+            contents = []
+            for content_element in content_elements:
+                if (repo.full_name, content_element) in finished_tasks:
+                    status[repo.full_name][content_element] = \
+                        finished_tasks[(repo.full_name, content_element)]
+                    continue
+                previous = (history or {}).get(
+                    (repo.full_name, content_element))
+                if previous is not None:
+                    # Replaced if the task finishes
+                    status[repo.full_name][content_element] = previous
+                since = last_extractions.get((repo.full_name, content_element))
+                if since is not None:
+                    since = Incremental_updater.get_since(since)
+                contents.append((content_element, since))
+            if schedule == Github_data_extractor.SCHEDULE_CONTENT:
+                pending[repo.full_name] = contents
+            else:
+                tasks = Github_data_extractor.schedule_tasks(
+                    {repo.full_name: contents}, content_elements, schedule,
+                    separate_process_content)
+                if repository_tasks is not None:
+                    repository_tasks.add(repo.full_name, len(tasks))
+                yield from tasks
+        if schedule == Github_data_extractor.SCHEDULE_CONTENT:
+            tasks = Github_data_extractor.schedule_tasks(
+                pending, content_elements, schedule, separate_process_content)
+            if repository_tasks is not None:
+                for repo_full_name in pending:
+                    repository_tasks.add(repo_full_name, sum(
+                        task[0] == repo_full_name for task in tasks))
+            yield from tasks
+
+    def register_repositories(tasks, project_folder):
+        """Passes the tasks on and adds their repositories to Repos.json of
+        github2pandas, like GitHub2Pandas.get_repo does in the workers."""
+        repo_file = Path(project_folder, GitHub2Pandas.Files.REPOS)
+        repo_names = GitHub2Pandas.get_full_names_of_repositories(
+            project_folder)
+        known_names = set(repo_names)
+        for task in tasks:
+            if task[0] not in known_names:
+                known_names.add(task[0])
+                repo_names.append(task[0])
+                # Readers never see a partially written file
+                temp_file = repo_file.with_suffix(".tmp")
+                with open(temp_file, "w") as json_file:
+                    json.dump({GitHub2Pandas.REPOSITORIES_KEY: repo_names},
+                              json_file)
+                os.replace(temp_file, repo_file)
+            yield task
+
+    def schedule_tasks(pending, content_elements, schedule,
+                       separate_process_content=False):
+        """Groups the pending (content, since) pairs of all repositories to
+        tasks of the form (repo_full_name, [(content, since), ...])."""
+        tasks = []
+        if schedule == Github_data_extractor.SCHEDULE_CONTENT:
+            # Tasks of one repository are serialized while running, see
+            # RepositorySerializer
+            for content_element in content_elements:
+                for repo_full_name, contents in pending.items():
+                    tasks += [(repo_full_name, [content])
+                              for content in contents
+                              if content[0] == content_element]
+        elif schedule == Github_data_extractor.SCHEDULE_REPOSITORY:
+            for repo_full_name, contents in pending.items():
+                if separate_process_content:
+                    # Process bound content types run in their own pool
+                    process_contents = [
+                        content for content in contents if content[0] in
+                        Github_data_extractor.PROCESS_CONTENT]
+                    contents = [content for content in contents
+                                if content not in process_contents]
+                    tasks += [(repo_full_name, [content])
+                              for content in process_contents]
+                if contents:
+                    tasks.append((repo_full_name, contents))
+        else:
+            print(f"Unknown schedule {schedule}! Please use "
+                  f"{Github_data_extractor.SCHEDULE_REPOSITORY} or "
+                  f"{Github_data_extractor.SCHEDULE_CONTENT}.")
+            sys.exit()
+        return tasks
+
+    def get_graphql_content(parameters):
+        """Returns the content types which are extracted by GraphQL."""
+        graphql_content = utilities.get_parameter(parameters,
+                                                  "graphql_content", [])
+        for content_element in graphql_content:
+            if content_element not in GraphQLExtractor.CONTENT:
+                print(f"{content_element} can not be extracted by GraphQL! "
+                      f"Please use {', '.join(GraphQLExtractor.CONTENT)}.")
+                sys.exit()
+        return graphql_content
+
+    def get_last_extractions(output_path):
+        if not output_path.is_file():
+            return {}
+        history = pd.read_csv(output_path, index_col=0)
+        history = history.melt(id_vars="repo_name", var_name="content",
+                               value_name="timestamp").dropna()
+        return {(row.repo_name, row.content): pd.Timestamp(row.timestamp)
+                for row in history.itertuples()}
+
+    def _record_result(ledger, status, content_element, repo_full_name,
+                       result=None, error=None):
+        if error is None:
+            ledger.record(repo_full_name, content_element,
+                          TaskLedger.FINISHED, **result)
+            # The next incremental extraction starts from here
+            status[repo_full_name][content_element] = result["started_at"]
+        else:
+            print(f"{content_element} - {repo_full_name} failed: {error}")
+            ledger.record(repo_full_name, content_element, TaskLedger.FAILED,
+                          finished_at=pd.Timestamp.now(), message=str(error))
+
+    def _record_results(ledger, status, repo_full_name, results,
+                        repository_tasks=None):
+        for content_element, result in results:
+            if isinstance(result, Exception):
+                Github_data_extractor._record_result(
+                    ledger, status, content_element, repo_full_name,
+                    error=result)
+            else:
+                Github_data_extractor._record_result(
+                    ledger, status, content_element, repo_full_name, result)
+        if repository_tasks is not None:
+            repository_tasks.done(repo_full_name)
+
+    def get_request_cost(request_costs, task):
+        """Returns the number of requests reserved for a task."""
+        repo_full_name, contents = task
+        return sum(request_costs.get(
+                       (repo_full_name, content[0]),
+                       Github_data_extractor.DEFAULT_REQUEST_COST)
+                   for content in contents)
+
+    def _run_sequential(token_pool, parameters, tasks, status, ledger,
+                        repository_tasks=None):
+        graphql_content = Github_data_extractor.get_graphql_content(parameters)
+        graphql_url = utilities.get_parameter(parameters, "graphql_url")
+        request_costs = ledger.get_request_costs()
+        # Streamed tasks are counted while the repositories are discovered
+        number_of_tasks = len(tasks) if isinstance(tasks, list) else "?"
+        for index, (repo_full_name, contents) in enumerate(tasks):
+            # Unspent budget of the task is released when it is finished
+            with token_pool.reservation(
+                    "core", cost=Github_data_extractor.get_request_cost(
+                        request_costs, (repo_full_name, contents)),
+                    min_limit=100) as (github_token, requests_remaning):
+                content_names = ",".join(content[0] for content in contents)
+                print("{0:10} - {1:3} / {2:>3} - {3} ({4:4d})".format(
+                        content_names,
+                        index, number_of_tasks, repo_full_name,
+                        requests_remaning)
+                     )
+                try:
+                    results = Github_data_extractor.extract_repository(
+                        github_token, parameters.project_folder,
+                        repo_full_name, contents, graphql_content,
+                        graphql_url)
+                except Exception as error:
+                    results = [(content[0], error) for content in contents]
+            Github_data_extractor._record_results(ledger, status,
+                                                  repo_full_name, results,
+                                                  repository_tasks)
+
+    def _checked_extract_repository(token_pool, request_cost, project_folder,
+                                    repo_full_name, contents,
+                                    graphql_content=(), graphql_url=None):
+        with token_pool.reservation("core", cost=request_cost,
+                                    min_limit=100) as (github_token, _):
+            return Github_data_extractor.extract_repository(
+                github_token, project_folder, repo_full_name, contents,
+                graphql_content, graphql_url)
+
+    def _collect_result(future, task, index, number_of_tasks, status,
+                        ledger, repository_tasks=None):
+        repo_full_name, contents = task
+        try:
+            results = future.result()
+        except Exception as error:
+            results = [(content[0], error) for content in contents]
+        print("{0:10} - {1:3} / {2:3} - {3}".format(
+                ",".join(content[0] for content in contents),
+                index, number_of_tasks, repo_full_name)
+             )
+        Github_data_extractor._record_results(ledger, status,
+                                              repo_full_name, results,
+                                              repository_tasks)
+
+    def _submit_task(pools, task, futures, token_pool, request_costs,
+                     parameters, graphql_content, graphql_url):
+        repo_full_name, contents = task
+        thread_pool, process_pool = pools
+        if contents[0][0] in Github_data_extractor.PROCESS_CONTENT:
+            pool = process_pool
+        else:
+            pool = thread_pool
+        future = pool.submit(
+            Github_data_extractor._checked_extract_repository,
+            token_pool,
+            Github_data_extractor.get_request_cost(request_costs, task),
+            parameters.project_folder,
+            repo_full_name, contents, graphql_content, graphql_url)
+        futures[future] = task
+
+    def _run_concurrent(token_pool, parameters, tasks, status, ledger,
+                        workers, version_workers, repository_tasks=None):
+        print(f"Extracting tasks with {workers} threads and "
+              f"{version_workers} processes ...")
+        graphql_content = Github_data_extractor.get_graphql_content(parameters)
+        graphql_url = utilities.get_parameter(parameters, "graphql_url")
+        request_costs = ledger.get_request_costs()
+        serializer = RepositorySerializer()
+        with ThreadPoolExecutor(max_workers=workers) as thread_pool, \
+             ProcessPoolExecutor(max_workers=version_workers,
+                                 initializer=connection_pool.install,
+                                 initargs=(connection_pool.get_cache(),)) \
+                as process_pool:
+            pools = (thread_pool, process_pool)
+            futures = {}
+            number_of_tasks = 0
+            finished = 0
+
+            def collect(done_futures):
+                nonlocal finished
+                for future in done_futures:
+                    finished += 1
+                    task = futures.pop(future)
+                    Github_data_extractor._collect_result(
+                        future, task, finished, number_of_tasks, status,
+                        ledger, repository_tasks)
+                    next_task = serializer.done(task[0])
+                    if next_task is not None:
+                        Github_data_extractor._submit_task(
+                            pools, next_task, futures, token_pool,
+                            request_costs, parameters, graphql_content,
+                            graphql_url)
+
+            for task in tasks:
+                number_of_tasks += 1
+                if serializer.add(task):
+                    Github_data_extractor._submit_task(
+                        pools, task, futures, token_pool, request_costs,
+                        parameters, graphql_content, graphql_url)
+                # Record finished tasks while repositories are discovered
+                collect([future for future in futures if future.done()])
+
+            while futures:
+                done_futures, _ = wait(futures, return_when=FIRST_COMPLETED)
+                collect(done_futures)
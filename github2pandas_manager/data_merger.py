@@ -1,7 +1,11 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 import pandas as pd
 import numpy as np
 import pickle
+import shutil
+import sys
 
 from github2pandas.issues import Issues
 from github2pandas.pull_requests import PullRequests
@@ -12,33 +16,733 @@ from github2pandas.git_releases import GitReleases
 from github2pandas.core import Core
 
 from github2pandas_manager import utilities
+from github2pandas_manager import parquet_output
+from github2pandas_manager import sqlite_output
+from github2pandas_manager.merge_manifest import MergeManifest
 
 class Github_data_merger():
 
-    def merge_pandas_tables(request_handler, project_base_folder, content):
+    def get_repo_base_folder(project_folder, repo_full_name):
+        return Path(project_folder, repo_full_name.split('/')[0],
+                    repo_full_name.split('/')[1])
+
+    def get_raw_file_path(project_folder, repo_full_name, table_name):
+        data_dir, file_name = Github_data_merger.RAW_FILES[table_name]
+        return Path(Github_data_merger.get_repo_base_folder(
+            project_folder, repo_full_name), data_dir, file_name)
+
+    def load_table(project_folder, repositories, merge_fct, load_pool):
+        """Loads the table of the repositories concurrently and concatenates
+        them once, in the order of the repository list. Rows with a
+        repo_name get the Parquet partition of their repository, which is
+        dropped from the other outputs."""
+        def load_repo_table(repo):
+            repo_base_folder = Github_data_merger.get_repo_base_folder(
+                project_folder, repo.full_name)
+            repo_df = merge_fct(repo_base_folder, repo.name)
+            if repo_df is not None and "repo_name" in repo_df.columns:
+                repo_df = repo_df.assign(**{
+                    parquet_output.PARTITION_COLUMN:
+                    parquet_output.get_partition_value(repo.full_name)})
+            return repo_df
+        repo_dfs = [repo_df for repo_df in
+                    load_pool.map(load_repo_table, repositories)
+                    if repo_df is not None]
+        if not repo_dfs:
+            return pd.DataFrame()
+        return pd.concat(repo_dfs, axis=0)
+
+    def prepare_table(df):
+        df.reset_index(inplace=True, drop=True)
+        return df
+
+    def sanitize_newlines(df):
+        """Replaces new lines (e.g. in commit messages) by spaces. Only
+        string columns are touched and only the cells holding new lines
+        are replaced, with vectorised string operations."""
+        sanitized_df = df
+        for name in df.columns:
+            column = df[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # Compacted string columns, see compact_dtypes
+                column = Github_data_merger.sanitize_categories(column)
+                if column is not None:
+                    if sanitized_df is df:
+                        sanitized_df = df.copy(deep=False)
+                    sanitized_df[name] = column
+                continue
+            if column.dtype != object and \
+                    not isinstance(column.dtype, pd.StringDtype):
+                continue
+            # Not string cells of object columns give NaN and are kept,
+            # object columns without any string have no str accessor
+            try:
+                has_newline = column.str.contains("\n", regex=False)
+            except AttributeError:
+                continue
+            has_newline = has_newline.fillna(False).astype(bool)
+            if not has_newline.any():
+                continue
+            if sanitized_df is df:
+                sanitized_df = df.copy(deep=False)
+            column = column.copy()
+            column[has_newline] = column[has_newline].str.replace(
+                "\n", " ", regex=False)
+            sanitized_df[name] = column
+        return sanitized_df
+
+    def sanitize_categories(column):
+        """Replaces new lines in the categories of a categorical column.
+        Returns None if no category holds a new line."""
+        categories = pd.Series(column.cat.categories)
+        try:
+            has_newline = categories.str.contains("\n", regex=False)
+        except AttributeError:
+            return None
+        if not has_newline.fillna(False).astype(bool).any():
+            return None
+        sanitized = categories.where(
+            ~has_newline.fillna(False).astype(bool),
+            categories.str.replace("\n", " ", regex=False))
+        if sanitized.is_unique:
+            return column.cat.rename_categories(sanitized.tolist())
+        # Categories which only differed by new lines are merged
+        return column.astype(object).map(
+            dict(zip(categories, sanitized))).astype("category")
+
+    def get_newline_sanitizing(parameters, table_name, output_format):
+        """Checks whether new lines are replaced in an output format of a
+        table. sanitize_newlines is a bool for all tables or a list of the
+        sanitized tables. By default csv and pickle output is sanitized,
+        Parquet and SQLite keep new lines."""
+        setting = utilities.get_parameter(parameters, "sanitize_newlines")
+        if setting is None:
+            return output_format not in ("parquet", "sqlite")
+        if isinstance(setting, bool):
+            return setting
+        return table_name in setting
+
+    def get_output_path(project_base_folder, table_name, output_format):
+        if output_format == "parquet":
+            return Path(project_base_folder, table_name)
+        elif output_format == "csv":
+            return Path(project_base_folder, table_name + '.csv')
+        elif output_format == "sqlite":
+            # All tables share one database
+            return Path(project_base_folder,
+                        sqlite_output.SQLiteStore.DATABASE_FILE)
+        return Path(project_base_folder, table_name + '.p')
+
+    def compact_column(name, column):
+        values = column.dropna()
+        if values.empty:
+            return column
+        if column.dtype == object:
+            value_types = values.map(type)
+            if value_types.isin([bool, np.bool_]).all():
+                return column.astype("boolean")
+            is_string = value_types.eq(str).all()
+        else:
+            is_string = True
+        if name.endswith("_at"):
+            try:
+                converted = pd.to_datetime(column, errors="coerce")
+            except (ValueError, TypeError):
+                converted = None
+            # Columns with values which are not times stay unchanged
+            if converted is not None and converted.notna().sum() == len(values):
+                return converted
+        if is_string and name in Github_data_merger.CATEGORICAL_COLUMNS:
+            return column.astype("category")
+        return column
+
+    def compact_dtypes(df):
+        """
+        compact_dtypes(df)
+
+        Stores the columns of a merged table in compact dtypes. Integers
+        are downcast, the string columns of CATEGORICAL_COLUMNS (repo_name,
+        states, event types, ...) become categoricals, object columns of
+        booleans become nullable booleans and *_at columns become
+        datetimes, if all of their values can be parsed.
+
+        Parameters
+        ----------
+        df : DataFrame
+            Merged table, its columns are replaced.
+
+        Returns
+        -------
+        DataFrame :
+            The table with compact dtypes.
+
+        """
+
+        for name in df.columns:
+            column = df[name]
+            if pd.api.types.is_integer_dtype(column.dtype):
+                df[name] = pd.to_numeric(column, downcast="integer")
+            elif column.dtype == object or \
+                    isinstance(column.dtype, pd.StringDtype):
+                df[name] = Github_data_merger.compact_column(name, column)
+        return df
+
+    def get_memory_mb(df):
+        return df.memory_usage(deep=True).sum() / 2**20
+
+    def get_output_settings(parameters, table_name, output_formats):
+        """Returns the settings changing the written values of a table,
+        recorded by the merge manifest."""
+        return {
+            "compact_dtypes": bool(utilities.get_parameter(
+                parameters, "compact_dtypes", False)),
+            "sanitize_newlines": [
+                Github_data_merger.get_newline_sanitizing(
+                    parameters, table_name, output_format)
+                for output_format in output_formats],
+        }
+
+    def get_output_table(parameters, df, table_name, output_format):
+        if output_format != "parquet":
+            df = parquet_output.drop_partition_column(df)
+        if Github_data_merger.get_newline_sanitizing(parameters, table_name,
+                                                     output_format):
+            return Github_data_merger.sanitize_newlines(df)
+        return df
+
+    def write_table(parameters, df, project_base_folder, table_name,
+                    output_formats, compression, report=None):
+        if report is not None:
+            report.update(rows=len(df), columns=len(
+                              df.columns.drop(parquet_output.PARTITION_COLUMN,
+                                              errors="ignore")),
+                          memory_mb=Github_data_merger.get_memory_mb(df))
+        if utilities.get_parameter(parameters, "compact_dtypes", False):
+            df = Github_data_merger.compact_dtypes(df)
+            if report is not None:
+                report["compact_memory_mb"] = \
+                    Github_data_merger.get_memory_mb(df)
+        output_paths = []
+        raw_df = df
+        sanitized_df = None
+        for output_format in output_formats:
+            output_path = Github_data_merger.get_output_path(
+                project_base_folder, table_name, output_format)
+            if Github_data_merger.get_newline_sanitizing(
+                    parameters, table_name, output_format):
+                if sanitized_df is None:
+                    sanitized_df = Github_data_merger.sanitize_newlines(raw_df)
+                df = sanitized_df
+            else:
+                df = raw_df
+            if output_format != "parquet":
+                df = parquet_output.drop_partition_column(df)
+            if output_format == "parquet":
+                output_path = parquet_output.write_dataset(
+                    df, output_path, compression)
+            elif output_format == "csv":
+                df.to_csv(output_path, index=False)
+            elif output_format == "sqlite":
+                sqlite_output.get_store(output_path).replace_table(
+                    table_name, df)
+            elif output_format == "pickle":
+                with open(output_path, "wb") as f:
+                    pickle.dump(df, f)
+            output_paths.append(output_path)
+        return output_paths
+
+    def update_table(parameters, project_base_folder, merge_fct,
+                     repositories, changed, removed, load_pool,
+                     output_formats, compression, report=None):
+        """
+        update_table(parameters, project_base_folder, merge_fct,
+                     repositories, changed, removed, load_pool,
+                     output_formats, compression, report=None)
+
+        Replaces the rows of changed and removed repositories in the
+        outputs of a previous merge. Parquet partitions are replaced by
+        full name. The other outputs identify repositories by repo_name
+        only, so all repositories sharing the name of a changed one are
+        re-read for them.
+
+        Returns
+        -------
+        list or None :
+            Output paths, None if the table has to be merged completely.
+
+        """
+
+        table_name = merge_fct.__name__.split('_')[1]
+        output_paths = [Github_data_merger.get_output_path(
+                            project_base_folder, table_name, output_format)
+                        for output_format in output_formats]
+        frame_formats = [output_format for output_format in output_formats
+                         if output_format not in ("parquet", "sqlite")]
+        # csv files are rewritten from the previous pickle or parquet table,
+        # without one the table is merged completely before any output is
+        # touched
+        if table_name in Github_data_merger.UNTAGGED_TABLES or \
+                (frame_formats and "pickle" not in output_formats and
+                 "parquet" not in output_formats) or \
+                not all(Github_data_merger.output_exists(
+                            output_path, table_name, output_format)
+                        for output_path, output_format
+                        in zip(output_paths, output_formats)):
+            return None
+        if not changed and not removed:
+            if report is not None:
+                report["unchanged"] = True
+            return output_paths
+        repo_names = {repo_full_name.split('/')[1]
+                      for repo_full_name in changed + removed}
+        if output_formats == ["parquet"]:
+            loaded = [repo for repo in repositories
+                      if repo.full_name in changed]
+        else:
+            loaded = [repo for repo in repositories
+                      if repo.name in repo_names]
+        df = Github_data_merger.load_table(
+            parameters.project_folder, loaded, merge_fct, load_pool)
+        df = Github_data_merger.prepare_table(df)
+        if "parquet" in output_formats:
+            if not parquet_output.replace_partitions(
+                    Github_data_merger.get_output_table(
+                        parameters, df, table_name, "parquet"),
+                    output_paths[output_formats.index("parquet")],
+                    {parquet_output.get_partition_value(repo_full_name)
+                     for repo_full_name in
+                     [repo.full_name for repo in loaded] + removed},
+                    compression):
+                # e.g. ids exceeding the integer type of compact_dtypes
+                print(f"    {table_name}: the new rows do not match the "
+                      "schema of the Parquet dataset, the table is merged "
+                      "completely.")
+                return None
+        if "sqlite" in output_formats:
+            store = sqlite_output.get_store(
+                output_paths[output_formats.index("sqlite")])
+            store.replace_repositories(
+                table_name,
+                Github_data_merger.get_output_table(
+                    parameters, df, table_name, "sqlite"),
+                repo_names)
+            store.create_indexes(table_name)
+        if not frame_formats:
+            if report is not None:
+                if "parquet" in output_formats:
+                    report["rows"] = parquet_output.count_rows(
+                        output_paths[output_formats.index("parquet")])
+                else:
+                    report["rows"] = store.count_rows(table_name)
+            return output_paths
+        if "pickle" in output_formats:
+            with open(output_paths[output_formats.index("pickle")], "rb") as f:
+                previous_df = pickle.load(f)
+        elif "parquet" in output_formats:
+            previous_df = parquet_output.read_table(
+                output_paths[output_formats.index("parquet")])
+            previous_df["repo_name"] = previous_df["repo_name"].astype(str)
+        previous_df = previous_df[~previous_df["repo_name"].isin(repo_names)]
+        df = pd.concat([previous_df,
+                        parquet_output.drop_partition_column(df)], axis=0)
+        df.reset_index(inplace=True, drop=True)
+        Github_data_merger.write_table(parameters, df, project_base_folder,
+                                       table_name, frame_formats,
+                                       compression, report)
+        return output_paths
+
+    def output_exists(output_path, table_name, output_format):
+        if output_format == "sqlite":
+            return output_path.is_file() and \
+                sqlite_output.get_store(output_path).has_table(table_name)
+        return output_path.exists()
+
+    def iter_repo_tables(project_folder, repositories, merge_fct, load_pool,
+                         window):
+        """Yields (repo, table) of the repositories in order. At most
+        `window` tables are loaded ahead, which bounds the memory use."""
+        def load_repo_table(repo):
+            repo_base_folder = Github_data_merger.get_repo_base_folder(
+                project_folder, repo.full_name)
+            return merge_fct(repo_base_folder, repo.name)
+        loading = deque()
+        for repo in repositories:
+            loading.append((repo, load_pool.submit(load_repo_table, repo)))
+            if len(loading) >= window:
+                repo, future = loading.popleft()
+                yield repo, future.result()
+        while loading:
+            repo, future = loading.popleft()
+            yield repo, future.result()
+
+    def concatenate_csv_parts(csv_parts, output_path):
+        """Concatenates csv files written per repository. Parts with other
+        columns than the first one are aligned to all columns in chunks."""
+        columns = []
+        for _, part_columns in csv_parts:
+            columns += [column for column in part_columns
+                        if column not in columns]
+        with open(output_path, "w", newline='') as output_file:
+            output_file.write(pd.DataFrame(columns=columns).to_csv(
+                index=False))
+            for part_path, part_columns in csv_parts:
+                if part_columns == columns:
+                    with open(part_path, "r", newline='') as part_file:
+                        part_file.readline()
+                        shutil.copyfileobj(part_file, output_file)
+                    continue
+                # Values are kept as written, missing columns stay empty
+                for chunk in pd.read_csv(part_path, dtype=str,
+                                         keep_default_na=False,
+                                         chunksize=100000):
+                    chunk.reindex(columns=columns, fill_value="").to_csv(
+                        output_file, index=False, header=False)
+
+    def open_stream(project_base_folder, table_name, output_formats,
+                    changes=None):
+        """Prepares the outputs of a streamed table. Without changes the
+        table is written to a temporary Parquet dataset and SQLite table,
+        which replace the previous outputs when the stream is closed.
+        Otherwise the partitions and rows of the changed and removed
+        repositories are removed from the previous outputs."""
+        parquet_path = Github_data_merger.get_output_path(
+            project_base_folder, table_name, "parquet")
+        stream = {
+            "table_name": table_name,
+            "output_formats": output_formats,
+            "parquet_path": parquet_path,
+            "parquet_output_path": parquet_path,
+            "csv_path": Github_data_merger.get_output_path(
+                project_base_folder, table_name, "csv"),
+            "sqlite_path": Github_data_merger.get_output_path(
+                project_base_folder, table_name, "sqlite"),
+            "sqlite_table": table_name,
+            "csv_parts_path": Path(project_base_folder,
+                                   f".{table_name}_parts"),
+            "csv_parts": {},
+            "merged": set(),
+            "repo_names": None,
+            "report": {},
+        }
+        if changes is None:
+            # The previous outputs are kept if the run is interrupted,
+            # leftovers of an interrupted stream are removed
+            stream["parquet_path"] = Path(project_base_folder,
+                                          f".{table_name}_stream")
+            stream["sqlite_table"] = f"_{table_name}_stream"
+            if "parquet" in output_formats and \
+                    stream["parquet_path"].is_dir():
+                shutil.rmtree(stream["parquet_path"])
+            if "sqlite" in output_formats:
+                sqlite_output.get_store(stream["sqlite_path"]).drop_table(
+                    stream["sqlite_table"])
+        else:
+            stream["repo_names"] = set()
+            changed, removed = changes
+            Github_data_merger.extend_stream(stream, changed + removed)
+        if "csv" in output_formats:
+            if stream["csv_parts_path"].is_dir():
+                shutil.rmtree(stream["csv_parts_path"])
+            stream["csv_parts_path"].mkdir(parents=True)
+        return stream
+
+    def extend_stream(stream, repo_full_names):
+        """Removes the partitions and rows of further repositories from a
+        stream opened with changes. All repositories of their names are
+        written again, as SQLite rows are deleted by repo_name."""
+        repo_names = {repo_full_name.split('/')[1]
+                      for repo_full_name in repo_full_names} - \
+            stream["repo_names"]
+        if not repo_names:
+            return
+        if "parquet" in stream["output_formats"]:
+            parquet_output.remove_partitions(stream["parquet_path"],
+                                             repo_names)
+        if "sqlite" in stream["output_formats"]:
+            sqlite_output.get_store(
+                stream["sqlite_path"]).delete_repositories(
+                    stream["table_name"], repo_names)
+        stream["repo_names"] |= repo_names
+
+    def can_update_stream(project_base_folder, table_name, output_formats):
+        """Checks whether the outputs of a streamed table can be updated
+        by repository. csv files are always written completely."""
+        if "csv" in output_formats:
+            return False
+        return all(
+            parquet_output.is_partitioned(
+                Github_data_merger.get_output_path(
+                    project_base_folder, table_name, output_format))
+            if output_format == "parquet" else
+            Github_data_merger.output_exists(
+                Github_data_merger.get_output_path(
+                    project_base_folder, table_name, output_format),
+                table_name, output_format)
+            for output_format in output_formats)
+
+    def write_stream(parameters, stream, repo_full_name, df, compression):
+        """Writes the table of one repository to a streamed table. A
+        repository whose write failed can be written again, its Parquet
+        file and csv part are replaced and the SQLite rows are appended
+        last, in one transaction."""
+        if stream["repo_names"] is not None:
+            Github_data_merger.extend_stream(stream, [repo_full_name])
+        if df is None:
+            stream["merged"].add(repo_full_name)
+            return
+        df = Github_data_merger.prepare_table(df)
+        table_name = stream["table_name"]
+        if "parquet" in stream["output_formats"]:
+            parquet_output.write_partition_file(
+                Github_data_merger.get_output_table(
+                    parameters, df, table_name, "parquet"),
+                stream["parquet_path"],
+                parquet_output.get_partition_value(repo_full_name), "0",
+                compression)
+        if "csv" in stream["output_formats"] and not df.empty:
+            part_path = Path(stream["csv_parts_path"],
+                             f"{len(stream['csv_parts'])}.csv")
+            Github_data_merger.get_output_table(
+                parameters, df, table_name, "csv").to_csv(part_path,
+                                                          index=False)
+            stream["csv_parts"][repo_full_name] = (part_path,
+                                                   list(df.columns))
+        if "sqlite" in stream["output_formats"]:
+            sqlite_output.get_store(stream["sqlite_path"]).append(
+                stream["sqlite_table"], Github_data_merger.get_output_table(
+                    parameters, df, table_name, "sqlite"))
+        report = stream["report"]
+        report["rows"] = report.get("rows", 0) + len(df)
+        report["memory_mb"] = max(report.get("memory_mb", 0),
+                                  Github_data_merger.get_memory_mb(df))
+        stream["merged"].add(repo_full_name)
+
+    def close_stream(stream, repositories, compression):
+        """Finalizes the Parquet dataset, indexes the SQLite table and
+        concatenates the csv parts in the order of the repository list.
+        Temporary outputs replace the previous ones."""
+        output_paths = []
+        if "parquet" in stream["output_formats"]:
+            parquet_output.finalize_dataset(stream["parquet_path"],
+                                            compression)
+            if stream["parquet_path"] != stream["parquet_output_path"]:
+                parquet_output.replace_dataset(stream["parquet_path"],
+                                               stream["parquet_output_path"])
+            output_paths.append(stream["parquet_output_path"])
+        if "sqlite" in stream["output_formats"]:
+            store = sqlite_output.get_store(stream["sqlite_path"])
+            if stream["sqlite_table"] != stream["table_name"]:
+                store.rename_table(stream["sqlite_table"],
+                                   stream["table_name"])
+            store.create_indexes(stream["table_name"])
+            output_paths.append(stream["sqlite_path"])
+        if "csv" in stream["output_formats"]:
+            csv_parts = [stream["csv_parts"][repo.full_name]
+                         for repo in repositories
+                         if repo.full_name in stream["csv_parts"]]
+            temp_path = stream["csv_path"].with_suffix(".csv.tmp")
+            Github_data_merger.concatenate_csv_parts(csv_parts, temp_path)
+            temp_path.replace(stream["csv_path"])
+            shutil.rmtree(stream["csv_parts_path"])
+            output_paths.append(stream["csv_path"])
+        return output_paths
+
+    def stream_table(parameters, project_base_folder, merge_fct,
+                     repositories, load_pool, output_formats, compression,
+                     changes=None, report=None, stream=None):
+        """
+        stream_table(parameters, project_base_folder, merge_fct,
+                     repositories, load_pool, output_formats, compression,
+                     changes=None, report=None, stream=None)
+
+        Merges a table repository by repository, the merged table is never
+        held in memory. Every repository table is written to its own file
+        of the Parquet partition and to a csv part, the csv parts are
+        concatenated afterwards. The report holds the memory of the
+        largest repository table.
+
+        Parameters
+        ----------
+        changes : tuple
+            Changed and removed repositories of a previous merge, only
+            their Parquet partitions and SQLite rows are written again.
+            Has to be None if a csv file is written.
+        stream : dict
+            Stream opened by a merge pipeline, only the repositories not
+            merged by the pipeline are read. The changes are added to a
+            stream opened with changes.
+
+        Returns
+        -------
+        list :
+            Output paths.
+
+        """
+
+        table_name = merge_fct.__name__.split('_')[1]
+        if stream is None:
+            stream = Github_data_merger.open_stream(
+                project_base_folder, table_name, output_formats, changes)
+        elif changes is not None and stream["repo_names"] is not None:
+            changed, removed = changes
+            Github_data_merger.extend_stream(stream, changed + removed)
+        pending = [repo for repo in repositories
+                   if repo.full_name not in stream["merged"] and
+                   (stream["repo_names"] is None or
+                    repo.name in stream["repo_names"])]
+        window = utilities.get_parameter(parameters, "merge_workers",
+                                         Github_data_merger.MERGE_WORKERS)
+        for repo, df in Github_data_merger.iter_repo_tables(
+                parameters.project_folder, pending, merge_fct, load_pool,
+                window):
+            Github_data_merger.write_stream(parameters, stream,
+                                            repo.full_name, df, compression)
+        if report is not None:
+            report.update(stream["report"])
+        return Github_data_merger.close_stream(stream, repositories,
+                                               compression)
+
+    def get_streamed_formats(parameters, output_formats, table_name):
+        """Returns the output formats of a table in the streaming merge or
+        None if the table is merged in memory. Pickle files hold the whole
+        table and are skipped."""
+        if not utilities.get_parameter(parameters, "streaming_merge",
+                                       False) or \
+                table_name in Github_data_merger.UNTAGGED_TABLES:
+            return None
+        return [output_format for output_format in output_formats
+                if output_format != "pickle"]
+
+    def remove_skipped_outputs(project_base_folder, table_name,
+                               skipped_formats):
+        """Removes the outputs of a previous merge in formats the streaming
+        merge skips, readers would take them for the current table."""
+        for output_format in skipped_formats:
+            output_path = Github_data_merger.get_output_path(
+                project_base_folder, table_name, output_format)
+            message = f"    {table_name}: {output_format} output skipped " \
+                      "by the streaming merge"
+            if output_path.is_file():
+                output_path.unlink()
+                message += f", removed {output_path}"
+            print(message)
+
+    def merge_table(request_handler, project_base_folder, merge_fct,
+                    load_pool, output_formats, manifest=None, pipeline=None):
+        parameters = request_handler.request.parameters
+        table_name = merge_fct.__name__.split('_')[1]
+        compression = utilities.get_parameter(parameters,
+                                              "parquet_compression", "zstd")
+        report = {"table": table_name}
+        streamed_formats = Github_data_merger.get_streamed_formats(
+            parameters, output_formats, table_name)
+        skipped_formats = []
+        if streamed_formats is not None:
+            skipped_formats = [output_format
+                               for output_format in output_formats
+                               if output_format not in streamed_formats]
+            output_formats = streamed_formats
+        repositories = request_handler.repository_list
+        signatures = {
+            repo.full_name: MergeManifest.get_signature(
+                Github_data_merger.get_raw_file_path(
+                    parameters.project_folder, repo.full_name, table_name))
+            for repo in repositories
+        }
+        settings = Github_data_merger.get_output_settings(
+            parameters, table_name, output_formats)
+        output_paths = None
+        changes = None if manifest is None else \
+            manifest.get_changes(table_name, signatures, output_formats,
+                                 settings)
+        stream = None if pipeline is None else \
+            pipeline.streams.get(table_name)
+        if streamed_formats is not None:
+            if not Github_data_merger.can_update_stream(
+                    project_base_folder, table_name, output_formats):
+                changes = None
+            output_paths = Github_data_merger.stream_table(
+                parameters, project_base_folder, merge_fct, repositories,
+                load_pool, output_formats, compression, changes, report,
+                stream)
+            Github_data_merger.remove_skipped_outputs(
+                project_base_folder, table_name, skipped_formats)
+        elif changes is not None:
+            changed, removed = changes
+            output_paths = Github_data_merger.update_table(
+                parameters, project_base_folder, merge_fct, repositories,
+                changed, removed, load_pool, output_formats, compression,
+                report)
+        if output_paths is None:
+            df = Github_data_merger.load_table(parameters.project_folder,
+                                               repositories, merge_fct,
+                                               load_pool)
+            key = Github_data_merger.DEDUPLICATED_TABLES.get(table_name)
+            if key is not None and key in df.columns:
+                # The first row of an entity is kept
+                df = df.drop_duplicates(subset=key, keep="first")
+            df = Github_data_merger.prepare_table(df)
+            output_paths = Github_data_merger.write_table(
+                parameters, df, project_base_folder, table_name,
+                output_formats, compression, report)
+        if manifest is not None:
+            manifest.set_table(table_name, signatures, output_formats,
+                               settings, skipped_formats)
+        return output_paths, report
+
+    def get_output_formats(parameters):
+        """Returns the configured output formats, csv and pickle by
+        default."""
+        output_formats = utilities.get_parameter(parameters, "output_formats")
+        if output_formats is None:
+            return ["csv", "pickle"]
+        if isinstance(output_formats, str):
+            output_formats = [output_formats]
+        for output_format in output_formats:
+            if output_format not in Github_data_merger.OUTPUT_FORMATS:
+                print(f"Unknown output format {output_format}! Please use "
+                      f"{', '.join(Github_data_merger.OUTPUT_FORMATS)}.")
+                sys.exit()
+        if "parquet" in output_formats:
+            parquet_output.require_pyarrow()
+        return output_formats
+
+    def merge_pandas_tables(request_handler, project_base_folder, content,
+                            manifest=None, pipeline=None):
+        merge_fcts = Github_data_merger.CLASSES[content]
+        merge_workers = utilities.get_parameter(
+            request_handler.request.parameters, "merge_workers",
+            Github_data_merger.MERGE_WORKERS)
+        output_formats = Github_data_merger.get_output_formats(
+            request_handler.request.parameters)
         print(content, " - results stored in:")
-        for merge_fct in Github_data_merger.CLASSES[content]:
-            df = pd.DataFrame()
-            for index, repo in enumerate(request_handler.repository_list):
-                repo_base_folder = Path(
-                    request_handler.request.parameters.project_folder,
-                    repo.full_name.split('/')[0],
-                    repo.full_name.split('/')[1],
-                )
-                repo_df = merge_fct(repo_base_folder, repo.name)
-                df = pd.concat([df, repo_df], axis=0)
-                    
-            # replace new lines in commit messages
-            df = df.replace(r'\n',' ', regex=True) 
-            df.reset_index(inplace=True, drop=True)
-            file_name = merge_fct.__name__.split('_')[1]
-            csv_output_path = Path(project_base_folder, 
-                                   file_name + '.csv')
-            print("    " + str(csv_output_path))
-            df.to_csv(csv_output_path, index=False)
-            output_path = Path(project_base_folder, file_name + '.p')
-            with open(output_path, "wb") as f:
-                pickle.dump(df, f)
+        # The tables of a content type are merged in parallel, the
+        # repository tables of each of them are loaded by a shared pool
+        with ThreadPoolExecutor(max_workers=merge_workers) as load_pool, \
+             ThreadPoolExecutor(max_workers=len(merge_fcts)) as table_pool:
+            results = list(table_pool.map(
+                lambda merge_fct: Github_data_merger.merge_table(
+                    request_handler, project_base_folder, merge_fct,
+                    load_pool, output_formats, manifest, pipeline),
+                merge_fcts))
+        reports = []
+        for output_paths, report in results:
+            for output_path in output_paths:
+                print("    " + str(output_path))
+            reports.append(report)
+        for report in reports:
+            print(Github_data_merger.format_report(report))
+        return reports
+
+    def format_report(report):
+        if report.get("unchanged"):
+            return f"    {report['table']}: unchanged"
+        line = f"    {report['table']}: {report.get('rows', 0)} rows"
+        if "memory_mb" in report:
+            line += f", {report['memory_mb']:.1f} MB"
+        if "compact_memory_mb" in report:
+            line += f" ({report['compact_memory_mb']:.1f} MB compact)"
+        return line
 
     def get_Repositories(repo_base_folder, repo_name):
         data_dir = Path(repo_base_folder, Repository.Files.DATA_DIR)
@@ -82,7 +786,14 @@ class Github_data_merger():
         return df
 
     def get_Users(repo_base_folder, repo_name):
+        # Users are deduplicated across repositories, see UsersMembership
         df = Core.get_pandas_data_frame(repo_base_folder, Core.UserFiles.USERS)
+        return df
+
+    def get_UsersMembership(repo_base_folder, repo_name):
+        df = Core.get_pandas_data_frame(repo_base_folder, Core.UserFiles.USERS)
+        df = df[[column for column in ["id"] if column in df.columns]]
+        df = df.drop_duplicates()
         df['repo_name'] = repo_name
         return df
 
@@ -139,13 +850,66 @@ class Github_data_merger():
                          get_PullRequestReviewComments, get_PullRequestReactions],
         "Workflows": [get_Workflows, get_WorkflowRuns],
         "GitReleases": [get_GitReleases],
-        "Users": [get_Users]
+        "Users": [get_Users, get_UsersMembership]
     }
     
     RAW_DATA_FOLDER = "."
 
+    # Threads loading the tables of the individual repositories
+    MERGE_WORKERS = 4
+
+    OUTPUT_FORMATS = ["parquet", "csv", "pickle", "sqlite"]
+
+    # Raw file of each merged table in the folder of a repository
+    RAW_FILES = {
+        "Repositories": (Repository.Files.DATA_DIR, Repository.Files.REPOSITORY),
+        "Issues": (Issues.Files.DATA_DIR, Issues.Files.ISSUES),
+        "IssueComments": (Issues.Files.DATA_DIR, Issues.Files.COMMENTS),
+        "IssueEvents": (Issues.Files.DATA_DIR, Issues.Files.EVENTS),
+        "IssueReactions": (Issues.Files.DATA_DIR, Issues.Files.ISSUES_REACTIONS),
+        "Commits": (Version.Files.DATA_DIR, Version.Files.COMMITS),
+        "Edits": (Version.Files.DATA_DIR, Version.Files.EDITS),
+        "Users": ("", Core.UserFiles.USERS),
+        "UsersMembership": ("", Core.UserFiles.USERS),
+        "PullRequests": (PullRequests.Files.DATA_DIR,
+                         PullRequests.Files.PULL_REQUESTS),
+        "PullRequestReviews": (PullRequests.Files.DATA_DIR,
+                               PullRequests.Files.REVIEWS),
+        "PullRequestReviewComments": (PullRequests.Files.DATA_DIR,
+                                      PullRequests.Files.REVIEWS_COMMENTS),
+        "PullRequestReactions": (PullRequests.Files.DATA_DIR,
+                                 PullRequests.Files.PULL_REQUESTS_REACTIONS),
+        "Workflows": (Workflows.Files.DATA_DIR, Workflows.Files.WORKFLOWS),
+        "WorkflowRuns": (Workflows.Files.DATA_DIR, Workflows.Files.RUNS),
+        "GitReleases": (GitReleases.Files.DATA_DIR,
+                        GitReleases.Files.GIT_RELEASES),
+    }
+
+    # String columns stored as categoricals by compact_dtypes. Their values
+    # are few in every project (states, event types, ...), free text like
+    # titles or logins keeps the same dtype in all merges
+    CATEGORICAL_COLUMNS = ["repo_name", "state", "event", "conclusion",
+                           "content", "mergeable_state", "active_lock_reason",
+                           "label"]
+
+    MERGE_REPORT_FILE = "merge_report.csv"
+    REPORT_COLUMNS = ["table", "rows", "columns", "memory_mb",
+                      "compact_memory_mb", "unchanged"]
+
+    # Merged tables without a repo_name column are always merged completely
+    UNTAGGED_TABLES = ["Repositories", "Users"]
+
+    # Key columns of tables holding every entity once across repositories
+    DEDUPLICATED_TABLES = {"Users": "id"}
+
     @staticmethod
-    def merge(request_handler):
+    def merge(request_handler, pipeline=None):
+        parameters = request_handler.request.parameters
+        if utilities.get_parameter(parameters, "incremental_merge", False):
+            manifest = MergeManifest(parameters.project_folder)
+        else:
+            manifest = None
+        reports = []
         for content_element in request_handler.request.parameters.content:
             print("\n\n")
             if content_element in Github_data_merger.CLASSES:
@@ -154,6 +918,14 @@ class Github_data_merger():
                     Github_data_merger.RAW_DATA_FOLDER,
                 )
                 project_base_folder.mkdir(parents=True, exist_ok=True)
-                Github_data_merger.merge_pandas_tables(request_handler,
-                                                       project_base_folder,
-                                                       content_element)
+                reports += Github_data_merger.merge_pandas_tables(
+                    request_handler, project_base_folder, content_element,
+                    manifest, pipeline)
+                if manifest is not None:
+                    manifest.save()
+        if reports:
+            report_path = Path(parameters.project_folder,
+                               Github_data_merger.MERGE_REPORT_FILE)
+            pd.DataFrame(reports, columns=Github_data_merger.REPORT_COLUMNS) \
+                .to_csv(report_path, index=False)
+        return reports
@@ -0,0 +1,445 @@
+from pathlib import Path
+import datetime
+import pickle
+import sqlite3
+
+import pandas as pd
+
+from github2pandas_manager import parquet_output
+from github2pandas_manager import sqlite_output
+from github2pandas_manager.config_parser import YAML_RequestDefinition
+from github2pandas_manager.data_merger import Github_data_merger
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Column used by the date filter if a table does not name another one
+DATE_COLUMN = "created_at"
+
+
+def to_utc(value):
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+
+def in_range(column, since=None, until=None):
+    """Returns the mask of the rows between since and until (inclusive).
+    Naive times are taken as UTC, values which are no time are dropped."""
+    times = pd.to_datetime(column, errors="coerce", utc=True)
+    mask = times.notna()
+    if since is not None:
+        mask &= times >= to_utc(since)
+    if until is not None:
+        mask &= times <= to_utc(until)
+    return mask
+
+
+def get_date_bounds(since=None, until=None):
+    """Returns the dates one day around since and until. Pushed down
+    filters use these loose bounds, so different time zones and string
+    formats of the stored times never drop matching rows. The exact range
+    is applied by in_range afterwards."""
+    lower = None if since is None else \
+        (to_utc(since) - datetime.timedelta(days=1)).date()
+    upper = None if until is None else \
+        (to_utc(until) + datetime.timedelta(days=2)).date()
+    return lower, upper
+
+
+class ProjectTable():
+    """Lazy view of a table of a project.
+
+    Nothing is read until read() is called. filter() returns a new view,
+    the filters are pushed down to the source of the table: partitions and
+    row groups of a Parquet dataset, indexed queries of the SQLite output or
+    the raw files of the selected repositories. Pickle and csv outputs are
+    read completely and filtered afterwards.
+
+    Methods
+    -------
+    filter(repos=None, since=None, until=None, columns=None,
+           date_column=None):
+        Returns a view with additional filters.
+    read():
+        Reads the filtered table to a DataFrame.
+    get_source():
+        Returns the source the table would be read from.
+
+    """
+
+    def __init__(self, dataset, table_name, repos=None, since=None,
+                 until=None, columns=None, date_column=None):
+        """Constructor of ProjectTable Class.
+
+        Parameters
+        ----------
+        dataset : ProjectDataset
+            Project of the table.
+        table_name : str
+            Name of the merged table, e.g. Issues.
+        repos : list (str)
+            Repositories, given by name or full name (owner/name).
+        since : str or datetime
+            First time of the date range.
+        until : str or datetime
+            Last time of the date range.
+        columns : list (str)
+            Columns to read, all columns if None.
+        date_column : str
+            Time column of the date range, created_at by default.
+
+        """
+
+        self.dataset = dataset
+        self.table_name = table_name
+        self.repos = None if repos is None else [str(repo) for repo in repos]
+        self.since = since
+        self.until = until
+        self.columns = None if columns is None else list(columns)
+        self.date_column = date_column or DATE_COLUMN
+
+    def __repr__(self):
+        return f"ProjectTable({self.table_name}, source={self.get_source()})"
+
+    def filter(self, repos=None, since=None, until=None, columns=None,
+               date_column=None):
+        """Returns a new view restricted to repositories, a date range and
+        columns. Repositories and columns narrow the current filters."""
+        if isinstance(repos, str):
+            repos = [repos]
+        if repos is not None and self.repos is not None:
+            repos = [repo for repo in repos if repo in self.repos]
+        if columns is not None and self.columns is not None:
+            columns = [column for column in columns
+                       if column in self.columns]
+        return ProjectTable(
+            self.dataset, self.table_name,
+            repos=self.repos if repos is None else repos,
+            since=self.since if since is None else since,
+            until=self.until if until is None else until,
+            columns=self.columns if columns is None else columns,
+            date_column=date_column or self.date_column,
+        )
+
+    def get_repo_names(self):
+        # Merged tables except Parquet datasets identify repositories by
+        # name only
+        if self.repos is None:
+            return None
+        return sorted({repo.split('/')[-1] for repo in self.repos})
+
+    def get_source(self):
+        """Returns parquet, sqlite, raw, pickle or csv."""
+        dataset = self.dataset
+        table_name = self.table_name
+        tagged = table_name not in Github_data_merger.UNTAGGED_TABLES
+        if parquet_output.is_available():
+            if Path(dataset.get_output_path(table_name, "parquet"),
+                    parquet_output.SCHEMA_FILE).is_file():
+                return "parquet"
+            # Tables without repo_name are filtered by their raw files
+            if dataset.get_output_path(table_name, "parquet") \
+                    .with_suffix(".parquet").is_file() and \
+                    self.repos is None:
+                return "parquet"
+        if dataset.has_sqlite_table(table_name) and \
+                (self.repos is None or tagged):
+            return "sqlite"
+        # Only the raw files of the repositories are read
+        if self.repos is not None and table_name in dataset.merge_fcts:
+            return "raw"
+        for output_format in ["pickle", "csv"]:
+            if dataset.get_output_path(table_name, output_format).is_file():
+                return output_format
+        if dataset.get_raw_repositories(table_name):
+            return "raw"
+        raise FileNotFoundError(f"No data of table {table_name} in "
+                                f"{dataset.project_folder}.")
+
+    def read(self):
+        """Reads the filtered table to a DataFrame."""
+        source = self.get_source()
+        if source == "parquet":
+            df = self._read_parquet()
+        elif source == "sqlite":
+            df = self._read_sqlite()
+        elif source == "raw":
+            df = self._read_raw()
+        else:
+            path = self.dataset.get_output_path(self.table_name, source)
+            if source == "pickle":
+                with open(path, "rb") as f:
+                    df = pickle.load(f)
+            else:
+                df = pd.read_csv(path)
+        return self._apply_filters(df)
+
+    def _get_read_columns(self, names):
+        if self.columns is None:
+            return None
+        columns = [name for name in self.columns if name in names]
+        # The date column is needed for the exact date range
+        if (self.since is not None or self.until is not None) and \
+                self.date_column in names and \
+                self.date_column not in columns:
+            columns.append(self.date_column)
+        return columns
+
+    def _read_parquet(self):
+        path = self.dataset.get_output_path(self.table_name, "parquet")
+        schema_path = Path(path, parquet_output.SCHEMA_FILE)
+        if schema_path.is_file():
+            schema = pq.read_schema(schema_path)
+            dataset = ds.dataset(
+                path, schema=schema, format="parquet",
+                partitioning=parquet_output.get_partitioning(schema))
+        else:
+            dataset = ds.dataset(path.with_suffix(".parquet"),
+                                 format="parquet")
+            schema = dataset.schema
+        expression = None
+        if self.repos is not None and \
+                parquet_output.PARTITION_COLUMN in schema.names:
+            # Only the partitions of these repositories are opened
+            expression = ds.field(parquet_output.PARTITION_COLUMN).isin(
+                pa.array([parquet_output.get_partition_value(repo)
+                          for repo in self.repos if '/' in repo],
+                         type=pa.string()))
+            repo_names = [repo for repo in self.repos if '/' not in repo]
+            if repo_names:
+                expression |= ds.field(
+                    parquet_output.REPO_NAME_COLUMN).isin(repo_names)
+        date_expression = self._get_parquet_date_expression(schema)
+        if date_expression is not None:
+            expression = date_expression if expression is None else \
+                expression & date_expression
+        table = dataset.to_table(columns=self._get_read_columns(schema.names),
+                                 filter=expression)
+        return parquet_output.drop_partition_column(table.to_pandas())
+
+    def _get_parquet_date_expression(self, schema):
+        if self.since is None and self.until is None or \
+                self.date_column not in schema.names:
+            return None
+        arrow_type = schema.field(self.date_column).type
+        lower, upper = get_date_bounds(self.since, self.until)
+        if pa.types.is_timestamp(arrow_type):
+            def to_scalar(date):
+                timestamp = pd.Timestamp(date)
+                if arrow_type.tz is not None:
+                    timestamp = timestamp.tz_localize("UTC")
+                return pa.scalar(timestamp, type=arrow_type)
+        elif pa.types.is_string(arrow_type) or \
+                pa.types.is_large_string(arrow_type):
+            # ISO times compare like strings
+            def to_scalar(date):
+                return pa.scalar(date.isoformat(), type=arrow_type)
+        else:
+            return None
+        field = ds.field(self.date_column)
+        expression = None
+        if lower is not None:
+            expression = field >= to_scalar(lower)
+        if upper is not None:
+            upper_expression = field < to_scalar(upper)
+            expression = upper_expression if expression is None else \
+                expression & upper_expression
+        return expression
+
+    def _read_sqlite(self):
+        path = self.dataset.get_output_path(self.table_name, "sqlite")
+        connection = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+        try:
+            names = [row[1] for row in connection.execute(
+                "PRAGMA table_info("
+                f"{sqlite_output.quote(self.table_name)})").fetchall()]
+            columns = self._get_read_columns(names)
+            selection = "*" if columns is None else \
+                ", ".join(sqlite_output.quote(name) for name in columns)
+            conditions = []
+            values = []
+            repo_names = self.get_repo_names()
+            if repo_names is not None and \
+                    sqlite_output.REPOSITORY_COLUMN in names:
+                conditions.append(
+                    f"{sqlite_output.quote(sqlite_output.REPOSITORY_COLUMN)}"
+                    f" IN ({', '.join('?' for _ in repo_names)})")
+                values += repo_names
+            if self.date_column in names:
+                # Times are stored as ISO strings, see to_sql_value
+                lower, upper = get_date_bounds(self.since, self.until)
+                date_column = sqlite_output.quote(self.date_column)
+                if lower is not None:
+                    conditions.append(f"{date_column} >= ?")
+                    values.append(lower.isoformat())
+                if upper is not None:
+                    conditions.append(f"{date_column} < ?")
+                    values.append(upper.isoformat())
+            query = f"SELECT {selection} FROM " \
+                    f"{sqlite_output.quote(self.table_name)}"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            return pd.read_sql_query(query, connection, params=values)
+        finally:
+            connection.close()
+
+    def _read_raw(self):
+        merge_fct = self.dataset.merge_fcts[self.table_name]
+        repositories = self.dataset.get_raw_repositories(self.table_name)
+        if self.repos is not None:
+            repositories = [repo_full_name for repo_full_name in repositories
+                            if repo_full_name in self.repos or
+                            repo_full_name.split('/')[1] in self.repos]
+        dfs = []
+        for repo_full_name in repositories:
+            df = merge_fct(Github_data_merger.get_repo_base_folder(
+                self.dataset.project_folder, repo_full_name),
+                repo_full_name.split('/')[1])
+            if df is None:
+                continue
+            if self.columns is not None:
+                df = df[self._get_read_columns(df.columns)]
+            dfs.append(df)
+        if not dfs:
+            return pd.DataFrame(columns=self.columns)
+        df = pd.concat(dfs, axis=0)
+        key = Github_data_merger.DEDUPLICATED_TABLES.get(self.table_name)
+        if key is not None and key in df.columns:
+            df = df.drop_duplicates(subset=key, keep="first")
+        return df
+
+    def _apply_filters(self, df):
+        """Applies all filters exactly, sources which can not push down a
+        filter are filtered here."""
+        repo_names = self.get_repo_names()
+        if repo_names is not None and "repo_name" in df.columns:
+            df = df[df["repo_name"].astype(str).isin(repo_names)]
+        if (self.since is not None or self.until is not None) and \
+                self.date_column in df.columns:
+            df = df[in_range(df[self.date_column], self.since, self.until)]
+        if self.columns is not None:
+            df = df[[column for column in self.columns
+                     if column in df.columns]]
+        return df.reset_index(drop=True)
+
+
+class ProjectDataset():
+    """Read access to the data of a project.
+
+    Tables are opened lazily from the merged outputs (Parquet, SQLite,
+    pickle or csv) or, if they are not merged yet or only some
+    repositories are requested, from the raw files of the repositories.
+
+        dataset = ProjectDataset.from_config("my_project.yml")
+        issues = dataset["Issues"].filter(repos=["pandas"],
+                                          since="2021-01-01",
+                                          columns=["id", "title"])
+        df = issues.read()
+
+    Methods
+    -------
+    from_config(yml_filename):
+        Opens the project of a YAML configuration.
+    get_table_names():
+        Returns the tables available in the project.
+    get_repositories():
+        Returns the full names of the extracted repositories.
+    table(table_name):
+        Returns a lazy view of a table.
+
+    """
+
+    def __init__(self, project_folder):
+        """Constructor of ProjectDataset Class.
+
+        Parameters
+        ----------
+        project_folder : str
+            Project folder including the project name, as used by the
+            extraction.
+
+        """
+
+        self.project_folder = Path(project_folder)
+        if not self.project_folder.is_dir():
+            raise FileNotFoundError(
+                f"Project folder {self.project_folder} does not exist.")
+        self.base_folder = Path(self.project_folder,
+                                Github_data_merger.RAW_DATA_FOLDER)
+        self.merge_fcts = {
+            merge_fct.__name__.split('_')[1]: merge_fct
+            for merge_fcts in Github_data_merger.CLASSES.values()
+            for merge_fct in merge_fcts
+            if merge_fct.__name__.split('_')[1] in
+            Github_data_merger.RAW_FILES
+        }
+
+    @staticmethod
+    def from_config(yml_filename):
+        request = YAML_RequestDefinition(yml_filename)
+        return ProjectDataset(request.parameters.project_folder)
+
+    def __repr__(self):
+        return f"ProjectDataset({self.project_folder})"
+
+    def __getitem__(self, table_name):
+        return self.table(table_name)
+
+    def get_output_path(self, table_name, output_format):
+        return Github_data_merger.get_output_path(self.base_folder,
+                                                  table_name, output_format)
+
+    def has_sqlite_table(self, table_name):
+        path = self.get_output_path(table_name, "sqlite")
+        if not path.is_file():
+            return False
+        connection = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+        try:
+            row = connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+                " AND name = ?", (table_name,)).fetchone()
+        finally:
+            connection.close()
+        return row is not None
+
+    def get_raw_repositories(self, table_name):
+        """Returns the full names of the repositories with a raw file of a
+        table."""
+        data_dir, file_name = Github_data_merger.RAW_FILES[table_name]
+        pattern = Path("*", "*", data_dir, file_name).as_posix()
+        repositories = []
+        for path in sorted(self.project_folder.glob(pattern)):
+            repo_folder = path.parents[len(Path(data_dir).parts)]
+            repositories.append(
+                f"{repo_folder.parent.name}/{repo_folder.name}")
+        return repositories
+
+    def get_repositories(self):
+        """Returns the full names of all extracted repositories."""
+        return self.get_raw_repositories("Repositories")
+
+    def get_table_names(self):
+        """Returns the tables with merged outputs or raw files."""
+        table_names = []
+        for table_name in self.merge_fcts:
+            paths = [self.get_output_path(table_name, output_format)
+                     for output_format in ["csv", "pickle"]]
+            parquet_path = self.get_output_path(table_name, "parquet")
+            paths += [parquet_path, parquet_path.with_suffix(".parquet")]
+            if any(path.exists() for path in paths) or \
+                    self.has_sqlite_table(table_name) or \
+                    self.get_raw_repositories(table_name):
+                table_names.append(table_name)
+        return table_names
+
+    def table(self, table_name):
+        if table_name not in self.merge_fcts:
+            raise KeyError(f"Unknown table {table_name}! Please use "
+                           f"{', '.join(self.merge_fcts)}.")
+        return ProjectTable(self, table_name)
@@ -0,0 +1,142 @@
+from pathlib import Path
+import datetime
+import hashlib
+import json
+
+
+class RepositoryDescriptor():
+    """Compact description of a discovered repository.
+
+    Holds the few attributes the extractor and the merger use instead of
+    the PyGithub Repository object, which keeps its whole API response.
+    The extractor requests the full repository by its full name.
+    """
+
+    __slots__ = ["id", "full_name", "name", "size", "pushed_at",
+                 "default_branch"]
+
+    def __init__(self, id, full_name, name, size=None, pushed_at=None,
+                 default_branch=None):
+        self.id = id
+        self.full_name = full_name
+        self.name = name
+        self.size = size
+        self.pushed_at = pushed_at
+        self.default_branch = default_branch
+
+    def __repr__(self):
+        return f"RepositoryDescriptor({self.full_name})"
+
+    @staticmethod
+    def from_repository(repo):
+        """Returns the descriptor of a PyGithub Repository."""
+        if isinstance(repo, RepositoryDescriptor):
+            return repo
+        return RepositoryDescriptor(repo.id, repo.full_name, repo.name,
+                                    repo.size, repo.pushed_at,
+                                    repo.default_branch)
+
+    def to_list(self):
+        pushed_at = None if self.pushed_at is None else \
+            self.pushed_at.isoformat()
+        return [self.id, self.full_name, self.name, self.size, pushed_at,
+                self.default_branch]
+
+    @staticmethod
+    def from_list(values):
+        id, full_name, name, size, pushed_at, default_branch = values
+        if pushed_at is not None:
+            pushed_at = datetime.datetime.fromisoformat(pushed_at)
+        return RepositoryDescriptor(id, full_name, name, size, pushed_at,
+                                    default_branch)
+
+
+class DiscoveryCache():
+    """Manifest of the repositories found by a request handler.
+
+    The manifest is stored in the project folder under a hash of the
+    handler and its selection parameters, so a changed selection never
+    uses the repositories of another one. Manifests older than the time to
+    live are ignored and discovered again. Names which could not be
+    resolved are recorded, so a later run only has to resolve them again.
+
+    Methods
+    -------
+    get_key(handler_name, selection):
+        Returns the hash of a selection.
+    load():
+        Returns the cached repositories and failed names or None.
+    save(repositories, failed_names=None, created_at=None):
+        Writes the repositories to the manifest.
+
+    """
+
+    FILE_PREFIX = "discovery_"
+
+    def __init__(self, project_folder, handler_name, selection, ttl_hours):
+        """Constructor of DiscoveryCache Class.
+
+        Parameters
+        ----------
+        project_folder : str
+            Folder holding the manifest.
+        handler_name : str
+            Class name of the request handler.
+        selection : dict
+            Selection parameters of the handler.
+        ttl_hours : float
+            Time to live of the manifest in hours.
+
+        """
+
+        self.key = DiscoveryCache.get_key(handler_name, selection)
+        self.path = Path(project_folder,
+                         f"{DiscoveryCache.FILE_PREFIX}{self.key}.json")
+        self.handler_name = handler_name
+        self.selection = selection
+        self.ttl = datetime.timedelta(hours=ttl_hours)
+        # Creation time of the loaded manifest
+        self.created_at = None
+
+    @staticmethod
+    def get_key(handler_name, selection):
+        content = json.dumps([handler_name, selection], sort_keys=True,
+                             default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    def load(self):
+        """Returns the repositories and the error by failed name of the
+        manifest, None if there is no manifest or it is expired."""
+        if not self.path.is_file():
+            return None
+        with open(self.path, "r") as f:
+            manifest = json.load(f)
+        created_at = datetime.datetime.fromisoformat(manifest["created_at"])
+        if datetime.datetime.now(datetime.timezone.utc) - created_at > \
+                self.ttl:
+            return None
+        self.created_at = created_at
+        return ([RepositoryDescriptor.from_list(values)
+                 for values in manifest["repositories"]],
+                manifest.get("failed_names", {}))
+
+    def save(self, repositories, failed_names=None, created_at=None):
+        """Writes the manifest, replacing the previous file atomically. A
+        manifest updated by retried names keeps its creation time, so the
+        time to live still applies to its repositories."""
+        if created_at is None:
+            created_at = datetime.datetime.now(datetime.timezone.utc)
+        manifest = {
+            "created_at": created_at.isoformat(),
+            "handler": self.handler_name,
+            "selection": self.selection,
+            "repositories": [
+                RepositoryDescriptor.from_repository(repo).to_list()
+                for repo in repositories],
+            "failed_names": failed_names or {},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f, default=str)
+        temp_path.replace(self.path)
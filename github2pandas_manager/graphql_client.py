@@ -0,0 +1,289 @@
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+
+from github2pandas_manager import connection_pool
+from github2pandas_manager.discovery_cache import RepositoryDescriptor
+from github2pandas_manager.rate_limit import GOVERNOR, TokenPool
+
+# Fields of a repository node, the attributes of a RepositoryDescriptor
+REPOSITORY_FIELDS = """
+fragment RepositoryFields on Repository {
+  databaseId
+  nameWithOwner
+  name
+  diskUsage
+  pushedAt
+  defaultBranchRef { name }
+}
+"""
+
+
+class GraphQLError(Exception):
+    """Error of a GraphQL query without any data."""
+
+
+def parse_datetime(value):
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def to_descriptor(node):
+    """Returns the RepositoryDescriptor of a repository node. Ids and sizes
+    are the ones of the REST API (databaseId, diskUsage in KB)."""
+    default_branch = node.get("defaultBranchRef") or {}
+    return RepositoryDescriptor(node["databaseId"], node["nameWithOwner"],
+                                node["name"], node.get("diskUsage"),
+                                parse_datetime(node.get("pushedAt")),
+                                default_branch.get("name"))
+
+
+def get_alias_errors(errors):
+    """Returns the first error message of every top level alias."""
+    alias_errors = {}
+    for error in errors or []:
+        path = error.get("path") or [None]
+        alias_errors.setdefault(path[0], error.get("message", str(error)))
+    return alias_errors
+
+
+def get_batches(values, batch_size):
+    return [values[index:index + batch_size]
+            for index in range(0, len(values), batch_size)]
+
+
+class GraphQLClient():
+    """Client of the GitHub GraphQL API.
+
+    Queries are sent with the token of the pool which has the largest
+    remaining GraphQL budget, through the shared session of the connection
+    pool. The rate limit headers of the responses update the governor.
+
+    Methods
+    -------
+    execute(query, variables):
+        Sends a query and returns its data and errors.
+    resolve_repositories(repo_names, workers):
+        Looks up repositories by full name, 100 per query.
+    list_organizations(org_names, workers):
+        Lists the repositories of organizations.
+
+    """
+
+    URL = "https://api.github.com/graphql"
+    # Aliased repository lookups per query
+    REPOSITORIES_PER_QUERY = 100
+    # Organization connections per query, each returns up to 100 nodes
+    ORGANIZATIONS_PER_QUERY = 10
+    TIMEOUT = 60
+
+    def __init__(self, github_token, url=None):
+        """Constructor of GraphQLClient Class.
+
+        Parameters
+        ----------
+        github_token : str, list (str) or TokenPool
+            GitHub API Access Authentication token(s).
+        url : str
+            GraphQL endpoint, e.g. of a GitHub Enterprise server.
+
+        """
+
+        self.token_pool = TokenPool.from_tokens(github_token)
+        self.url = url or GraphQLClient.URL
+        protocol = self.url.split("://")[0]
+        self.session = connection_pool.SharedSessionConnection.get_session(
+            protocol)
+
+    def execute(self, query, variables=None):
+        """
+        execute(query, variables=None)
+
+        Sends a query. Errors of single aliases (e.g. a repository that
+        does not exist) are returned with the data of all other aliases.
+
+        Parameters
+        ----------
+        query : str
+            GraphQL query.
+        variables : dict
+            Variables of the query.
+
+        Returns
+        -------
+        tuple (dict, list) :
+            Data and errors of the response.
+
+        """
+
+        github_token, _ = self.token_pool.acquire("graphql", min_limit=1)
+        response = self.session.post(
+            self.url,
+            json={"query": query, "variables": variables or {}},
+            headers={"Authorization": f"bearer {github_token}"},
+            timeout=GraphQLClient.TIMEOUT,
+        )
+        GOVERNOR.update_from_headers(github_token, response.headers,
+                                     resource="graphql")
+        connection_pool.SharedSessionConnection.count_request()
+        response.raise_for_status()
+        result = response.json()
+        if result.get("data") is None:
+            raise GraphQLError(result.get("errors"))
+        return result["data"], result.get("errors", [])
+
+    def _resolve_batch(self, repo_names):
+        parameters = []
+        lookups = []
+        variables = {}
+        for index, repo_name in enumerate(repo_names):
+            owner, _, name = repo_name.partition("/")
+            parameters.append(f"$owner{index}: String!, $name{index}: String!")
+            lookups.append(f"r{index}: repository(owner: $owner{index}, "
+                           f"name: $name{index}) {{ ...RepositoryFields }}")
+            variables[f"owner{index}"] = owner
+            variables[f"name{index}"] = name
+        query = f"query({', '.join(parameters)}) {{\n" + \
+            "\n".join(lookups) + "\n}\n" + REPOSITORY_FIELDS
+        try:
+            data, errors = self.execute(query, variables)
+        except Exception as error:
+            return {}, {repo_name: str(error) for repo_name in repo_names}
+        alias_errors = get_alias_errors(errors)
+        repositories = {}
+        failures = {}
+        for index, repo_name in enumerate(repo_names):
+            node = data.get(f"r{index}")
+            if node is None:
+                failures[repo_name] = alias_errors.get(
+                    f"r{index}", "repository does not exist")
+                continue
+            try:
+                repositories[repo_name] = to_descriptor(node)
+            except Exception as error:
+                failures[repo_name] = f"invalid repository node: {error!r}"
+        return repositories, failures
+
+    def resolve_repositories(self, repo_names, workers=1):
+        """
+        resolve_repositories(repo_names, workers=1)
+
+        Looks up repositories by full name with up to 100 aliased
+        repository lookups per query. Batches are sent concurrently.
+
+        Parameters
+        ----------
+        repo_names : list (str)
+            Full names of the repositories (owner/name).
+        workers : int
+            Number of concurrent queries.
+
+        Returns
+        -------
+        tuple (list, dict) :
+            Descriptors in the order of the names and the error by name of
+            the repositories which could not be resolved.
+
+        """
+
+        batches = get_batches(list(repo_names),
+                              GraphQLClient.REPOSITORIES_PER_QUERY)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(self._resolve_batch, batches))
+        repositories = {}
+        failures = {}
+        for batch_repositories, batch_failures in results:
+            repositories.update(batch_repositories)
+            failures.update(batch_failures)
+        return [repositories[repo_name] for repo_name in repo_names
+                if repo_name in repositories], failures
+
+    def _list_batch(self, cursors):
+        """Requests the next page of the organizations, cursors holds the
+        end cursor of the previous page by organization (None at first)."""
+        parameters = []
+        connections = []
+        variables = {}
+        org_names = list(cursors)
+        for index, org_name in enumerate(org_names):
+            parameters.append(f"$login{index}: String!, $cursor{index}: String")
+            connections.append(
+                f"o{index}: organization(login: $login{index}) {{ "
+                f"repositories(first: 100, after: $cursor{index}, "
+                "orderBy: {field: CREATED_AT, direction: DESC}) { "
+                "pageInfo { hasNextPage endCursor } "
+                "nodes { ...RepositoryFields } } }")
+            variables[f"login{index}"] = org_name
+            variables[f"cursor{index}"] = cursors[org_name]
+        query = f"query({', '.join(parameters)}) {{\n" + \
+            "\n".join(connections) + "\n}\n" + REPOSITORY_FIELDS
+        data, errors = self.execute(query, variables)
+        alias_errors = get_alias_errors(errors)
+        pages = {}
+        for index, org_name in enumerate(org_names):
+            organization = data.get(f"o{index}")
+            if organization is None:
+                pages[org_name] = alias_errors.get(
+                    f"o{index}", "organization does not exist")
+            else:
+                pages[org_name] = organization["repositories"]
+        return pages
+
+    def list_organizations(self, org_names, workers=1):
+        """
+        list_organizations(org_names, workers=1)
+
+        Lists the repositories of organizations. Every query requests the
+        next page of up to 10 organizations, so small organizations are
+        listed together and large ones page through their connection.
+
+        Parameters
+        ----------
+        org_names : list (str)
+            Names of the organizations.
+        workers : int
+            Number of concurrent queries.
+
+        Returns
+        -------
+        tuple (list, dict) :
+            Descriptors in the order of the organizations and the error by
+            name of the organizations which could not be listed.
+
+        """
+
+        repositories = {org_name: [] for org_name in org_names}
+        failures = {}
+        cursors = {org_name: None for org_name in org_names}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while cursors:
+                batches = get_batches(list(cursors),
+                                      GraphQLClient.ORGANIZATIONS_PER_QUERY)
+                futures = [(batch, pool.submit(
+                    self._list_batch,
+                    {org_name: cursors[org_name] for org_name in batch}))
+                    for batch in batches]
+                cursors = {}
+                for batch, future in futures:
+                    try:
+                        pages = future.result()
+                    except Exception as error:
+                        pages = {org_name: str(error) for org_name in batch}
+                    for org_name, page in pages.items():
+                        if isinstance(page, str):
+                            failures[org_name] = page
+                            continue
+                        try:
+                            # Nodes hidden by partial errors are null
+                            repositories[org_name] += [
+                                to_descriptor(node) for node in page["nodes"]
+                                if node is not None]
+                        except Exception as error:
+                            failures[org_name] = \
+                                f"invalid repository node: {error!r}"
+                            continue
+                        if page["pageInfo"]["hasNextPage"]:
+                            cursors[org_name] = \
+                                page["pageInfo"]["endCursor"]
+        return [repo for org_name in org_names if org_name not in failures
+                for repo in repositories[org_name]], failures
@@ -0,0 +1,597 @@
+from pathlib import Path
+import base64
+import os
+import pickle
+import re
+
+import human_id
+import pandas as pd
+
+from github2pandas.core import Core
+from github2pandas.issues import Issues
+from github2pandas.pull_requests import PullRequests
+
+from github2pandas_manager.graphql_client import GraphQLClient, \
+    GraphQLError, parse_datetime
+from github2pandas_manager.incremental import to_utc
+
+REST_URL = "https://api.github.com"
+
+# Selection of an actor (user, bot, mannequin, ...) as in Users.p
+ACTOR = "... on Actor { login } ... on Node { id } ... on User { name email }"
+
+REACTION = f"databaseId content createdAt user {{ {ACTOR} }}"
+
+# Reaction contents of the REST API
+REACTION_CONTENTS = {
+    "THUMBS_UP": "+1",
+    "THUMBS_DOWN": "-1",
+}
+
+# Lock reasons of the REST API
+LOCK_REASONS = {
+    "OFF_TOPIC": "off-topic",
+    "TOO_HEATED": "too heated",
+}
+
+# Timeline items extracted as issue events and their additional fields.
+# All of them are reported by the issue events of the REST API, timeline
+# only items (comments, commits, reviews, cross references) are left out.
+ISSUE_EVENTS = {
+    "AssignedEvent": f"assignee {{ {ACTOR} }}",
+    "UnassignedEvent": f"assignee {{ {ACTOR} }}",
+    "ClosedEvent": "closer { ... on Commit { oid } }",
+    "ReopenedEvent": "",
+    "LabeledEvent": "label { name }",
+    "UnlabeledEvent": "label { name }",
+    "ReferencedEvent": "commit { oid }",
+    "RenamedTitleEvent": "",
+    "LockedEvent": "",
+    "UnlockedEvent": "",
+    "MilestonedEvent": "",
+    "DemilestonedEvent": "",
+    "MentionedEvent": "",
+    "SubscribedEvent": "",
+    "UnsubscribedEvent": "",
+    "PinnedEvent": "",
+    "UnpinnedEvent": "",
+    "TransferredEvent": "",
+}
+PULL_REQUEST_EVENTS = dict(ISSUE_EVENTS, **{
+    "MergedEvent": "commit { oid }",
+    "HeadRefDeletedEvent": "",
+    "HeadRefRestoredEvent": "",
+    "HeadRefForcePushedEvent": "",
+    "ReviewRequestedEvent": "",
+    "ReviewRequestRemovedEvent": "",
+    "ReviewDismissedEvent": "",
+    "ReadyForReviewEvent": "",
+    "ConvertToDraftEvent": "",
+})
+
+# Event names of the REST API which differ from the type names
+EVENT_NAMES = {
+    "RenamedTitleEvent": "renamed",
+}
+
+
+def read_msgpack_integers(data):
+    """Returns the unsigned integers of a MessagePack array or None."""
+    if not data or not 0x90 <= data[0] <= 0x9f:
+        return None
+    values = []
+    position = 1
+    for _ in range(data[0] & 0x0f):
+        marker = data[position]
+        position += 1
+        if marker <= 0x7f:
+            values.append(marker)
+        elif 0xcc <= marker <= 0xcf:
+            size = 1 << (marker - 0xcc)
+            values.append(int.from_bytes(data[position:position + size],
+                                         "big"))
+            position += size
+        else:
+            return None
+    return values
+
+
+def get_database_id(node_id):
+    """Returns the REST id encoded in a GraphQL node id or None. Legacy ids
+    are base64 of "<length>:<Type><id>", current ids ("LE_...") base64url
+    of a MessagePack array ending with the id."""
+    if not node_id:
+        return None
+    try:
+        if "_" in node_id:
+            data = node_id.split("_", 1)[1]
+            values = read_msgpack_integers(base64.urlsafe_b64decode(
+                data + "=" * (-len(data) % 4)))
+            return values[-1] if values else None
+        match = re.fullmatch(r"\d+:[A-Za-z]+(\d+)",
+                             base64.b64decode(node_id).decode("ascii"))
+        return int(match.group(1)) if match else None
+    except (ValueError, IndexError):
+        return None
+
+
+def to_snake_case(name):
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def get_event_name(type_name):
+    if type_name in EVENT_NAMES:
+        return EVENT_NAMES[type_name]
+    return to_snake_case(type_name[:-len("Event")])
+
+
+def get_timeline(events):
+    """Returns the item type filter and the node selection of the timeline
+    items of some event types."""
+    item_types = ", ".join(to_snake_case(type_name).upper()
+                           for type_name in events)
+    fragments = " ".join(
+        f"... on {type_name} {{ createdAt actor {{ {ACTOR} }} {fields} }}"
+        for type_name, fields in events.items())
+    return f", itemTypes: [{item_types}]", \
+        f"__typename ... on Node {{ id }} {fragments}"
+
+
+ISSUE_TIMELINE = get_timeline(ISSUE_EVENTS)
+PULL_REQUEST_TIMELINE = get_timeline(PULL_REQUEST_EVENTS)
+
+ISSUE_FIELDS = "id databaseId number title body state locked " \
+    f"activeLockReason createdAt updatedAt closedAt author {{ {ACTOR} }}"
+COMMENT_FIELDS = \
+    f"id databaseId body createdAt updatedAt author {{ {ACTOR} }}"
+PULL_REQUEST_FIELDS = "id databaseId number mergedAt mergeCommit { oid } " \
+    "isDraft updatedAt"
+REVIEW_FIELDS = f"id databaseId body state submittedAt author {{ {ACTOR} }}"
+REVIEW_COMMENT_FIELDS = "id databaseId body commit { oid } createdAt " \
+    "diffHunk originalCommit { oid } originalPosition path updatedAt " \
+    f"position author {{ {ACTOR} }}"
+
+# Node types by key: GraphQL type, scalar fields and nested connections
+# (field, page size, arguments, node type key or node selection). Nested
+# connections with more items are completed by follow-up queries.
+NODE_TYPES = {
+    "Issue": ("Issue", ISSUE_FIELDS, [
+        ("assignees", 10, "", ACTOR),
+        ("labels", 20, "", "name"),
+        ("comments", 20, "", "IssueComment"),
+        ("reactions", 20, "", REACTION),
+        ("timelineItems", 30) + ISSUE_TIMELINE,
+    ]),
+    # Pull requests are listed in Issues.p like in the REST API
+    "IssuePullRequest": ("PullRequest", ISSUE_FIELDS, [
+        ("assignees", 10, "", ACTOR),
+        ("labels", 20, "", "name"),
+        ("comments", 20, "", "IssueComment"),
+        ("reactions", 20, "", REACTION),
+        ("timelineItems", 30) + PULL_REQUEST_TIMELINE,
+    ]),
+    "IssueComment": ("IssueComment", COMMENT_FIELDS, [
+        ("reactions", 10, "", REACTION),
+    ]),
+    "PullRequest": ("PullRequest", PULL_REQUEST_FIELDS, [
+        ("reviews", 10, "", "PullRequestReview"),
+    ]),
+    "PullRequestReview": ("PullRequestReview", REVIEW_FIELDS, [
+        ("comments", 10, "", "PullRequestReviewComment"),
+    ]),
+    "PullRequestReviewComment": ("PullRequestReviewComment",
+                                 REVIEW_COMMENT_FIELDS, [
+                                     ("reactions", 10, "", REACTION),
+                                 ]),
+}
+
+
+def get_connection(field, page_size, nodes, arguments="", paged=False):
+    after = ", after: $cursor" if paged else ""
+    return f"{field}(first: {page_size}{after}{arguments}) {{ totalCount " \
+        f"pageInfo {{ hasNextPage endCursor }} nodes {{ {nodes} }} }}"
+
+
+def get_nodes(nodes):
+    return get_selection(nodes) if nodes in NODE_TYPES else nodes
+
+
+def get_selection(type_key):
+    """Returns the selection of a node type including its nested
+    connections."""
+    _, fields, connections = NODE_TYPES[type_key]
+    return " ".join([fields] + [
+        get_connection(field, page_size, get_nodes(nodes), arguments)
+        for field, page_size, arguments, nodes in connections])
+
+
+def get_rest_url(graphql_url):
+    """Returns the REST API root of a GraphQL endpoint, which prefixes the
+    url columns (GitHub Enterprise: https://host/api/v3)."""
+    if graphql_url is None or graphql_url == GraphQLClient.URL:
+        return REST_URL
+    root = graphql_url[:-len("/graphql")] if \
+        graphql_url.endswith("/graphql") else graphql_url
+    return root + "/v3" if root.endswith("/api") else root
+
+
+class UserRegistry():
+    """Anonymous ids of the users of a repository.
+
+    Users are stored in Users.p of the repository like by github2pandas,
+    the anonym_uuid is generated from the node id, so users extracted by
+    REST and by GraphQL get the same anonym_uuid.
+    """
+
+    def __init__(self, repo_base_folder):
+        self.repo_base_folder = Path(repo_base_folder)
+        users = Core.get_pandas_data_frame(self.repo_base_folder,
+                                           Core.UserFiles.USERS)
+        self.uuids = {} if users.empty else \
+            dict(zip(users["id"], users["anonym_uuid"]))
+        self.new_users = []
+
+    def get_uuid(self, actor):
+        """Returns the anonym_uuid of an actor node, None for deleted
+        users."""
+        if not actor or "id" not in actor:
+            return None
+        node_id = actor["id"]
+        if node_id in self.uuids:
+            return self.uuids[node_id]
+        if actor.get("login") == "invalid-email-address" and \
+                actor.get("name") is None:
+            return None
+        anonym_uuid = human_id.generate_id(seed=node_id)
+        self.uuids[node_id] = anonym_uuid
+        self.new_users.append({
+            "anonym_uuid": anonym_uuid,
+            "id": node_id,
+            "name": actor.get("name"),
+            "email": actor.get("email") or None,
+            "login": actor.get("login"),
+        })
+        return anonym_uuid
+
+    def save(self):
+        """Adds the new users to Users.p. The extractor never runs two tasks
+        of a repository at once (RepositorySerializer), so the file is only
+        changed by the content types of this task in the meantime."""
+        if not self.new_users:
+            return
+        users = Core.get_pandas_data_frame(self.repo_base_folder,
+                                           Core.UserFiles.USERS)
+        known_ids = set() if users.empty else set(users["id"])
+        new_users = [user for user in self.new_users
+                     if user["id"] not in known_ids]
+        users = pd.concat([users, pd.DataFrame(new_users)],
+                          ignore_index=True)
+        # Readers like the merge pipeline never see a partial file
+        users_file = Path(self.repo_base_folder, Core.UserFiles.USERS)
+        temp_file = users_file.with_suffix(".tmp")
+        with open(temp_file, "wb") as f:
+            pickle.dump(users, f)
+        os.replace(temp_file, users_file)
+        self.new_users = []
+
+
+class GraphQLExtractor():
+    """Extracts Issues and PullRequests of a repository by GraphQL queries.
+
+    Every query requests a page of issues or pull requests with their
+    comments, events, reviews and reactions, while the REST API needs
+    separate requests for the items of every issue. The tables have the
+    files, columns and ids written by github2pandas: event ids are decoded
+    from the GraphQL node ids and pull requests in Issues.p carry the id of
+    their issue, which is only offered by the REST API and listed with the
+    PyGithub repository.
+
+    Methods
+    -------
+    extract(content_element, since=None):
+        Extracts a content type.
+    extract_issues(since=None):
+        Writes the Issues tables.
+    extract_pull_requests(since=None):
+        Writes the PullRequests tables.
+
+    """
+
+    CONTENT = ["Issues", "PullRequests"]
+    # Issues or pull requests per query
+    PAGE_SIZE = 25
+    # Items per follow-up query of a nested connection
+    NESTED_PAGE_SIZE = 100
+
+    def __init__(self, client, repo, repo_full_name, repo_base_folder):
+        """Constructor of GraphQLExtractor Class.
+
+        Parameters
+        ----------
+        client : GraphQLClient
+            Client sending the queries.
+        repo : Repository
+            PyGithub repository, lists the issue ids of pull requests.
+        repo_full_name : str
+            Full name of the repository (owner/name).
+        repo_base_folder : Path
+            Folder of the repository tables.
+
+        """
+
+        self.client = client
+        self.repo = repo
+        self.repo_full_name = repo_full_name
+        self.owner, _, self.name = repo_full_name.partition("/")
+        self.repo_base_folder = Path(repo_base_folder)
+        self.api_url = f"{get_rest_url(client.url)}/repos/{repo_full_name}"
+        self.users = UserRegistry(repo_base_folder)
+
+    def extract(self, content_element, since=None):
+        """
+        extract(content_element, since=None)
+
+        Extracts Issues or PullRequests.
+
+        Parameters
+        ----------
+        content_element : str
+            Content type, one of GraphQLExtractor.CONTENT.
+        since : Timestamp
+            Only items updated since this UTC time are extracted.
+
+        """
+
+        if content_element == "Issues":
+            self.extract_issues(since)
+        elif content_element == "PullRequests":
+            self.extract_pull_requests(since)
+        else:
+            raise ValueError(f"{content_element} can not be extracted by "
+                             "GraphQL")
+
+    def complete(self, node, type_key):
+        """Requests the remaining pages of all nested connections of a
+        node."""
+        graphql_type, _, connections = NODE_TYPES[type_key]
+        for field, _, arguments, nodes in connections:
+            connection = node[field]
+            while connection["pageInfo"]["hasNextPage"]:
+                query = "query($id: ID!, $cursor: String) { node(id: $id) " \
+                    f"{{ ... on {graphql_type} {{ " + get_connection(
+                        field, GraphQLExtractor.NESTED_PAGE_SIZE,
+                        get_nodes(nodes), arguments, paged=True) + " } } }"
+                data, errors = self.client.execute(query, {
+                    "id": node["id"],
+                    "cursor": connection["pageInfo"]["endCursor"]})
+                if data.get("node") is None:
+                    raise GraphQLError(errors)
+                page = data["node"][field]
+                connection["nodes"] += page["nodes"]
+                connection["pageInfo"] = page["pageInfo"]
+            if nodes in NODE_TYPES:
+                for child in connection["nodes"]:
+                    self.complete(child, nodes)
+
+    def iter_nodes(self, field, type_key, since=None):
+        """Yields the completed issues or pull requests of the repository,
+        recently updated first. Pull requests can not be filtered by the
+        API, paging stops at the first one updated before since."""
+        parameters = "$owner: String!, $name: String!, $cursor: String"
+        arguments = ", orderBy: {field: UPDATED_AT, direction: DESC}"
+        variables = {"owner": self.owner, "name": self.name}
+        if since is not None and field == "issues":
+            parameters += ", $since: DateTime"
+            arguments += ", filterBy: {since: $since}"
+            variables["since"] = to_utc(since).isoformat()
+        query = f"query({parameters}) {{ repository(owner: $owner, " \
+            "name: $name) { " + get_connection(
+                field, GraphQLExtractor.PAGE_SIZE, get_selection(type_key),
+                arguments, paged=True) + " } }"
+        cursor = None
+        while True:
+            data, errors = self.client.execute(
+                query, dict(variables, cursor=cursor))
+            if data.get("repository") is None:
+                raise GraphQLError(errors)
+            connection = data["repository"][field]
+            for node in connection["nodes"]:
+                if since is not None and \
+                        parse_datetime(node["updatedAt"]) < since:
+                    return
+                self.complete(node, type_key)
+                yield node
+            if not connection["pageInfo"]["hasNextPage"]:
+                return
+            cursor = connection["pageInfo"]["endCursor"]
+
+    def save_tables(self, data_dir, tables):
+        data_dir = Path(self.repo_base_folder, data_dir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        for file_name, rows in tables.items():
+            with open(Path(data_dir, file_name), "wb") as f:
+                pickle.dump(pd.DataFrame(rows), f)
+        self.users.save()
+
+    def get_reaction_rows(self, node, parent_name):
+        return [{
+            "parent_id": node["databaseId"],
+            "parent_name": parent_name,
+            "content": REACTION_CONTENTS.get(reaction["content"],
+                                             reaction["content"].lower()),
+            "created_at": parse_datetime(reaction["createdAt"]),
+            "id": reaction["databaseId"],
+            "author": self.users.get_uuid(reaction["user"]),
+        } for reaction in node["reactions"]["nodes"]]
+
+    def get_event_row(self, event, issue_id):
+        row = {"author": self.users.get_uuid(event.get("actor"))}
+        if "assignee" in event:
+            row["assignee"] = self.users.get_uuid(event["assignee"])
+            row["assigner"] = row["author"]
+        commit = event.get("closer") or event.get("commit") or {}
+        row["commit_sha"] = commit.get("oid")
+        row["created_at"] = parse_datetime(event.get("createdAt"))
+        row["event"] = get_event_name(event["__typename"])
+        row["id"] = get_database_id(event.get("id"))
+        row["issue_id"] = issue_id
+        if "label" in event:
+            row["label"] = (event["label"] or {}).get("name")
+        return row
+
+    def get_issue_ids(self, numbers, since=None):
+        """Returns the issue id of pull requests by number. Issues are
+        listed recently updated first until all numbers are found."""
+        numbers = set(numbers)
+        issue_ids = {}
+        if not numbers:
+            return issue_ids
+        arguments = {"state": "all", "sort": "updated", "direction": "desc"}
+        if since is not None:
+            arguments["since"] = to_utc(since).tz_localize(None) \
+                .to_pydatetime()
+        for issue in self.repo.get_issues(**arguments):
+            if issue.number in numbers:
+                issue_ids[issue.number] = issue.id
+                if len(issue_ids) == len(numbers):
+                    break
+        return issue_ids
+
+    def add_issue_rows(self, node, tables, is_pull_request, issue_id):
+        issue_url = f"{self.api_url}/issues/{node['number']}"
+        events = [event for event in node["timelineItems"]["nodes"]
+                  if event and event.get("__typename") in PULL_REQUEST_EVENTS]
+        closed_events = [event for event in events
+                         if event["__typename"] == "ClosedEvent"]
+        lock_reason = node["activeLockReason"]
+        tables[Issues.Files.ISSUES].append({
+            "assignees": [self.users.get_uuid(user)
+                          for user in node["assignees"]["nodes"]],
+            "body": node["body"],
+            "closed_at": parse_datetime(node["closedAt"]),
+            "closed_by": self.users.get_uuid(closed_events[-1].get("actor"))
+            if closed_events else None,
+            "comments": node["comments"]["totalCount"],
+            "created_at": parse_datetime(node["createdAt"]),
+            "id": issue_id,
+            "labels": [label["name"] for label in node["labels"]["nodes"]],
+            "locked": node["locked"],
+            "active_lock_reason": None if lock_reason is None else
+            LOCK_REASONS.get(lock_reason, lock_reason.lower()),
+            "number": node["number"],
+            # Merged pull requests are closed issues
+            "state": "open" if node["state"] == "OPEN" else "closed",
+            "title": node["title"],
+            "updated_at": parse_datetime(node["updatedAt"]),
+            "url": issue_url,
+            "author": self.users.get_uuid(node["author"]),
+            "is_pull_request": is_pull_request,
+        })
+        tables[Issues.Files.ISSUES_REACTIONS] += self.get_reaction_rows(
+            dict(node, databaseId=issue_id), "issue")
+        for comment in node["comments"]["nodes"]:
+            tables[Issues.Files.COMMENTS].append({
+                "body": comment["body"],
+                "created_at": parse_datetime(comment["createdAt"]),
+                "id": comment["databaseId"],
+                "issue_url": issue_url,
+                "updated_at": parse_datetime(comment["updatedAt"]),
+                "author": self.users.get_uuid(comment["author"]),
+            })
+            tables[Issues.Files.ISSUES_REACTIONS] += self.get_reaction_rows(
+                comment, "comment")
+        tables[Issues.Files.EVENTS] += [
+            self.get_event_row(event, issue_id) for event in events]
+
+    def extract_issues(self, since=None):
+        """
+        extract_issues(since=None)
+
+        Writes Issues.p, Comments.p, Events.p and IssuesReactions.p. Pull
+        requests are included like in the issues of the REST API.
+
+        Parameters
+        ----------
+        since : Timestamp
+            Only issues updated since this UTC time are extracted.
+
+        """
+
+        tables = {Issues.Files.ISSUES: [], Issues.Files.COMMENTS: [],
+                  Issues.Files.EVENTS: [], Issues.Files.ISSUES_REACTIONS: []}
+        for node in self.iter_nodes("issues", "Issue", since):
+            self.add_issue_rows(node, tables, False, node["databaseId"])
+        nodes = list(self.iter_nodes("pullRequests", "IssuePullRequest",
+                                     since))
+        issue_ids = self.get_issue_ids([node["number"] for node in nodes],
+                                       since)
+        for node in nodes:
+            self.add_issue_rows(node, tables, True,
+                                issue_ids.get(node["number"]))
+        self.save_tables(Issues.Files.DATA_DIR, tables)
+
+    def add_pull_request_rows(self, node, tables):
+        url = f"{self.api_url}/pulls/{node['number']}"
+        merge_commit = node["mergeCommit"] or {}
+        tables[PullRequests.Files.PULL_REQUESTS].append({
+            "id": node["databaseId"],
+            "number": node["number"],
+            "merged_at": parse_datetime(node["mergedAt"]),
+            "merge_commit_sha": merge_commit.get("oid"),
+            "draft": node["isDraft"],
+            "updated_at": parse_datetime(node["updatedAt"]),
+            "url": url,
+        })
+        for review in node["reviews"]["nodes"]:
+            tables[PullRequests.Files.REVIEWS].append({
+                "pull_request_id": node["databaseId"],
+                "id": review["databaseId"],
+                "author": self.users.get_uuid(review["author"]),
+                "body": review["body"],
+                "state": review["state"],
+                "submitted_at": parse_datetime(review["submittedAt"]),
+            })
+            for comment in review["comments"]["nodes"]:
+                tables[PullRequests.Files.REVIEWS_COMMENTS].append({
+                    "body": comment["body"],
+                    "commit_sha": (comment["commit"] or {}).get("oid"),
+                    "created_at": parse_datetime(comment["createdAt"]),
+                    "diff_hunk": comment["diffHunk"],
+                    "id": comment["databaseId"],
+                    "original_commit_id":
+                        (comment["originalCommit"] or {}).get("oid"),
+                    "original_position": comment["originalPosition"],
+                    "path": comment["path"],
+                    "pull_request_url": url,
+                    "updated_at": parse_datetime(comment["updatedAt"]),
+                    "position": comment["position"],
+                    "author": self.users.get_uuid(comment["author"]),
+                })
+                tables[PullRequests.Files.PULL_REQUESTS_REACTIONS] += \
+                    self.get_reaction_rows(comment, "review_comment")
+
+    def extract_pull_requests(self, since=None):
+        """
+        extract_pull_requests(since=None)
+
+        Writes PullRequests.p, Reviews.p, ReviewsComments.p and
+        PullRequestsReactions.p. Like github2pandas, the Issues tables are
+        extracted first if they do not exist.
+
+        Parameters
+        ----------
+        since : Timestamp
+            Only pull requests updated since this UTC time are extracted.
+
+        """
+
+        if not Path(self.repo_base_folder, Issues.Files.DATA_DIR,
+                    Issues.Files.ISSUES).is_file():
+            self.extract_issues()
+        tables = {PullRequests.Files.PULL_REQUESTS: [],
+                  PullRequests.Files.REVIEWS: [],
+                  PullRequests.Files.REVIEWS_COMMENTS: [],
+                  PullRequests.Files.PULL_REQUESTS_REACTIONS: []}
+        for node in self.iter_nodes("pullRequests", "PullRequest", since):
+            self.add_pull_request_rows(node, tables)
+        self.save_tables(PullRequests.Files.DATA_DIR, tables)
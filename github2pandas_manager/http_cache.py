@@ -0,0 +1,206 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ConditionalRequestCache():
+    """Persistent cache of GitHub API responses.
+
+    Responses of GET requests are stored together with their ETag and
+    Last-Modified headers in a SQLite database. Repeated requests are
+    revalidated with If-None-Match / If-Modified-Since headers. A 304
+    answer does not count against the rate limit of GitHub and the cached
+    body is used instead. The cache size is bounded, the least recently
+    used responses are evicted first. Access times of cache hits are
+    written in batches, the last one by close().
+
+    Methods
+    -------
+    get_key(url, headers):
+        Returns the cache key of a request.
+    get(key):
+        Returns a cached response.
+    get_conditional_headers(entry):
+        Returns the revalidation headers of a cached response.
+    store(key, url, headers, body):
+        Stores a response.
+    flush_access_times():
+        Writes the access times of recent cache hits.
+    evict():
+        Removes least recently used responses exceeding the cache size.
+    close():
+        Writes pending access times and closes the connection of the
+        thread.
+
+    """
+
+    CACHE_FILE = "http_cache.sqlite"
+    # Number of stored responses after which the cache size is checked
+    EVICTION_INTERVAL = 100
+    # Number of cache hits after which their access times are written
+    ACCESS_INTERVAL = 100
+
+    def __init__(self, folder, max_size_mb=512, file_name=CACHE_FILE):
+        """Constructor of ConditionalRequestCache Class.
+
+        Parameters
+        ----------
+        folder : str
+            Folder holding the cache database, usually the project folder.
+        max_size_mb : int
+            Maximum size of the stored response bodies in megabytes.
+        file_name : str
+            File name of the cache database.
+
+        """
+
+        self.path = Path(folder, file_name)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_state()
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " url TEXT,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " headers TEXT,"
+                " body BLOB,"
+                " size INTEGER,"
+                " accessed_at REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+                " ON responses (accessed_at)"
+            )
+
+    def _init_state(self):
+        self.thread_data = threading.local()
+        self.lock = threading.Lock()
+        self.stored_responses = 0
+        self.access_times = {}
+        self.cache_hits = 0
+
+    def __getstate__(self):
+        # Connections are opened again by worker processes
+        return {"path": self.path, "max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def _connection(self):
+        # SQLite connections must not be shared by threads or processes
+        data = self.thread_data
+        if getattr(data, "pid", None) != os.getpid():
+            data.connection = sqlite3.connect(self.path, timeout=60)
+            data.pid = os.getpid()
+        return data.connection
+
+    @staticmethod
+    def get_key(url, headers):
+        """Returns the cache key of a request. Responses depend on the
+        requested media type. The token is not part of the key, so rotated
+        tokens of a TokenPool revalidate the same responses."""
+        key = "\n".join([url, headers.get("Accept", "")])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response of a key or None."""
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT etag, last_modified, headers, body FROM responses"
+                " WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.lock:
+            self.access_times[key] = time.time()
+            self.cache_hits += 1
+            flush = self.cache_hits % self.ACCESS_INTERVAL == 0
+        if flush:
+            self.flush_access_times()
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "headers": json.loads(row[2]),
+            "body": row[3],
+        }
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        """Returns the headers revalidating a cached response."""
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key, url, headers, body):
+        """Stores a response if it can be revalidated later."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, url, etag,"
+                " last_modified, headers, body, size, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, json.dumps(dict(headers)),
+                 body, len(body), time.time()))
+        with self.lock:
+            # The stored access time is newer than a pending one
+            self.access_times.pop(key, None)
+            self.stored_responses += 1
+            check_size = \
+                self.stored_responses % self.EVICTION_INTERVAL == 0
+        if check_size:
+            self.evict()
+
+    def flush_access_times(self):
+        """Writes the access times of the cache hits since the last call."""
+        with self.lock:
+            access_times, self.access_times = self.access_times, {}
+        if not access_times:
+            return
+        with self._connection() as connection:
+            connection.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key)
+                 for key, accessed_at in access_times.items()])
+
+    def evict(self):
+        """Removes the least recently used responses exceeding the size."""
+        self.flush_access_times()
+        with self._connection() as connection:
+            total_size = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total_size <= self.max_size:
+                return
+            rows = connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at"
+            ).fetchall()
+            evicted_keys = []
+            for key, size in rows:
+                if total_size <= self.max_size:
+                    break
+                evicted_keys.append((key,))
+                total_size -= size
+            connection.executemany("DELETE FROM responses WHERE key = ?",
+                                   evicted_keys)
+
+    def close(self):
+        """Writes the access times of the last cache hits and closes the
+        connection of the calling thread. The cache can be used again."""
+        self.flush_access_times()
+        data = self.thread_data
+        if getattr(data, "pid", None) == os.getpid():
+            data.connection.close()
+            data.pid = None
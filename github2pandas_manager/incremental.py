@@ -0,0 +1,185 @@
+from pathlib import Path
+import datetime
+import itertools
+import pickle
+
+import pandas as pd
+
+from github2pandas.issues import Issues
+from github2pandas.pull_requests import PullRequests
+from github2pandas.workflows import Workflows
+from github2pandas.core import Core
+
+
+def to_utc(timestamp):
+    """Converts naive (UTC) or timezone aware times to UTC timestamps."""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+
+def local_to_utc(timestamp):
+    """Converts naive local times (aggregation history) to UTC timestamps."""
+    local_timezone = datetime.datetime.now().astimezone().tzinfo
+    return pd.Timestamp(timestamp).tz_localize(local_timezone).tz_convert("UTC")
+
+
+class UpdatedSinceList(list):
+    """List of the items of a paginated list which changed since a time.
+
+    The paginated list has to be ordered by `time_attribute` descending.
+    Pages are only requested until the first older item is reached. The
+    list offers the parts of the PaginatedList interface used by
+    github2pandas.
+    """
+
+    @staticmethod
+    def from_paginated_list(paginated_list, time_attribute, since):
+        return UpdatedSinceList(itertools.takewhile(
+            lambda item: to_utc(getattr(item, time_attribute)) >= since,
+            paginated_list))
+
+    @staticmethod
+    def from_created_list(paginated_list, since, lifetime):
+        """Items of a list ordered by `created_at` descending, which are
+        updated until `lifetime` after their creation, are ordered by
+        `updated_at` descending and truncated at `since`."""
+        items = [item for item in itertools.takewhile(
+                     lambda item: to_utc(item.created_at) >= since - lifetime,
+                     paginated_list)
+                 if to_utc(item.updated_at) >= since]
+        items.sort(key=lambda item: to_utc(item.updated_at), reverse=True)
+        return UpdatedSinceList(items)
+
+    @property
+    def totalCount(self):
+        return len(self)
+
+    @property
+    def reversed(self):
+        return UpdatedSinceList(self[::-1])
+
+
+class UpdatedSinceRepository():
+    """Proxy of a PyGithub repository restricted to recent changes.
+
+    Issues and comments are requested with the `since` parameter of the
+    API, pull requests, issue events and workflow runs, which do not offer
+    such a parameter, are requested newest first and truncated at `since`.
+    All other attributes are passed to the wrapped repository.
+    """
+
+    # Workflow runs are listed by creation only, they are updated until
+    # they finish and may be re-run up to 30 days later
+    RUN_LIFETIME = pd.Timedelta(days=35)
+
+    def __init__(self, repo, since):
+        self._repo = repo
+        self._since = since
+
+    def __getattr__(self, name):
+        return getattr(self._repo, name)
+
+    def _get_since(self, kwargs):
+        """Returns the later of `since` and the time requested by
+        github2pandas when it continues a list beyond its maximum."""
+        since = self._since
+        if kwargs.get("since") is not None:
+            since = max(since, to_utc(kwargs["since"]))
+        return since.tz_localize(None).to_pydatetime()
+
+    def get_issues(self, *args, **kwargs):
+        kwargs["since"] = self._get_since(kwargs)
+        return self._repo.get_issues(*args, **kwargs)
+
+    def get_issues_comments(self, *args, **kwargs):
+        kwargs["since"] = self._get_since(kwargs)
+        return self._repo.get_issues_comments(*args, **kwargs)
+
+    def get_pulls_comments(self, *args, **kwargs):
+        kwargs["since"] = self._get_since(kwargs)
+        return self._repo.get_pulls_comments(*args, **kwargs)
+
+    def get_issues_events(self, *args, **kwargs):
+        return UpdatedSinceList.from_paginated_list(
+            self._repo.get_issues_events(*args, **kwargs), "created_at",
+            self._since)
+
+    def get_pulls(self, *args, **kwargs):
+        kwargs["sort"] = "updated"
+        kwargs["direction"] = "desc"
+        return UpdatedSinceList.from_paginated_list(
+            self._repo.get_pulls(*args, **kwargs), "updated_at", self._since)
+
+    def get_workflow_runs(self, *args, **kwargs):
+        return UpdatedSinceList.from_created_list(
+            self._repo.get_workflow_runs(*args, **kwargs), self._since,
+            UpdatedSinceRepository.RUN_LIFETIME)
+
+
+class Incremental_updater():
+
+    # Tables of a content type which are upserted after an incremental
+    # extraction, all of them hold an unique "id" column
+    TABLES = {
+        "Issues": (Issues.Files.DATA_DIR, [
+            Issues.Files.ISSUES, Issues.Files.COMMENTS,
+            Issues.Files.EVENTS, Issues.Files.ISSUES_REACTIONS]),
+        "PullRequests": (PullRequests.Files.DATA_DIR, [
+            PullRequests.Files.PULL_REQUESTS, PullRequests.Files.REVIEWS,
+            PullRequests.Files.REVIEWS_COMMENTS,
+            PullRequests.Files.PULL_REQUESTS_REACTIONS]),
+        "Workflows": (Workflows.Files.DATA_DIR, [
+            Workflows.Files.WORKFLOWS, Workflows.Files.RUNS]),
+    }
+
+    # Content types supporting incremental extraction
+    CONTENT = ["Issues", "PullRequests", "Workflows", "Version"]
+
+    # The last extraction is noted by the start of its task in server time,
+    # see connection_pool.get_server_now. The Date header is given in whole
+    # seconds and items may be saved with an updated_at shortly before they
+    # are listed, the overlap covers both and the offset of processes which
+    # received no response yet
+    OVERLAP = pd.Timedelta(hours=1)
+
+    @staticmethod
+    def get_since(last_extraction):
+        """Returns the UTC time from which changes have to be requested."""
+        return local_to_utc(last_extraction) - Incremental_updater.OVERLAP
+
+    @staticmethod
+    def is_unchanged(repo, since):
+        """Checks whether nothing was pushed to a repository since a time."""
+        return repo.pushed_at is not None and to_utc(repo.pushed_at) < since
+
+    @staticmethod
+    def load_tables(repo_base_folder, content_element):
+        if content_element not in Incremental_updater.TABLES:
+            return {}
+        data_dir_name, file_names = Incremental_updater.TABLES[content_element]
+        data_dir = Path(repo_base_folder, data_dir_name)
+        return {file_name: Core.get_pandas_data_frame(data_dir, file_name)
+                for file_name in file_names}
+
+    @staticmethod
+    def upsert_tables(repo_base_folder, content_element, old_tables):
+        """Merges the previously stored rows into the new partial tables.
+
+        Rows of the new extraction replace stored rows with the same id.
+        """
+        new_tables = Incremental_updater.load_tables(repo_base_folder,
+                                                     content_element)
+        data_dir_name, _ = Incremental_updater.TABLES[content_element]
+        for file_name, new_df in new_tables.items():
+            df = pd.concat([old_tables[file_name], new_df], axis=0)
+            if "id" in df.columns:
+                # Rows without id are kept, they can not be matched
+                df = df[~(df["id"].notna() &
+                          df.duplicated(subset="id", keep="last"))]
+            df.reset_index(inplace=True, drop=True)
+            output_path = Path(repo_base_folder, data_dir_name, file_name)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_path, "wb") as f:
+                pickle.dump(df, f)
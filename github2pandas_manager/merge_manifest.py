@@ -0,0 +1,131 @@
+from pathlib import Path
+import json
+import threading
+
+
+class MergeManifest():
+    """Manifest of the raw files consumed by the merger.
+
+    For every merged table the manifest records the size and modification
+    time of the raw file of each repository, the output formats and the
+    settings changing the written values. The next merge compares the raw
+    files with the manifest and only re-reads the repositories which
+    changed since then.
+
+    Methods
+    -------
+    get_signature(path):
+        Returns the size and modification time of a raw file.
+    get_changes(table_name, signatures, output_formats, settings=None):
+        Returns the changed and removed repositories of a table.
+    get_repository_signature(table_name, repo_full_name):
+        Returns the recorded signature of a raw file.
+    set_table(table_name, signatures, output_formats, settings=None,
+              skipped_formats=None):
+        Records the raw files of a merged table.
+    save():
+        Writes the manifest to the project folder.
+
+    """
+
+    MANIFEST_FILE = "merge_manifest.json"
+
+    def __init__(self, folder, file_name=MANIFEST_FILE):
+        """Constructor of MergeManifest Class.
+
+        Parameters
+        ----------
+        folder : str
+            Folder holding the manifest, usually the project folder.
+        file_name : str
+            File name of the manifest.
+
+        """
+
+        self.path = Path(folder, file_name)
+        self.lock = threading.Lock()
+        if self.path.is_file():
+            with open(self.path, "r") as f:
+                self.tables = json.load(f)
+        else:
+            self.tables = {}
+
+    @staticmethod
+    def get_signature(path):
+        """Returns [size, mtime_ns] of a raw file or None if it is missing."""
+        try:
+            stat = Path(path).stat()
+        except FileNotFoundError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get_changes(self, table_name, signatures, output_formats,
+                    settings=None):
+        """
+        get_changes(table_name, signatures, output_formats, settings=None)
+
+        Compares the raw files of a table with the previous merge.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the merged table.
+        signatures : dict
+            Signature of the raw file by repository full name.
+        output_formats : list (str)
+            Output formats of the current merge.
+        settings : dict
+            Settings of the current merge which change the written values
+            (JSON serializable).
+
+        Returns
+        -------
+        tuple or None :
+            Lists of the changed or new and of the removed repositories,
+            None if the table was not merged to these formats with these
+            settings before.
+
+        """
+
+        with self.lock:
+            entry = self.tables.get(table_name)
+        if entry is None or entry["output_formats"] != list(output_formats) \
+                or entry.get("settings") != settings:
+            return None
+        previous = entry["repositories"]
+        changed = [repo_full_name
+                   for repo_full_name, signature in signatures.items()
+                   if previous.get(repo_full_name, False) != signature]
+        removed = [repo_full_name for repo_full_name in previous
+                   if repo_full_name not in signatures]
+        return changed, removed
+
+    def get_repository_signature(self, table_name, repo_full_name):
+        """Returns the signature of a raw file recorded by the previous
+        merge or None."""
+        with self.lock:
+            entry = self.tables.get(table_name)
+        if entry is None:
+            return None
+        return entry["repositories"].get(repo_full_name)
+
+    def set_table(self, table_name, signatures, output_formats,
+                  settings=None, skipped_formats=None):
+        """Records the raw files, output formats and settings of a merged
+        table. Skipped formats were requested, but are not written and
+        their previous outputs were removed."""
+        with self.lock:
+            self.tables[table_name] = {
+                "output_formats": list(output_formats),
+                "skipped_formats": list(skipped_formats or []),
+                "settings": settings,
+                "repositories": signatures,
+            }
+
+    def save(self):
+        """Writes the manifest, replacing the previous file atomically."""
+        with self.lock:
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w") as f:
+                json.dump(self.tables, f)
+            temp_path.replace(self.path)
@@ -0,0 +1,146 @@
+from pathlib import Path
+import queue
+import threading
+
+from github2pandas_manager import utilities
+from github2pandas_manager.data_merger import Github_data_merger
+from github2pandas_manager.merge_manifest import MergeManifest
+
+
+class MergePipeline():
+    """Merge stage of the streaming merge running concurrently with the
+    extraction.
+
+    The extractor hands every repository whose tasks are done to the
+    pipeline, a consumer thread reads its raw tables meanwhile and writes
+    them to the streams of the streaming merge right away. With the
+    incremental merge, raw files which did not change since the previous
+    merge are not read. When the extraction is finished, the merge only has
+    to read the repositories the pipeline did not get, to merge the tables
+    without repo_name and to complete the outputs.
+
+    Methods
+    -------
+    start():
+        Starts the consumer thread.
+    repo_finished(repo_full_name):
+        Hands a finished repository to the consumer.
+    finish():
+        Waits for the consumer and completes the merge.
+
+    """
+
+    def __init__(self, request_handler):
+        """Constructor of MergePipeline Class.
+
+        Parameters
+        ----------
+        request_handler : RequestHandler
+            Handler of the repositories being extracted.
+
+        Attributes
+        ----------
+        streams : dict
+            Open streams of the streaming merge by table name.
+        manifest : MergeManifest
+            Manifest of the previous merge, None without incremental
+            merge.
+
+        """
+
+        self.request_handler = request_handler
+        self.parameters = request_handler.request.parameters
+        self.output_formats = Github_data_merger.get_output_formats(
+            self.parameters)
+        self.compression = utilities.get_parameter(
+            self.parameters, "parquet_compression", "zstd")
+        self.merge_fcts = [
+            merge_fct for content_element in self.parameters.content
+            if content_element in Github_data_merger.CLASSES
+            for merge_fct in Github_data_merger.CLASSES[content_element]
+        ]
+        self.streams = {}
+        self.manifest = None
+        if utilities.get_parameter(self.parameters, "incremental_merge",
+                                   False):
+            self.manifest = MergeManifest(self.parameters.project_folder)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._consume, daemon=True)
+
+    def start(self):
+        project_base_folder = Path(self.parameters.project_folder,
+                                   Github_data_merger.RAW_DATA_FOLDER)
+        project_base_folder.mkdir(parents=True, exist_ok=True)
+        for merge_fct in self.merge_fcts:
+            table_name = merge_fct.__name__.split('_')[1]
+            streamed_formats = Github_data_merger.get_streamed_formats(
+                self.parameters, self.output_formats, table_name)
+            if streamed_formats is None:
+                continue
+            # Only the outputs of changed repositories are replaced, they
+            # are added to the stream as they are handed over
+            changes = None
+            if self.manifest is not None and self.manifest.get_changes(
+                    table_name, {}, streamed_formats,
+                    Github_data_merger.get_output_settings(
+                        self.parameters, table_name,
+                        streamed_formats)) is not None and \
+                    Github_data_merger.can_update_stream(
+                        project_base_folder, table_name, streamed_formats):
+                changes = ([], [])
+            self.streams[table_name] = Github_data_merger.open_stream(
+                project_base_folder, table_name, streamed_formats, changes)
+        self.thread.start()
+
+    def repo_finished(self, repo_full_name):
+        self.queue.put(repo_full_name)
+
+    def _consume(self):
+        while True:
+            repo_full_name = self.queue.get()
+            if repo_full_name is None:
+                break
+            try:
+                self._merge_repository(repo_full_name)
+            except Exception as error:
+                # The merge reads the repository again
+                print(f"Merging {repo_full_name} failed: {error}")
+
+    def _merge_repository(self, repo_full_name):
+        project_folder = self.parameters.project_folder
+        repo_base_folder = Github_data_merger.get_repo_base_folder(
+            project_folder, repo_full_name)
+        repo_name = repo_full_name.split('/')[1]
+        for merge_fct in self.merge_fcts:
+            table_name = merge_fct.__name__.split('_')[1]
+            # Tables merged in memory are read by the merge
+            if table_name not in self.streams:
+                continue
+            signature = MergeManifest.get_signature(
+                Github_data_merger.get_raw_file_path(
+                    project_folder, repo_full_name, table_name))
+            if self._is_unchanged(table_name, repo_full_name, signature):
+                continue
+            df = merge_fct(repo_base_folder, repo_name)
+            Github_data_merger.write_stream(
+                self.parameters, self.streams[table_name], repo_full_name,
+                df, self.compression)
+
+    def _is_unchanged(self, table_name, repo_full_name, signature):
+        """Checks whether the outputs of the previous merge hold the table
+        of a repository already."""
+        if self.manifest is None or signature is None or \
+                signature != self.manifest.get_repository_signature(
+                    table_name, repo_full_name):
+            return False
+        stream = self.streams[table_name]
+        # Repositories sharing the name of a changed one are written again
+        return stream["repo_names"] is not None and \
+            repo_full_name.split('/')[1] not in stream["repo_names"]
+
+    def finish(self):
+        """Waits until all handed repositories are read and merges the
+        tables. Returns the merge reports."""
+        self.queue.put(None)
+        self.thread.join()
+        return Github_data_merger.merge(self.request_handler, pipeline=self)
@@ -0,0 +1,392 @@
+from pathlib import Path
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Column partitioning the merged tables, repo_name is not unique across
+# owners. Its values are given by get_partition_value, the column is
+# dropped when a dataset is read.
+PARTITION_COLUMN = "repo"
+# Column naming the repository in the merged tables
+REPO_NAME_COLUMN = "repo_name"
+# File holding the schema of a dataset, ignored when the data is read
+SCHEMA_FILE = "_common_metadata"
+
+
+def get_partition_value(repo_full_name):
+    """Returns the partition of a repository, owner__name. GitHub logins
+    hold no underscores, so the first one separates owner and name."""
+    return repo_full_name.replace("/", "__", 1)
+
+
+def get_partition_repo_name(partition_value):
+    """Returns the repository name of a partition value."""
+    return partition_value.split("__", 1)[-1]
+
+
+def is_available():
+    """Checks whether pyarrow is installed."""
+    return pa is not None
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "Parquet output requires pyarrow. Install it by "
+            "pip install github2pandas_manager[parquet] or choose the "
+            "output formats csv and pickle.")
+
+
+def normalize_column(column):
+    """Converts object columns of mixed content to strings, which can not
+    be represented by a single Arrow type otherwise."""
+    try:
+        pa.array(column, from_pandas=True)
+        return column
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return column.map(lambda value: None if is_missing(value)
+                          else str(value))
+
+
+def is_missing(value):
+    return value is None or value is pd.NA or value is pd.NaT or \
+        (isinstance(value, float) and value != value)
+
+
+def get_schema(inferred_schema):
+    """
+    get_schema(inferred_schema)
+
+    Returns the explicit Arrow schema of a merged table. Columns without
+    any value, which Arrow infers as null type, the partition column and
+    repo_name are stored as strings, so the schemas of all partitions match.
+
+    Parameters
+    ----------
+    inferred_schema : Schema
+        Schema inferred by Arrow from the merged table.
+
+    Returns
+    -------
+    Schema :
+        Arrow schema of the table.
+
+    """
+
+    fields = []
+    for field in inferred_schema:
+        if field.name in (PARTITION_COLUMN, REPO_NAME_COLUMN) or \
+                pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def to_arrow_table(df):
+    """Converts a merged table to an Arrow table with an explicit schema."""
+    require_pyarrow()
+    df = df.copy()
+    for name in df.columns[df.dtypes == object]:
+        df[name] = normalize_column(df[name])
+    for name in (PARTITION_COLUMN, REPO_NAME_COLUMN):
+        if name in df.columns:
+            df[name] = df[name].astype(str)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema = get_schema(table.schema).with_metadata(table.schema.metadata)
+    return table.cast(schema)
+
+
+def write_dataset(df, output_path, compression="zstd"):
+    """
+    write_dataset(df, output_path, compression="zstd")
+
+    Writes a merged table as a Parquet dataset. Tables with a partition
+    column are partitioned by it (output_path/repo=<owner>__<name>/...),
+    so readers only open the files of the requested repositories. Tables
+    without it are written to a single file output_path.parquet. A
+    previous dataset of the table is replaced.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Merged table, with the partition column if it holds repo_name.
+    output_path : Path
+        Path of the dataset without suffix.
+    compression : str
+        Parquet compression codec.
+
+    Returns
+    -------
+    Path :
+        Path of the dataset folder or file.
+
+    """
+
+    table = to_arrow_table(df)
+    output_path = Path(output_path)
+    file_path = output_path.with_suffix(".parquet")
+    # Outputs of the other layout are removed, e.g. of an older version
+    if PARTITION_COLUMN not in table.column_names:
+        if output_path.is_dir():
+            shutil.rmtree(output_path)
+        pq.write_table(table, file_path, compression=compression)
+        return file_path
+    if file_path.is_file():
+        file_path.unlink()
+    if output_path.is_dir():
+        shutil.rmtree(output_path)
+    output_path.mkdir(parents=True)
+    ds.write_dataset(
+        table,
+        output_path,
+        format="parquet",
+        partitioning=get_partitioning(table.schema),
+        file_options=ds.ParquetFileFormat().make_write_options(
+            compression=compression),
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+    )
+    pq.write_metadata(table.schema, Path(output_path, SCHEMA_FILE))
+    return output_path
+
+
+def get_partitioning(schema):
+    return ds.partitioning(pa.schema([schema.field(PARTITION_COLUMN)]),
+                           flavor="hive")
+
+
+def is_partitioned(output_path):
+    """Checks whether a dataset exists and is partitioned by repository
+    like write_dataset does."""
+    schema_path = Path(output_path, SCHEMA_FILE)
+    return schema_path.is_file() and \
+        PARTITION_COLUMN in pq.read_schema(schema_path).names
+
+
+def replace_partitions(df, output_path, partition_values, compression="zstd"):
+    """
+    replace_partitions(df, output_path, partition_values, compression="zstd")
+
+    Replaces the partitions of some repositories in a dataset written by
+    write_dataset. The new rows have to match the stored schema.
+
+    Parameters
+    ----------
+    df : DataFrame
+        New rows of the replaced partitions.
+    output_path : Path
+        Path of the dataset folder.
+    partition_values : list (str)
+        Values of all replaced partitions, see get_partition_value.
+        Partitions without new rows are removed.
+    compression : str
+        Parquet compression codec.
+
+    Returns
+    -------
+    bool :
+        False if the dataset does not exist or the schema of the new rows
+        differs, the dataset has to be written completely then.
+
+    """
+
+    require_pyarrow()
+    if not is_partitioned(output_path):
+        return False
+    schema = pq.read_schema(Path(output_path, SCHEMA_FILE))
+    table = to_arrow_table(df)
+    if table.num_rows > 0:
+        if set(table.column_names) != set(schema.names):
+            return False
+        try:
+            table = table.select(schema.names).cast(schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            return False
+    partitioning = get_partitioning(schema)
+    for value in partition_values:
+        partition_dir, _ = partitioning.format(
+            ds.field(PARTITION_COLUMN) == str(value))
+        shutil.rmtree(Path(output_path, partition_dir), ignore_errors=True)
+    if table.num_rows > 0:
+        ds.write_dataset(
+            table,
+            output_path,
+            format="parquet",
+            partitioning=partitioning,
+            file_options=ds.ParquetFileFormat().make_write_options(
+                compression=compression),
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="delete_matching",
+        )
+    return True
+
+
+def read_table(output_path):
+    """Reads a dataset written by write_dataset to a DataFrame."""
+    require_pyarrow()
+    schema = pq.read_schema(Path(output_path, SCHEMA_FILE))
+    dataset = ds.dataset(output_path, schema=schema, format="parquet",
+                         partitioning=get_partitioning(schema))
+    return drop_partition_column(dataset.to_table().to_pandas())
+
+
+def drop_partition_column(df):
+    """Returns a table without the partition column, like the other
+    output formats."""
+    if PARTITION_COLUMN not in df.columns:
+        return df
+    return df.drop(columns=[PARTITION_COLUMN])
+
+
+def get_partition_dir(output_path, value):
+    partitioning = ds.partitioning(
+        pa.schema([pa.field(PARTITION_COLUMN, pa.string())]), flavor="hive")
+    partition_dir, _ = partitioning.format(
+        ds.field(PARTITION_COLUMN) == str(value))
+    return Path(output_path, partition_dir)
+
+
+def remove_partitions(output_path, repo_names):
+    """Removes the partitions of all repositories with one of the names."""
+    repo_names = {str(repo_name) for repo_name in repo_names}
+    for partition_dir in Path(output_path).glob(f"{PARTITION_COLUMN}=*"):
+        partition_value = partition_dir.name.split("=", 1)[1]
+        if get_partition_repo_name(partition_value) in repo_names:
+            shutil.rmtree(partition_dir)
+
+
+def write_partition_file(df, output_path, value, file_stem,
+                         compression="zstd"):
+    """
+    write_partition_file(df, output_path, value, file_stem,
+                         compression="zstd")
+
+    Writes the rows of one repository to a file in its partition. Used by
+    the streaming merge, which never holds more than one repository table.
+    finalize_dataset has to be called after the last file was written.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Table of a single repository.
+    output_path : Path
+        Path of the dataset folder.
+    value : str
+        Partition of the repository, see get_partition_value.
+    file_stem : str
+        File name, unique within the partition.
+    compression : str
+        Parquet compression codec.
+
+    """
+
+    table = to_arrow_table(df)
+    if table.num_rows == 0:
+        return
+    if PARTITION_COLUMN in table.column_names:
+        # The value is encoded in the folder name like in write_dataset
+        table = table.drop([PARTITION_COLUMN])
+    partition_dir = get_partition_dir(output_path, value)
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, Path(partition_dir, f"part-{file_stem}.parquet"),
+                   compression=compression)
+
+
+def get_common_type(type_a, type_b):
+    if pa.types.is_null(type_a):
+        return type_b
+    if pa.types.is_null(type_b) or type_a == type_b:
+        return type_a
+    if pa.types.is_integer(type_a) and pa.types.is_integer(type_b):
+        return pa.int64()
+    if (pa.types.is_integer(type_a) or pa.types.is_floating(type_a)) and \
+            (pa.types.is_integer(type_b) or pa.types.is_floating(type_b)):
+        return pa.float64()
+    if pa.types.is_string(type_a) and pa.types.is_string(type_b) or \
+            pa.types.is_large_string(type_a) and \
+            pa.types.is_large_string(type_b):
+        return type_a
+    return pa.large_string()
+
+
+def cast_column(column, arrow_type):
+    try:
+        return column.cast(arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        values = column.to_pandas().map(
+            lambda value: None if is_missing(value) else str(value))
+        return pa.array(values, type=arrow_type)
+
+
+def finalize_dataset(output_path, compression="zstd"):
+    """
+    finalize_dataset(output_path, compression="zstd")
+
+    Unifies the schemas of the files written by write_partition_file.
+    Columns with conflicting types in different repositories are stored
+    with a common type, only files of deviating repositories are read and
+    written again. The unified schema is stored in _common_metadata.
+
+    Parameters
+    ----------
+    output_path : Path
+        Path of the dataset folder.
+    compression : str
+        Parquet compression codec.
+
+    """
+
+    require_pyarrow()
+    file_schemas = {file_path: pq.read_schema(file_path)
+                    for file_path in sorted(Path(output_path).glob(
+                        f"{PARTITION_COLUMN}=*/*.parquet"))}
+    types = {}
+    for schema in file_schemas.values():
+        for field in schema:
+            types[field.name] = get_common_type(
+                types.get(field.name, pa.null()), field.type)
+    fields = [pa.field(name, pa.string() if pa.types.is_null(arrow_type)
+                       else arrow_type)
+              for name, arrow_type in types.items()]
+    schema = pa.schema(fields + [pa.field(PARTITION_COLUMN, pa.string())])
+    for file_path, file_schema in file_schemas.items():
+        deviating = [field.name for field in file_schema
+                     if field.type != schema.field(field.name).type]
+        if not deviating:
+            continue
+        table = pq.ParquetFile(file_path).read()
+        for name in deviating:
+            index = table.schema.get_field_index(name)
+            table = table.set_column(
+                index, name,
+                cast_column(table.column(name), schema.field(name).type))
+        pq.write_table(table, file_path, compression=compression)
+    Path(output_path).mkdir(parents=True, exist_ok=True)
+    pq.write_metadata(schema, Path(output_path, SCHEMA_FILE))
+
+
+def replace_dataset(dataset_path, output_path):
+    """Replaces the dataset or file of a table by a dataset written to
+    another folder."""
+    output_path = Path(output_path)
+    file_path = output_path.with_suffix(".parquet")
+    if file_path.is_file():
+        file_path.unlink()
+    if output_path.is_dir():
+        shutil.rmtree(output_path)
+    Path(dataset_path).replace(output_path)
+
+
+def count_rows(output_path):
+    """Counts the rows of a dataset from the Parquet file footers."""
+    require_pyarrow()
+    schema = pq.read_schema(Path(output_path, SCHEMA_FILE))
+    return ds.dataset(output_path, schema=schema, format="parquet",
+                      partitioning=get_partitioning(schema)).count_rows()
@@ -0,0 +1,460 @@
+from contextlib import contextmanager
+import itertools
+import threading
+import time
+
+from github2pandas_manager import utilities
+
+
+class RateLimitGovernor():
+    """Shared bookkeeping of the GitHub API rate limit buckets.
+
+    The governor keeps the state of the core, search and GraphQL buckets
+    of every token as reported by the response headers of the GitHub API,
+    which are passed in by the shared connections of the connection pool.
+    Callers ask for request budget before sending requests and are only
+    put to sleep if a bucket is exhausted and its reset time lies in the
+    future. Handed out budget is kept as reservations apart from the
+    remaining requests reported by the server, every response spends one
+    request of the reservations of its token.
+
+    Methods
+    -------
+    update(github_token, resource, remaining, limit, reset):
+        Stores the state of a rate limit bucket.
+    update_from_headers(github_token, headers, resource, spent):
+        Updates a bucket from the X-RateLimit headers of a response.
+    get_bucket(github_token, resource):
+        Returns the current state of a bucket.
+    acquire(github_token, resource, cost, min_limit, show_msg):
+        Hands out request budget and waits for a reset if necessary.
+    release(github_token, resource, reservation):
+        Returns the unspent budget of a reservation.
+
+    """
+
+    RESOURCES = ["core", "search", "graphql"]
+
+    def __init__(self):
+        """Constructor of RateLimitGovernor Class.
+
+        Attributes
+        ----------
+        buckets : dict
+            Bucket state by (token, resource) with the keys remaining,
+            limit and reset (epoch seconds).
+        reservations : dict
+            Unspent reservations by (token, resource), a dict of the
+            outstanding requests and the reserving thread by reservation id.
+        lock : threading.Lock
+            Lock protecting the buckets against concurrent updates.
+
+        """
+
+        self.buckets = {}
+        self.reservations = {}
+        self.reservation_ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def update(self, github_token, resource, remaining, limit, reset):
+        """
+        update(github_token, resource, remaining, limit, reset)
+
+        Stores the state of a rate limit bucket.
+
+        Parameters
+        ----------
+        github_token : str
+            GitHub API Access Authentication token.
+        resource : str
+            Name of the bucket (core, search or graphql).
+        remaining : int
+            Number of remaining requests.
+        limit : int
+            Number of requests per rate limit window.
+        reset : int
+            Reset time of the bucket in epoch seconds.
+
+        """
+
+        with self.lock:
+            self.buckets[(github_token, resource)] = {
+                "remaining": int(remaining),
+                "limit": int(limit),
+                "reset": int(reset),
+            }
+
+    def update_from_headers(self, github_token, headers, resource="core",
+                            spent=1):
+        """
+        update_from_headers(github_token, headers, resource="core", spent=1)
+
+        Updates a bucket from the X-RateLimit headers of a response. The
+        bucket is taken from the X-RateLimit-Resource header if available.
+        The spent requests are taken from the reservations of the bucket,
+        the server already counts them in the remaining requests.
+
+        Parameters
+        ----------
+        github_token : str
+            GitHub API Access Authentication token.
+        headers : dict
+            Response headers.
+        resource : str
+            Bucket used if the response does not name one.
+        spent : int
+            Number of requests the response counts against the rate limit.
+
+        """
+
+        headers = {key.lower(): value for key, value in headers.items()}
+        if ("x-ratelimit-remaining" not in headers
+                or "x-ratelimit-limit" not in headers
+                or "x-ratelimit-reset" not in headers):
+            return
+        resource = headers.get("x-ratelimit-resource", resource)
+        self.update(github_token, resource,
+                    float(headers["x-ratelimit-remaining"]),
+                    float(headers["x-ratelimit-limit"]),
+                    float(headers["x-ratelimit-reset"]))
+        if spent:
+            self._spend(github_token, resource, spent)
+
+    def _spend(self, github_token, resource, spent):
+        with self.lock:
+            reservations = self.reservations.get((github_token, resource), {})
+            # Reservations of the requesting thread first, then the oldest
+            thread_id = threading.get_ident()
+            ordered = sorted(reservations.values(),
+                             key=lambda reservation:
+                             reservation["thread"] != thread_id)
+            for reservation in ordered:
+                if spent == 0:
+                    break
+                taken = min(spent, reservation["outstanding"])
+                reservation["outstanding"] -= taken
+                spent -= taken
+            for reservation_id, reservation in list(reservations.items()):
+                if reservation["outstanding"] == 0:
+                    del reservations[reservation_id]
+
+    def _get_reserved(self, github_token, resource):
+        reservations = self.reservations.get((github_token, resource), {})
+        now = time.time()
+        for reservation_id, reservation in list(reservations.items()):
+            # Budget of single calls is dropped with the window, requests
+            # without a response would keep it reserved otherwise
+            if (reservation["expires"] is not None
+                    and reservation["expires"] <= now):
+                del reservations[reservation_id]
+        return sum(reservation["outstanding"]
+                   for reservation in reservations.values())
+
+    def get_bucket(self, github_token, resource="core"):
+        """
+        get_bucket(github_token, resource="core")
+
+        Returns the current state of a bucket. Buckets whose reset time
+        has passed are reported as full. The reserved requests are not
+        subtracted from the remaining requests.
+
+        Parameters
+        ----------
+        github_token : str
+            GitHub API Access Authentication token.
+        resource : str
+            Name of the bucket (core, search or graphql).
+
+        Returns
+        -------
+        dict :
+            Copy of the bucket with the keys remaining, limit, reset and
+            reserved.
+
+        """
+
+        if (github_token, resource) not in self.buckets:
+            self._refresh(github_token)
+        with self.lock:
+            bucket = self.buckets[(github_token, resource)]
+            if bucket["reset"] <= time.time():
+                bucket["remaining"] = bucket["limit"]
+            return dict(bucket,
+                        reserved=self._get_reserved(github_token, resource))
+
+    def acquire(self, github_token, resource="core", cost=1, min_limit=0,
+                show_msg=False):
+        """
+        acquire(github_token, resource="core", cost=1, min_limit=0,
+                show_msg=False)
+
+        Hands out budget for `cost` requests of a bucket. If the bucket
+        would drop below `min_limit`, the call sleeps until the reset time
+        of the bucket. Reservations which do not fit into a rate limit
+        window are handed out of a full bucket. Unknown buckets are
+        initialized with a single rate limit request per token. The
+        budget stays reserved until it is spent by responses or the rate
+        limit window ends.
+
+        Parameters
+        ----------
+        github_token : str
+            GitHub API Access Authentication token.
+        resource : str
+            Name of the bucket (core, search or graphql).
+        cost : int
+            Number of requests the caller is going to send.
+        min_limit : int
+            Number of requests which should remain in the bucket.
+        show_msg : bool
+            Print the bucket state and show a progress bar while waiting.
+
+        Returns
+        -------
+        int :
+            Remaining requests of the bucket after the reservation.
+
+        """
+
+        while True:
+            reservation = self._try_acquire(github_token, resource, cost,
+                                            min_limit, show_msg,
+                                            expires=True)
+            if reservation is not None:
+                return reservation[0]
+            self._wait(resource, self._get_seconds_until_reset(
+                github_token, resource) + 1, show_msg)
+
+    def _try_acquire(self, github_token, resource, cost, min_limit,
+                     show_msg=False, expires=False):
+        # Reserves the budget if available, returns the remaining requests
+        # and the reservation id or None. Expiring reservations end with
+        # the rate limit window, the others have to be released.
+        if (github_token, resource) not in self.buckets:
+            self._refresh(github_token)
+        with self.lock:
+            bucket = self.buckets[(github_token, resource)]
+            if bucket["reset"] <= time.time():
+                # The window has passed, the bucket is full again
+                bucket["remaining"] = bucket["limit"]
+            available = (bucket["remaining"]
+                         - self._get_reserved(github_token, resource))
+            if available < min(cost + min_limit, bucket["limit"]):
+                return None
+            reservation = next(self.reservation_ids)
+            self.reservations.setdefault((github_token, resource), {})[
+                reservation] = {
+                    "outstanding": cost,
+                    "thread": threading.get_ident(),
+                    "expires": bucket["reset"] if expires else None,
+                }
+            remaining = max(available - cost, 0)
+            if show_msg:
+                print("Remaining {0} limit {1:5d} / {2:5d}".format(
+                    resource, remaining, bucket["limit"]))
+            return remaining, reservation
+
+    def _get_seconds_until_reset(self, github_token, resource):
+        with self.lock:
+            return self.buckets[(github_token, resource)]["reset"] \
+                - time.time()
+
+    def release(self, github_token, resource, reservation):
+        """
+        release(github_token, resource, reservation)
+
+        Returns the unspent budget of a reservation to its bucket.
+
+        Parameters
+        ----------
+        github_token : str
+            GitHub API Access Authentication token.
+        resource : str
+            Name of the bucket (core, search or graphql).
+        reservation : int
+            Id of the reservation.
+
+        """
+
+        with self.lock:
+            self.reservations.get((github_token, resource), {}).pop(
+                reservation, None)
+
+    def _refresh(self, github_token):
+        github_user = utilities.get_github_user(github_token)
+        rate_limit = github_user.get_rate_limit()
+        for resource in RateLimitGovernor.RESOURCES:
+            bucket = getattr(rate_limit, resource).raw_data
+            self.update(github_token, resource, bucket["remaining"],
+                        bucket["limit"], bucket["reset"])
+
+    def _wait(self, resource, seconds, show_msg):
+        # Reset times in the past must not lead to negative sleeps
+        seconds = max(seconds, 0)
+        print(f"Waiting for {resource} request limit refresh ...")
+        if show_msg:
+            sleeping_range = range(int(seconds))
+            for i in utilities.progressbar(sleeping_range, "Sleeping : ", 60):
+                time.sleep(1)
+        else:
+            time.sleep(seconds)
+
+
+# Governor shared by all modules of the process
+GOVERNOR = RateLimitGovernor()
+
+
+class TokenPool():
+    """Pool of GitHub tokens sharing the requests of a run.
+
+    Requests are assigned to the token with the largest remaining budget
+    of the requested bucket. Tokens whose budget drops below the `reserve`
+    share of the bucket limit are rotated out until their bucket is reset. The
+    budget itself is managed by the shared rate limit governor, so pools
+    only hold the tokens and can be passed to worker processes.
+
+    Methods
+    -------
+    from_tokens(github_token):
+        Creates a pool from a token, a list of tokens or a pool.
+    acquire(resource, cost, min_limit, show_msg):
+        Selects a token and hands out request budget of it.
+    reservation(resource, cost, min_limit, show_msg):
+        Context manager keeping budget of a token reserved for a task.
+
+    """
+
+    def __init__(self, github_tokens, reserve=0.0):
+        """Constructor of TokenPool Class.
+
+        Parameters
+        ----------
+        github_tokens : list (str)
+            GitHub API Access Authentication tokens.
+        reserve : float
+            Share of the bucket limit below which a token is rotated out.
+
+        """
+
+        if len(github_tokens) == 0:
+            raise ValueError("A token pool requires at least one token!")
+        self.tokens = list(github_tokens)
+        self.reserve = reserve
+
+    @staticmethod
+    def from_tokens(github_token):
+        """
+        from_tokens(github_token)
+
+        Creates a pool from a single token, a list of tokens or returns an
+        existing pool.
+
+        Parameters
+        ----------
+        github_token : str, list (str) or TokenPool
+            GitHub API Access Authentication token(s).
+
+        Returns
+        -------
+        TokenPool :
+            Pool of the given tokens.
+
+        """
+
+        if isinstance(github_token, TokenPool):
+            return github_token
+        if isinstance(github_token, str):
+            return TokenPool([github_token])
+        return TokenPool(github_token)
+
+    def acquire(self, resource="core", cost=1, min_limit=0, show_msg=False):
+        """
+        acquire(resource="core", cost=1, min_limit=0, show_msg=False)
+
+        Selects the token with the largest remaining budget of a bucket and
+        hands out budget for `cost` requests. If all tokens are exhausted,
+        the call waits for the earliest reset time and selects again from
+        all tokens.
+
+        Parameters
+        ----------
+        resource : str
+            Name of the bucket (core, search or graphql).
+        cost : int
+            Number of requests the caller is going to send.
+        min_limit : int
+            Number of requests which should remain in the bucket.
+        show_msg : bool
+            Print the bucket state and show a progress bar while waiting.
+
+        Returns
+        -------
+        tuple (str, int) :
+            Selected token and its remaining requests after the reservation.
+
+        """
+
+        github_token, remaining, _ = self._acquire(resource, cost, min_limit,
+                                                   show_msg, expires=True)
+        return github_token, remaining
+
+    @contextmanager
+    def reservation(self, resource="core", cost=1, min_limit=0,
+                    show_msg=False):
+        """
+        reservation(resource="core", cost=1, min_limit=0, show_msg=False)
+
+        Context manager selecting a token like acquire. The budget which
+        was not spent by the requests of the block is released on exit.
+
+        Parameters
+        ----------
+        resource : str
+            Name of the bucket (core, search or graphql).
+        cost : int
+            Number of requests the block is going to send.
+        min_limit : int
+            Number of requests which should remain in the bucket.
+        show_msg : bool
+            Print the bucket state and show a progress bar while waiting.
+
+        Yields
+        ------
+        tuple (str, int) :
+            Selected token and its remaining requests after the reservation.
+
+        """
+
+        github_token, remaining, reservation = self._acquire(
+            resource, cost, min_limit, show_msg, expires=False)
+        try:
+            yield github_token, remaining
+        finally:
+            GOVERNOR.release(github_token, resource, reservation)
+
+    def _acquire(self, resource, cost, min_limit, show_msg, expires):
+        while True:
+            buckets = {github_token: GOVERNOR.get_bucket(github_token,
+                                                         resource)
+                       for github_token in self.tokens}
+            min_limits = {
+                github_token: max(min_limit,
+                                  int(bucket["limit"] * self.reserve))
+                for github_token, bucket in buckets.items()
+            }
+            # Tokens by budget, the reservations may have changed since
+            for github_token in sorted(
+                    self.tokens, reverse=True,
+                    key=lambda token: buckets[token]["remaining"]
+                    - buckets[token]["reserved"]):
+                reservation = GOVERNOR._try_acquire(
+                    github_token, resource, cost, min_limits[github_token],
+                    show_msg, expires)
+                if reservation is not None:
+                    return (github_token,) + reservation
+            # All tokens are exhausted, wait for the earliest reset and
+            # select again from all tokens
+            github_token = min(self.tokens,
+                               key=lambda token: buckets[token]["reset"])
+            GOVERNOR._wait(resource, buckets[github_token]["reset"]
+                           - time.time() + 1, show_msg)
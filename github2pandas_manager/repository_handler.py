@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import yaml
 import re
@@ -9,7 +10,12 @@ import math
 import logging
 
 from github2pandas_manager import utilities
+from github2pandas_manager.rate_limit import GOVERNOR, TokenPool
+from github2pandas_manager.discovery_cache import DiscoveryCache, \
+    RepositoryDescriptor
+from github2pandas_manager.graphql_client import GraphQLClient
 from github2pandas.github2pandas import GitHub2Pandas
+from github import UnknownObjectException
 
 
 class RequestHandler(ABC):
@@ -21,39 +27,183 @@ class RequestHandler(ABC):
         Abstract Method to get a List of repositories.
     generate_repository_list():
         Abstract Method to generate List of repositories.
+    iter_repository_list():
+        Yields the repositories of the request.
+    discover():
+        Loads the repository list from the discovery cache or generates it.
+    resolve_names(names):
+        Returns the repositories of repository or organization names.
+    add_repository(repo):
+        Appends a repository unless it was discovered before.
+    set_repository_list(repositories):
+        Replaces the repository list, dropping duplicates.
     """
-    
-    
+
+    # Discovered repositories are reused by runs within this time
+    DISCOVERY_TTL_HOURS = 24
+    # Threads resolving repository and organization names
+    DISCOVERY_WORKERS = 4
+    # Names which could not be resolved, written after the discovery
+    DISCOVERY_FAILURES_FILE = "discovery_failures.csv"
+    DISCOVERY_BACKENDS = ["rest", "graphql"]
+
     def __init__(self, github_token, parameters):
         """Constractor of RequestHandler Class.
 
         Parameters
         ----------
-        github_token : str
-            GitHub API Access Authentication token.
+        github_token : str, list (str) or TokenPool
+            GitHub API Access Authentication token(s).
         parameters : str
             Parameters requerd for the search the repositories.
 
         Attributes
         ----------
+        token_pool : TokenPool
+            Pool of GitHub API Access Authentication tokens.
         github_token : str
-            GitHub API Access Authentication token.
+            First token of the pool.
         request : str
            Parameters requerd to search for repositories.
         repository_list : List (str)
             List for the repositories
+        repository_ids : set (int)
+            Ids of the repositories in repository_list.
         time_slot_list : List (str)
             List for the timeslots
         github_user : GitHub User
-            Authenticated GitHub User.
+            Authenticated GitHub User of the first token.
+        stream_discovery : bool
+            True if repositories are discovered while they are iterated.
+        discovery_cache : DiscoveryCache
+            Manifest of the discovered repositories, None if
+            discovery_ttl_hours is 0.
+        failed_names : dict
+            Error by repository or organization name which could not be
+            resolved.
 
         """
 
         self.repository_list = []
+        self.repository_ids = set()
+        self.stream_discovery = False
         self.time_slot_list = []
-        self.github_token = github_token
-        self.github_user = utilities.get_github_user(github_token)
+        self.token_pool = TokenPool.from_tokens(github_token)
+        self.github_token = self.token_pool.tokens[0]
+        self.github_user = utilities.get_github_user(self.github_token)
         self.request = parameters
+        self.failed_names = {}
+        ttl_hours = utilities.get_parameter(
+            parameters.parameters, "discovery_ttl_hours",
+            RequestHandler.DISCOVERY_TTL_HOURS)
+        if ttl_hours:
+            self.discovery_cache = DiscoveryCache(
+                parameters.parameters.project_folder, type(self).__name__,
+                self.get_selection(), ttl_hours)
+        else:
+            self.discovery_cache = None
+
+    def get_selection(self):
+        """Returns the parameters selecting the repositories."""
+        return {name: getattr(self.request.parameters, name, None)
+                for name in getattr(self, "MANDATORY_PARAMETERS", [])}
+
+    def add_repository(self, repo):
+        """Appends a repository to the repository list unless a repository
+        with the same id was added before, e.g. by an adjacent time slot or
+        another selector. Returns False for duplicates."""
+        if repo.id in self.repository_ids:
+            return False
+        self.repository_ids.add(repo.id)
+        self.repository_list.append(repo)
+        return True
+
+    def set_repository_list(self, repositories):
+        self.repository_list = []
+        self.repository_ids = set()
+        for repo in repositories:
+            self.add_repository(repo)
+
+    def load_cached_repository_list(self):
+        """Loads the repository list from an unexpired discovery manifest.
+        Names which could not be resolved before are resolved again and
+        added. Returns False if there is no manifest."""
+        if self.discovery_cache is None:
+            return False
+        cached = self.discovery_cache.load()
+        if cached is None:
+            return False
+        repositories, failed_names = cached
+        if failed_names:
+            retried = self.resolve_names(list(failed_names))
+            if retried is None:
+                return False
+            repositories = repositories + retried
+        print(f"{len(repositories)} repositories loaded from "
+              f"{self.discovery_cache.path.name}.")
+        self.set_repository_list(repositories)
+        if failed_names:
+            print(f"{len(failed_names) - len(self.failed_names)} of "
+                  f"{len(failed_names)} names of the previous discovery "
+                  "resolved.")
+            self.finish_discovery(self.discovery_cache.created_at)
+        return True
+
+    def resolve_names(self, names):
+        """Returns the repositories of repository or organization names,
+        names which can not be resolved are recorded in failed_names.
+        Handlers without names return None."""
+        return None
+
+    def get_discovery_workers(self):
+        return utilities.get_parameter(self.request.parameters,
+                                       "discovery_workers",
+                                       RequestHandler.DISCOVERY_WORKERS)
+
+    def get_graphql_client(self):
+        """Returns a GraphQL client if discovery_backend is graphql,
+        otherwise None."""
+        backend = utilities.get_parameter(self.request.parameters,
+                                          "discovery_backend", "rest")
+        if backend not in RequestHandler.DISCOVERY_BACKENDS:
+            print(f"Unknown discovery backend {backend}! Please use "
+                  f"{', '.join(RequestHandler.DISCOVERY_BACKENDS)}.")
+            sys.exit()
+        if backend != "graphql":
+            return None
+        return GraphQLClient(self.token_pool, utilities.get_parameter(
+            self.request.parameters, "graphql_url"))
+
+    def record_failure(self, name, error):
+        self.failed_names[name] = str(error)
+        print(f"No repositories found related to {name}: {error}")
+
+    def finish_discovery(self, created_at=None):
+        """Replaces the discovered repositories by compact descriptors and
+        writes them to the discovery manifest. Names which could not be
+        resolved are recorded in the manifest, so the next run resolves
+        only them again, and written to discovery_failures.csv."""
+        self.repository_list = [RepositoryDescriptor.from_repository(repo)
+                                for repo in self.repository_list]
+        failures_path = Path(self.request.parameters.project_folder,
+                             RequestHandler.DISCOVERY_FAILURES_FILE)
+        if failures_path.is_file():
+            failures_path.unlink()
+        if self.failed_names:
+            failures_path.parent.mkdir(parents=True, exist_ok=True)
+            pd.DataFrame(list(self.failed_names.items()),
+                         columns=["name", "error"]).to_csv(failures_path,
+                                                           index=False)
+            print(f"{len(self.failed_names)} names could not be resolved, "
+                  f"see {failures_path}.")
+        if self.discovery_cache is not None:
+            self.discovery_cache.save(self.repository_list, self.failed_names,
+                                      created_at)
+
+    def discover(self):
+        if not self.load_cached_repository_list():
+            self.generate_repository_list()
+            self.finish_discovery()
 
     @abstractmethod
     def get_repository_list(self):
@@ -70,6 +220,12 @@ class RequestHandler(ABC):
 
         pass
 
+    def iter_repository_list(self):
+        """Yields the repositories of the request. Handlers discovering
+        repositories lazily yield them while the search is still running."""
+
+        yield from self.repository_list
+
     def __repr__(self):
         if len(self.repository_list) > 0:
             output = f"{len(self.repository_list)} repositories found: \n"
@@ -97,6 +253,10 @@ class RepositoriesByOrganization(RequestHandler):
     -------
     get_repository_list():
         List of repositories belonging to an organization.
+    resolve_names(org_names):
+        Retrieve the repositories of some organizations.
+    list_organization(org_name, page_pool):
+        Retrieve the repositories of one organization.
     generate_repository_list():
         Retrieve all repositories belonging to an organization.
 
@@ -104,6 +264,9 @@ class RepositoriesByOrganization(RequestHandler):
 
     MANDATORY_PARAMETERS = ["organization_names"]
 
+    # GitHub returns at most 100 repositories per page
+    PAGE_SIZE = 100
+
     def __init__(self, github_token, request_params):
         """ Constractor of RepositoriesByOrganization Class.
 
@@ -117,7 +280,7 @@ class RepositoriesByOrganization(RequestHandler):
         """
 
         super().__init__(github_token, request_params)
-        self.generate_repository_list()
+        self.discover()
 
     def get_repository_list(self):
         """
@@ -140,17 +303,96 @@ class RepositoriesByOrganization(RequestHandler):
         generate_repository_list()
 
         Implements the Abstract Method of the base class to Retrieve all 
-        repositories belonging to an organization.
+        repositories belonging to an organization, see resolve_names().
 
         """
-        
-        relevant_repos = []
-        github_user = utilities.get_github_user(self.github_token)
-        for org_name in self.request.parameters.organization_names:
-            org = github_user.get_organization(org_name)
-            for repo in org.get_repos():
-                relevant_repos.append(repo)
-        self.repository_list = relevant_repos
+
+        self.set_repository_list(self.resolve_names(
+            self.request.parameters.organization_names))
+
+    def resolve_names(self, org_names):
+        """
+        resolve_names(org_names)
+
+        Retrieves the repositories of organizations. Organizations are
+        listed concurrently, see list_organization(). With the GraphQL
+        discovery backend, one query lists a page of several organizations.
+
+        Parameters
+        ----------
+        org_names : list (str)
+            Names of the organizations.
+
+        Returns
+        -------
+        list :
+            Descriptors of the repositories in the order of the
+            organizations.
+
+        """
+
+        workers = self.get_discovery_workers()
+        graphql_client = self.get_graphql_client()
+        if graphql_client is not None:
+            repositories, failures = graphql_client.list_organizations(
+                org_names, workers)
+            for org_name, error in failures.items():
+                self.record_failure(org_name, error)
+            return repositories
+        with ThreadPoolExecutor(max_workers=workers) as org_pool, \
+                ThreadPoolExecutor(max_workers=workers) as page_pool:
+            org_repos = list(org_pool.map(
+                lambda org_name: self.list_organization(org_name, page_pool),
+                org_names))
+        return [repo for repos in org_repos for repo in repos]
+
+    def list_organization(self, org_name, page_pool):
+        """
+        list_organization(org_name, page_pool)
+
+        Retrieves the repositories of an organization. After the first
+        page, the following pages are requested concurrently in batches of
+        discovery_workers pages until a page is not full. The budget of
+        every batch is reserved before it is sent.
+
+        Parameters
+        ----------
+        org_name : str
+            Name of the organization.
+        page_pool : ThreadPoolExecutor
+            Threads requesting the pages.
+
+        Returns
+        -------
+        list :
+            Descriptors of the repositories in the order of the listing,
+            an empty list if the organization could not be listed.
+
+        """
+
+        workers = self.get_discovery_workers()
+        # The organization and the first page
+        github_token, _ = self.token_pool.acquire("core", cost=2,
+                                                  min_limit=1)
+        github_user = utilities.get_github_user(github_token)
+        try:
+            repos = github_user.get_organization(org_name).get_repos()
+            pages = [repos.get_page(0)]
+            next_page = 1
+            while len(pages[-1]) >= RepositoriesByOrganization.PAGE_SIZE:
+                page_numbers = range(next_page, next_page + workers)
+                GOVERNOR.acquire(github_token, "core",
+                                 cost=len(page_numbers), min_limit=1)
+                for page in page_pool.map(repos.get_page, page_numbers):
+                    pages.append(page)
+                    if len(page) < RepositoriesByOrganization.PAGE_SIZE:
+                        break
+                next_page += workers
+        except Exception as error:
+            self.record_failure(org_name, error)
+            return []
+        return [RepositoryDescriptor.from_repository(repo)
+                for page in pages for repo in page]
 
 
 class RepositoriesByRepoNames(RequestHandler): 
@@ -170,6 +412,10 @@ class RepositoriesByRepoNames(RequestHandler):
     -------
     get_repository_list():
         List of repositories based on repositories' name.
+    resolve_names(repo_name_list):
+        Retrieves repositories by their names.
+    resolve_repository(repo_name):
+        Retrieves one repository by its name.
     generate_repository_list():
         Retrieves all repositories based on repositories' name.
 
@@ -189,7 +435,7 @@ class RepositoriesByRepoNames(RequestHandler):
         """
 
         super().__init__(github_token, request_params)
-        self.generate_repository_list()
+        self.discover()
 
     def get_repository_list(self):
         """
@@ -212,19 +458,79 @@ class RepositoriesByRepoNames(RequestHandler):
         generate_repository_list()
 
         Implements the Abstract Method of the base class to retrieve all 
-        repositories according to the repositories' names.
+        repositories according to the repositories' names, see
+        resolve_names().
+
+        """
+
+        self.set_repository_list(self.resolve_names(
+            self.request.parameters.repos_names))
 
+    def resolve_names(self, repo_name_list):
         """
-        relevant_repos = []
-        repo_name_list = self.request.parameters.repos_names
-        github_user = utilities.get_github_user(self.github_token)
-        for repo_name in repo_name_list:
-            try:
-                repo = github_user.get_repo(repo_name)
-                relevant_repos.append(repo)
-            except:
-                print(f"No repo found related to {repo_name}!")
-        self.repository_list = relevant_repos
+        resolve_names(repo_name_list)
+
+        Retrieves repositories by their full names. The names are resolved
+        concurrently by discovery_workers threads, the list keeps the order
+        of the names. With the GraphQL discovery backend, one query
+        resolves 100 names.
+
+        Parameters
+        ----------
+        repo_name_list : list (str)
+            Full names of the repositories (owner/name).
+
+        Returns
+        -------
+        list :
+            Descriptors of the repositories which could be retrieved.
+
+        """
+
+        graphql_client = self.get_graphql_client()
+        if graphql_client is not None:
+            repositories, failures = graphql_client.resolve_repositories(
+                repo_name_list, self.get_discovery_workers())
+            for repo_name, error in failures.items():
+                self.record_failure(repo_name, error)
+            return repositories
+        with ThreadPoolExecutor(
+                max_workers=self.get_discovery_workers()) as pool:
+            repositories = list(pool.map(self.resolve_repository,
+                                         repo_name_list))
+        return [repo for repo in repositories if repo is not None]
+
+    def resolve_repository(self, repo_name):
+        """
+        resolve_repository(repo_name)
+
+        Retrieves a repository by its full name with the token of the pool
+        which has the largest remaining budget.
+
+        Parameters
+        ----------
+        repo_name : str
+            Full name of the repository (owner/name).
+
+        Returns
+        -------
+        RepositoryDescriptor or None :
+            Descriptor of the repository, None if it could not be
+            retrieved. The error is recorded in failed_names.
+
+        """
+
+        github_token, _ = self.token_pool.acquire("core", min_limit=1)
+        github_user = utilities.get_github_user(github_token)
+        try:
+            repo = github_user.get_repo(repo_name)
+        except UnknownObjectException:
+            self.record_failure(repo_name, "repository does not exist")
+            return None
+        except Exception as error:
+            self.record_failure(repo_name, error)
+            return None
+        return RepositoryDescriptor.from_repository(repo)
 
 
 class RepositoriesByRepoNamePattern(RequestHandler):
@@ -265,7 +571,7 @@ class RepositoriesByRepoNamePattern(RequestHandler):
         """
         
         super().__init__(github_token, request_params)
-        self.generate_repository_list()
+        self.discover()
 
     def get_repository_list(self):
         """
@@ -295,13 +601,14 @@ class RepositoriesByRepoNamePattern(RequestHandler):
         blacklist_patterns = self.request.parameters.repo_black_pattern
         base_folder = Path(self.request.parameters.project_folder)
         base_folder.mkdir(parents=True, exist_ok=True)
-        github2pandas = GitHub2Pandas(self.github_token, 
+        github_token, _ = self.token_pool.acquire("core", min_limit=1)
+        github2pandas = GitHub2Pandas(github_token, 
                                       base_folder, 
                                       log_level=logging.DEBUG)
         relevant_repos = github2pandas.get_repos(
                                       whitelist_patterns=whitelist_patterns,
                                       blacklist_patterns=blacklist_patterns)
-        self.repository_list = relevant_repos
+        self.set_repository_list(relevant_repos)
 
 class RepositoriesByQuery(RequestHandler):
     """Class to get repositories by the Search query.
@@ -334,13 +641,26 @@ class RepositoriesByQuery(RequestHandler):
         Extract and validate the search start and end date.
     generate_github_query(language, star_filter, start_date, end_date):
         generates a search query based on the qualifiers and filters.
-    generate_short_time_slot(date_interval):
-        Divide the Datetime interval into more small time segments.
-    generate_time_slot_list():
-        generates suitable small Datetime interval timeslots for the search by
+    generate_slot_query(language, star_filter, time_slot):
+        generates the search query of a timeslot.
+    search_repositories(query, min_limit, all_pages):
+        sends a search query within the search rate limit.
+    count_result_pages(repositories):
+        number of result pages of a search.
+    bisect_time_slot(language, star_filter, date_interval, total_count):
+        Splits an over-full Datetime interval into halves.
+    iter_time_slot_list():
+        yields suitable small Datetime interval timeslots for the search by
         dividing the specified search period.
+    generate_time_slot_list():
+        generates the list of all timeslots.
+    iter_slot_repositories(time_slots):
+        yields the repositories created in the given timeslots.
     generate_repository_list():
         generate a list of repositories for the specified search period.
+    iter_repository_list():
+        yields the repositories, searching the timeslots lazily if
+        stream_discovery is set.
 
     """
 
@@ -348,6 +668,14 @@ class RepositoriesByQuery(RequestHandler):
         "language", "start_date", "end_date", "star_filter"
     ]
 
+    # Maximum number of repositories returned for a search query
+    SEARCH_RESULT_LIMIT = 1000
+    # Time slots are not split below this resolution
+    MIN_TIME_SLOT = pd.Timedelta(minutes=1)
+    # Resolution of the created qualifier, time slots [left, right) are
+    # searched up to right minus this resolution
+    QUERY_RESOLUTION = pd.Timedelta(seconds=1)
+
     def __init__(self, github_token, request_params):
         """ Constractor of RepositoriesByQuery Class
 
@@ -361,8 +689,16 @@ class RepositoriesByQuery(RequestHandler):
         """
 
         super().__init__(github_token, request_params)
-        self.generate_time_slot_list()
-        self.generate_repository_list()
+        self.stream_discovery = utilities.get_parameter(
+            request_params.parameters, "stream_discovery", False)
+        # Repositories are searched while the extractor iterates them
+        self.discovery_complete = not self.stream_discovery
+        if self.load_cached_repository_list():
+            self.discovery_complete = True
+        elif not self.stream_discovery:
+            self.generate_time_slot_list()
+            self.generate_repository_list()
+            self.finish_discovery()
 
     def get_repository_list(self):
         """
@@ -539,62 +875,137 @@ class RepositoriesByQuery(RequestHandler):
                 end_date.strftime("%Y-%m-%dT%H:%M:%S") + " " + "stars:" +
                 star_filter)
 
-    def _generate_short_time_slot(self, date_interval):
+    def generate_slot_query(self, language, star_filter, time_slot):
         """
-        _generate_short_time_slot(date_interval)
+        generate_slot_query(language, star_filter, time_slot)
 
-        Divide the Datetime interval further into small time segments, such as
-        one day,half a day, six, three, or one hour, to further narrow the 
-        search period
+        generates the search query of a timeslot. The created qualifier
+        includes both of its dates, adjacent timeslots share a boundary.
+        The slot is searched up to one second before its right boundary, so
+        a repository created at the boundary belongs to the later slot only.
 
         Parameters
         ----------
-        date_interval :  IntervalIndex
-            a time/date interval index from the pandas interval range 
+        language : str
+            language of the code in the repositories
+        star_filter : str
+            number of stars the repositories have.
+        time_slot : Interval
+            timeslot closed on the left
+
+        Returns
+        -------
+        str
+            search query of the repositories created in the timeslot
 
         """
 
-        language = self.extract_language()
-        star_filter = self.extract_star_filter()
-        github_user = utilities.get_github_user(self.github_token)
-        # To hold the short time interval until the suitable time
-        # interval is found. Then, when a suitable time slot is found,
-        # the time slots are appended to the main timeslots list.
-        temp_time_slot = []
-        periods = [
-            2,  # one day interval slots
-            4,  # 12 hours interval slots
-            8,  # six hours interval slots
-            16,  # three hours interval slots
-            24,  # one hour interval slots
-        ]
-
-        for period in periods:
-            short_time_intervals = pd.interval_range(
-                start=pd.Timestamp(date_interval.left),
-                end=pd.Timestamp(date_interval.right),
-                periods=period)
-            for short_time_interval in short_time_intervals:
-                query = self.generate_github_query(language, star_filter,
-                                                   short_time_interval.left,
-                                                   short_time_interval.right)
-                utilities.check_github_search_limits(
-                        github_user, min_limit=1, show_msg=False)
-                repositories = github_user.search_repositories(query=query)
-                if repositories.totalCount < 1000:
-                    temp_time_slot.append(short_time_interval)
-                else:
-                    # Emptying the temporary timeslot list to regenerate
-                    # another suitable shorter time slot.
-                    temp_time_slot = []
-                    break
-            if temp_time_slot:
-                self.time_slot_list.extend(temp_time_slot)
-                break
+        return self.generate_github_query(
+            language, star_filter, time_slot.left,
+            time_slot.right - RepositoriesByQuery.QUERY_RESOLUTION)
 
-    def generate_time_slot_list(self):
+    def search_repositories(self, query, min_limit=1, all_pages=False):
         """
-        generate_time_slot_list()
+        search_repositories(query, min_limit=1, all_pages=False)
+
+        Sends a repository search with the token of the pool which has the
+        largest remaining search budget. The first result page is fetched
+        to get the total count of the search.
+
+        Parameters
+        ----------
+        query : str
+            Search query generated by generate_github_query.
+        min_limit : int
+            Number of search requests which should remain in the bucket.
+        all_pages : bool
+            Reserve search budget for all result pages, if the caller is
+            going to iterate the whole result.
+
+        Returns
+        -------
+        PaginatedList
+            Search result of PyGithub.
+
+        """
+
+        github_token, _ = self.token_pool.acquire("search",
+                                                  min_limit=min_limit)
+        github_user = utilities.get_github_user(github_token)
+        repositories = github_user.search_repositories(query=query)
+        repositories.totalCount
+        if all_pages:
+            # Further result pages are charged to the search bucket, too
+            GOVERNOR.acquire(github_token, "search",
+                             cost=self.count_result_pages(repositories) - 1)
+        return repositories
+
+    @staticmethod
+    def count_result_pages(repositories):
+        """Returns the number of result pages of a search (at most 10)."""
+        return max(1, min(10, math.ceil(repositories.totalCount / 100)))
+
+    def _bisect_time_slot(self, language, star_filter, date_interval,
+                          total_count):
+        """
+        _bisect_time_slot(language, star_filter, date_interval, total_count)
+
+        Splits an over-full Datetime interval into halves until every time
+        slot holds less than 1000 repositories. Only over-full halves are
+        split further. The repository count of the right half is derived
+        from the count of the parent interval, so every split costs a
+        single search request, which is exact as the halves do not overlap
+        (see generate_slot_query). Time slots are not split below one minute,
+        remaining over-full slots are reported. Final time slots are
+        yielded in chronological order as soon as they are found.
+
+        Parameters
+        ----------
+        language : str
+            language of the code in the repositories
+        star_filter : str
+            number of stars the repositories have.
+        date_interval : Interval
+            a time/date interval from the pandas interval range
+        total_count : int
+            number of repositories created in the interval
+
+        """
+
+        pending = [(date_interval, total_count)]
+        while pending:
+            interval, count = pending.pop()
+            if count < RepositoriesByQuery.SEARCH_RESULT_LIMIT:
+                self.time_slot_list.append(interval)
+                yield interval
+                continue
+            middle = (interval.left + interval.length / 2).floor("min")
+            if interval.length <= RepositoriesByQuery.MIN_TIME_SLOT \
+                    or middle <= interval.left:
+                print(f"\n{count} repositories created between "
+                      f"{interval.left} and {interval.right}, only "
+                      f"{RepositoriesByQuery.SEARCH_RESULT_LIMIT} of them "
+                      "can be retrieved by the GitHub search!")
+                self.time_slot_list.append(interval)
+                yield interval
+                continue
+            left_interval = pd.Interval(interval.left, middle, closed="left")
+            right_interval = pd.Interval(middle, interval.right,
+                                         closed="left")
+            query = self.generate_slot_query(language, star_filter,
+                                             left_interval)
+            left_count = self.search_repositories(query).totalCount
+            right_count = max(count - left_count, 0)
+            # Left halves are processed first to keep the slots in order
+            pending.append((right_interval, right_count))
+            pending.append((left_interval, left_count))
+            sys.stdout.write("Please Wait : %i time slots found, %i pending\r"
+                             % (len(self.time_slot_list), len(pending)))
+            sys.stdout.flush()
+
+    def iter_time_slot_list(self):
+        """
+        iter_time_slot_list()
 
         creates suitable small timeslots by splitting the specified search 
         period. The GitHub API allows authenticated users 1,000 repositories 
@@ -603,7 +1014,7 @@ class RepositoriesByQuery(RequestHandler):
         be split into small time slots. The number of repositories created in 
         each time slot must be less than 1000, and finally, all repositories 
         from each time slot are aggregated to get all repositories created in 
-        the search period.
+        the search period. Time slots are yielded as soon as they are found.
 
         """
 
@@ -612,20 +1023,16 @@ class RepositoriesByQuery(RequestHandler):
         start_date, end_date = self.extract_dates()
         separator_line_count = 55
         if language and star_filter and start_date and end_date:
-            github_user = utilities.get_github_user(self.github_token)
-            date_interval = pd.interval_range(start=pd.Timestamp(start_date),
-                                            end=pd.Timestamp(end_date),
-                                            periods=1)
-
-            query = self.generate_github_query(language, star_filter,
-                                            date_interval[0].left,
-                                            date_interval[0].right)
-            utilities.check_github_search_limits(
-                        github_user, min_limit=1, show_msg=False)
-            repositories = github_user.search_repositories(query=query)
+            date_interval = pd.Interval(pd.Timestamp(start_date),
+                                        pd.Timestamp(end_date),
+                                        closed="left")
+
+            query = self.generate_slot_query(language, star_filter,
+                                             date_interval)
+            repositories = self.search_repositories(query)
             #Notification
             print("-"*separator_line_count)
-            print(f"Original search period: {date_interval[0]}")
+            print(f"Original search period: {date_interval}")
             print("-"*separator_line_count)
             if repositories.totalCount < 1000:
                 print(
@@ -633,12 +1040,10 @@ class RepositoriesByQuery(RequestHandler):
                     "period!"
                 )
                 # add the star and end date as interval to the time slot list
-                self.time_slot_list.append(date_interval[0])
+                self.time_slot_list.append(date_interval)
                 print("-"*separator_line_count)
+                yield date_interval
             else:
-                # Create intervals of one up to two-day timespan,
-                # depending on the length of the search period.
-                interval_count = math.ceil((end_date - start_date).days / 2)
                 # Notification
                 print("For the original search period, the number of\n"
                     "repositories is more than 1000. Segmenting of\n"
@@ -649,34 +1054,9 @@ class RepositoriesByQuery(RequestHandler):
 
                     )
                 print("-"*separator_line_count)
-                date_intervals = pd.interval_range(
-                    start=pd.Timestamp(start_date),
-                    end=pd.Timestamp(end_date),
-                    periods=interval_count)
-                for index, date_interval in enumerate(date_intervals):
-                    # To adjust the index number with the interval count
-                    index += 1
-                    # Simple progress bar for the interval generating.
-                    sys.stdout.write("Please Wait : %s[%s%s] %i/%s\r" %
-                                (" ", 
-                                "#"*math.ceil((index/interval_count)*100),
-                                "."*math.ceil((1-index/interval_count)*100),
-                                math.ceil((index/interval_count)*100),"100%"))
-                    sys.stdout.flush()
-                    query = self.generate_github_query(language, star_filter,
-                                                    date_interval.left,
-                                                    date_interval.right)
-                    utilities.check_github_search_limits(
-                        github_user, min_limit=1, show_msg=False)
-                    repositories = self.github_user.search_repositories(
-                        query=query)
-                    if repositories.totalCount < 1000:
-                        # If the repositories for the interval are still
-                        # more than 1000, then further shorter interval
-                        # segmentation of the interval is requerd.
-                        self.time_slot_list.append(date_interval)
-                    else:
-                        self._generate_short_time_slot(date_interval)
+                yield from self._bisect_time_slot(language, star_filter,
+                                                  date_interval,
+                                                  repositories.totalCount)
                 # Notification 
             print("\nDone! A list of suitable time slots has been generated.")
             print("-"*separator_line_count)
@@ -685,48 +1065,186 @@ class RepositoriesByQuery(RequestHandler):
             print(("Please check the parameters in the config file!"))
             sys.exit()
 
-    def generate_repository_list(self):
+    def generate_time_slot_list(self):
         """
-        generate_repository_list(self)
+        generate_time_slot_list()
 
-        generates a list of repositories created in the specified search 
-        period based on the search criteria and filters.
+        generates the list of all suitable small timeslots of the specified
+        search period, see iter_time_slot_list().
+
+        """
+
+        for _ in self.iter_time_slot_list():
+            pass
+
+    def iter_slot_repositories(self, time_slots):
+        """
+        iter_slot_repositories(time_slots)
+
+        yields the repositories created in the given timeslots and appends
+        them to the repository list. The search results are paged through
+        once, the number of repositories is taken from the first page.
+        Repositories which were found before, e.g. when the search results
+        shift while they are paged, are skipped.
+
+        Parameters
+        ----------
+        time_slots : iterable (Interval)
+            Datetime interval timeslots of the search period.
 
         """
 
         language = self.extract_language()
         star_filter = self.extract_star_filter()
         start_date, end_date = self.extract_dates()
-        time_slot_list = self.time_slot_list
 
         if language and star_filter and start_date and end_date:
-            github_user = utilities.get_github_user(self.github_token)
             # Notification
             print("Now getting the repositories ....")
-            for date_interval in time_slot_list:
-                query = self.generate_github_query(language, star_filter,
-                                                   date_interval.left,
-                                                   date_interval.right)
-                utilities.check_github_search_limits(
-                        github_user, min_limit=10, show_msg=True)
-                repositories = github_user.search_repositories(query=query)
-                self.repository_list += list(repositories)
+            for date_interval in time_slots:
+                query = self.generate_slot_query(language, star_filter,
+                                                 date_interval)
+                repositories = self.search_repositories(query, min_limit=10,
+                                                        all_pages=True)
                 print("From: {} To: {} -> {} Repositories found".format(
                     date_interval.left.strftime("%Y-%m-%d %H:%M"),
                     date_interval.right.strftime("%Y-%m-%d %H:%M"),
-                    len(list(repositories)),
+                    repositories.totalCount,
                 ))
+                for repository in repositories:
+                    repository = RepositoryDescriptor.from_repository(
+                        repository)
+                    if self.add_repository(repository):
+                        yield repository
         else:
             print("error while reading query parameters!")
             print(("Please check the parameters in the config file!"))
             sys.exit()
 
+    def generate_repository_list(self):
+        """
+        generate_repository_list(self)
+
+        generates a list of repositories created in the specified search 
+        period based on the search criteria and filters.
+
+        """
+
+        for _ in self.iter_slot_repositories(self.time_slot_list):
+            pass
+
+    def iter_repository_list(self):
+        """
+        iter_repository_list()
+
+        yields the repositories of the search. With stream_discovery the
+        time slots are searched lazily, so the extraction of the first
+        repositories overlaps with the search of later time slots.
+
+        """
+
+        if self.discovery_complete:
+            yield from self.repository_list
+            return
+        yield from self.iter_slot_repositories(self.iter_time_slot_list())
+        self.discovery_complete = True
+        self.finish_discovery()
+
+
+class CombinedRequestHandler(RequestHandler):
+    """Class to get the repositories of several matching request handlers.
+
+    Parameters
+    ----------
+    RequestHandler : RequestHandler
+        object of RequestHandler
+
+    Methods
+    -------
+    get_repository_list():
+        List of the repositories of all handlers.
+    generate_repository_list():
+        Retrieves the repositories of all handlers.
+    iter_repository_list():
+        yields the repositories of all handlers, discovering them lazily if
+        one of the handlers streams its discovery.
+
+    """
+
+    def __init__(self, github_token, request_params, handler_types):
+        """Constractor of CombinedRequestHandler Class.
+
+        Parameters
+        ----------
+        github_token : str
+            GitHub API Access Authentication token.
+        request_params : str
+            Parameters requerd for the search
+        handler_types : list (type)
+            Request handler classes whose mandatory parameters are given.
+
+        """
+
+        super().__init__(github_token, request_params)
+        # Every handler keeps its own discovery manifest
+        self.discovery_cache = None
+        self.handlers = [handler_type(self.token_pool, request_params)
+                         for handler_type in handler_types]
+        self.stream_discovery = any(handler.stream_discovery
+                                    for handler in self.handlers)
+        self.discovery_complete = False
+        if not self.stream_discovery:
+            self.generate_repository_list()
+
+    def get_repository_list(self):
+        """
+        get_repository_list()
+
+        Implements the Abstract Method of the base class to return a list
+        of the repositories of all handlers.
+
+        Returns
+        -------
+        list :
+            List of repositories.
+
+        """
+
+        return self.repository_list
+
+    def _iter_new_repositories(self):
+        for handler in self.handlers:
+            for repo in handler.iter_repository_list():
+                if self.add_repository(repo):
+                    yield repo
+        self.discovery_complete = True
+
+    def generate_repository_list(self):
+        """
+        generate_repository_list()
+
+        Implements the Abstract Method of the base class to retrieve the
+        repositories of all handlers. Repositories selected by several
+        handlers are listed once.
+
+        """
+
+        for _ in self._iter_new_repositories():
+            pass
+
+    def iter_repository_list(self):
+        if self.discovery_complete:
+            yield from self.repository_list
+            return
+        yield from self._iter_new_repositories()
+
 
 class RequestHandlerFactory:
     """Class to check the mandatory parameters 
 
     get_request_handler(github_token, request_params):
-        
+        Returns the handler of the given selectors, a CombinedRequestHandler
+        if the parameters of several handlers are given.
     """
 
     @staticmethod
@@ -749,17 +1267,22 @@ class RequestHandlerFactory:
 
         all_handlers = utilities.get_all_subclasses(RequestHandler)
 
-        valid_repo_type = None
+        valid_repo_types = []
         for repo_type in all_handlers:
-            if utilities.check_attributes_in_dict(
-                    repo_type.MANDATORY_PARAMETERS,
-                    request_params.parameters.__dict__,
-                    stop_if_fails=False,
-            ):
-                valid_repo_type = repo_type
-
-        if valid_repo_type:
-            return valid_repo_type(github_token, request_params)
+            if hasattr(repo_type, "MANDATORY_PARAMETERS") and \
+                    utilities.check_attributes_in_dict(
+                        repo_type.MANDATORY_PARAMETERS,
+                        request_params.parameters.__dict__,
+                        stop_if_fails=False,
+                    ):
+                valid_repo_types.append(repo_type)
+
+        if len(valid_repo_types) > 1:
+            # The repositories of all selectors are extracted once
+            return CombinedRequestHandler(github_token, request_params,
+                                          valid_repo_types)
+        elif valid_repo_types:
+            return valid_repo_types[0](github_token, request_params)
         else:
             print("No matching repository handler found! Please check")
             print("spelling!")
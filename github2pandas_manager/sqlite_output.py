@@ -0,0 +1,222 @@
+from pathlib import Path
+import datetime
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Column identifying the repository of a row
+REPOSITORY_COLUMN = "repo_name"
+
+STORES = {}
+STORES_LOCK = threading.Lock()
+
+
+def get_store(path):
+    """Returns the process-wide store of a database file."""
+    path = Path(path).resolve()
+    with STORES_LOCK:
+        if path not in STORES:
+            STORES[path] = SQLiteStore(path)
+        return STORES[path]
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def to_sql_value(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (str, int, float, bytes)):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return int(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return value.isoformat()
+    # Lists, dicts and other objects are stored as text
+    return str(value)
+
+
+def to_sql_values(column):
+    """Converts a column to values supported by sqlite3."""
+    if isinstance(column.dtype, np.dtype):
+        if column.dtype.kind in "iub":
+            return column.tolist()
+        if column.dtype.kind == "f":
+            return column.astype(object).where(column.notna(), None).tolist()
+    return [to_sql_value(value) for value in column.tolist()]
+
+
+class SQLiteStore():
+    """Merged tables of a project in a single SQLite database.
+
+    Every merged table is stored in a table of the same name. Indexes on
+    repo_name, id and the *_at time columns allow filtered queries without
+    loading the tables. Tables with a repo_name column are updated per
+    repository, the rows of a repository are deleted and inserted again in
+    one transaction.
+
+    Methods
+    -------
+    has_table(table_name):
+        Checks whether a table exists.
+    replace_table(table_name, df):
+        Replaces a table completely.
+    append(table_name, df):
+        Appends rows to a table.
+    drop_table(table_name):
+        Removes a table.
+    rename_table(table_name, new_table_name):
+        Replaces a table by another one.
+    replace_repositories(table_name, df, repo_names):
+        Replaces the rows of repositories.
+    delete_repositories(table_name, repo_names):
+        Removes the rows of repositories.
+    count_rows(table_name):
+        Counts the rows of a table.
+    create_indexes(table_name):
+        Creates the indexes of a table.
+
+    """
+
+    DATABASE_FILE = "project.sqlite"
+
+    def __init__(self, path):
+        """Constructor of SQLiteStore Class.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the database file.
+
+        """
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False,
+                                          timeout=60)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+
+    def has_table(self, table_name):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+                " AND name = ?", (table_name,)).fetchone()
+        return row is not None
+
+    def get_columns(self, table_name):
+        rows = self.connection.execute(
+            f"PRAGMA table_info({quote(table_name)})").fetchall()
+        return [row[1] for row in rows]
+
+    def _insert(self, table_name, df):
+        # Columns missing in the table are added, new repositories may
+        # hold more columns than the ones merged before
+        columns = self.get_columns(table_name)
+        if not columns:
+            if df.columns.empty:
+                return
+            definitions = ", ".join(quote(name) for name in df.columns)
+            self.connection.execute(
+                f"CREATE TABLE {quote(table_name)} ({definitions})")
+        else:
+            for name in df.columns:
+                if name not in columns:
+                    self.connection.execute(
+                        f"ALTER TABLE {quote(table_name)}"
+                        f" ADD COLUMN {quote(name)}")
+        if df.empty:
+            return
+        names = ", ".join(quote(name) for name in df.columns)
+        placeholders = ", ".join("?" for _ in df.columns)
+        rows = zip(*(to_sql_values(df.iloc[:, index])
+                     for index in range(len(df.columns))))
+        self.connection.executemany(
+            f"INSERT INTO {quote(table_name)} ({names})"
+            f" VALUES ({placeholders})", rows)
+
+    def drop_table(self, table_name):
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"DROP TABLE IF EXISTS {quote(table_name)}")
+
+    def rename_table(self, table_name, new_table_name):
+        """Replaces a table by another table of the database in one
+        transaction. The table is removed if the other one is missing."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"DROP TABLE IF EXISTS {quote(new_table_name)}")
+            if self.get_columns(table_name):
+                self.connection.execute(
+                    f"ALTER TABLE {quote(table_name)}"
+                    f" RENAME TO {quote(new_table_name)}")
+
+    def replace_table(self, table_name, df):
+        """Replaces a table by a merged table and creates its indexes."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"DROP TABLE IF EXISTS {quote(table_name)}")
+            self._insert(table_name, df)
+        self.create_indexes(table_name)
+
+    def append(self, table_name, df):
+        with self.lock, self.connection:
+            self._insert(table_name, df)
+
+    def _delete(self, table_name, repo_names):
+        if REPOSITORY_COLUMN in self.get_columns(table_name):
+            self.connection.executemany(
+                f"DELETE FROM {quote(table_name)}"
+                f" WHERE {quote(REPOSITORY_COLUMN)} = ?",
+                [(str(repo_name),) for repo_name in repo_names])
+
+    def delete_repositories(self, table_name, repo_names):
+        with self.lock, self.connection:
+            self._delete(table_name, repo_names)
+
+    def replace_repositories(self, table_name, df, repo_names):
+        """
+        replace_repositories(table_name, df, repo_names)
+
+        Replaces the rows of some repositories in one transaction.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the merged table.
+        df : DataFrame
+            New rows of the repositories.
+        repo_names : list (str)
+            repo_name values of all replaced repositories, repositories
+            without new rows are removed.
+
+        """
+
+        with self.lock, self.connection:
+            self._delete(table_name, repo_names)
+            self._insert(table_name, df)
+
+    def count_rows(self, table_name):
+        with self.lock:
+            return self.connection.execute(
+                f"SELECT COUNT(*) FROM {quote(table_name)}").fetchone()[0]
+
+    def create_indexes(self, table_name):
+        """Indexes repo_name, id and the *_at columns of a table."""
+        with self.lock, self.connection:
+            for name in self.get_columns(table_name):
+                if name in (REPOSITORY_COLUMN, "id") or name.endswith("_at"):
+                    self.connection.execute(
+                        "CREATE INDEX IF NOT EXISTS"
+                        f" {quote(table_name + '_' + name)}"
+                        f" ON {quote(table_name)} ({quote(name)})")
@@ -0,0 +1,241 @@
+from pathlib import Path
+import sqlite3
+import threading
+
+import pandas as pd
+
+
+class TaskLedger():
+    """Append-only ledger of the extraction tasks of a project.
+
+    Every finished or failed (repository, content) task is appended to a
+    SQLite database in the project folder as soon as it completes, together
+    with the run it belongs to. Runs are marked as finished when all their
+    tasks were processed. The latest entry of a task in an interrupted run
+    describes its state, which allows the run to be resumed without
+    extracting finished tasks again.
+
+    Methods
+    -------
+    start_run(resume):
+        Starts a new run or continues the last interrupted one.
+    finish_run():
+        Marks the current run as finished.
+    record(repo_name, content, state, started_at, finished_at,
+           request_cost, message):
+        Appends the outcome of a task.
+    get_latest_states():
+        Returns the latest entry of every task of the current run.
+    get_finished_tasks():
+        Returns the starting time of the finished tasks of the run.
+    get_request_costs():
+        Returns the request cost of the last extraction of every task.
+    close():
+        Closes the database connection.
+
+    """
+
+    LEDGER_FILE = "task_ledger.sqlite"
+
+    FINISHED = "finished"
+    FAILED = "failed"
+
+    def __init__(self, project_folder, file_name=LEDGER_FILE):
+        """Constructor of TaskLedger Class.
+
+        Parameters
+        ----------
+        project_folder : str
+            Folder of the project holding the ledger.
+        file_name : str
+            File name of the ledger database.
+
+        Attributes
+        ----------
+        path : Path
+            Path of the ledger database.
+        connection : sqlite3.Connection
+            Connection shared by all threads of the extractor.
+        lock : threading.Lock
+            Lock serialising the access to the connection.
+        run_id : int
+            Run of the recorded tasks, see start_run.
+
+        """
+
+        self.path = Path(project_folder, file_name)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " started_at TEXT,"
+                " finished_at TEXT)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " run_id INTEGER REFERENCES runs (id),"
+                " repo_name TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " state TEXT NOT NULL,"
+                " started_at TEXT,"
+                " finished_at TEXT,"
+                " request_cost INTEGER,"
+                " message TEXT)"
+            )
+        self.run_id = None
+
+    def start_run(self, resume=False):
+        """
+        start_run(resume=False)
+
+        Starts a run. With resume the last run is continued if it was
+        interrupted, a run which finished is never resumed.
+
+        Parameters
+        ----------
+        resume : bool
+            Continue the last run if it did not finish.
+
+        Returns
+        -------
+        bool :
+            True if an interrupted run is continued.
+
+        """
+
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT id, finished_at FROM runs ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            if resume and row is not None and row[1] is None:
+                self.run_id = row[0]
+                return True
+            self.run_id = self.connection.execute(
+                "INSERT INTO runs (started_at) VALUES (?)",
+                (str(pd.Timestamp.now()),)).lastrowid
+            return False
+
+    def finish_run(self):
+        """Marks the current run as finished, it is not resumed then."""
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE runs SET finished_at = ? WHERE id = ?",
+                (str(pd.Timestamp.now()), self.run_id))
+
+    def record(self, repo_name, content, state, started_at=None,
+               finished_at=None, request_cost=None, message=None):
+        """
+        record(repo_name, content, state, started_at=None, finished_at=None,
+               request_cost=None, message=None)
+
+        Appends the outcome of a task and commits it immediately.
+
+        Parameters
+        ----------
+        repo_name : str
+            Full name of the repository.
+        content : str
+            Content type of the task.
+        state : str
+            TaskLedger.FINISHED or TaskLedger.FAILED.
+        started_at : Timestamp
+            Start time of the task.
+        finished_at : Timestamp
+            End time of the task.
+        request_cost : int
+            Number of API requests spent on the task.
+        message : str
+            Error message of failed tasks.
+
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO tasks (repo_name, content, state, started_at,"
+                " finished_at, request_cost, message, run_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (repo_name, content, state,
+                 None if started_at is None else str(started_at),
+                 None if finished_at is None else str(finished_at),
+                 request_cost, message, self.run_id)
+            )
+
+    def get_latest_states(self):
+        """
+        get_latest_states()
+
+        Returns the latest entry of every task of the current run.
+
+        Returns
+        -------
+        DataFrame :
+            One row per (repo_name, content) task.
+
+        """
+
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT * FROM tasks WHERE id IN"
+                " (SELECT MAX(id) FROM tasks WHERE run_id IS ?"
+                " GROUP BY repo_name, content)",
+                self.connection, params=(self.run_id,)
+            )
+
+    def get_finished_tasks(self):
+        """
+        get_finished_tasks()
+
+        Returns the starting time of the tasks of the current run whose
+        latest entry is finished. Failed tasks are not contained and
+        therefore retried.
+        Changes made while a task was running are only contained in an
+        extraction starting after it, see Incremental_updater.
+
+        Returns
+        -------
+        dict :
+            Starting time by (repo_name, content).
+
+        """
+
+        states = self.get_latest_states()
+        finished = states[states.state == TaskLedger.FINISHED]
+        return {(row.repo_name, row.content): pd.Timestamp(
+                    row.finished_at if pd.isna(row.started_at)
+                    else row.started_at)
+                for row in finished.itertuples()}
+
+    def get_request_costs(self):
+        """
+        get_request_costs()
+
+        Returns the number of API requests spent on the last finished
+        extraction of every task over all runs.
+
+        Returns
+        -------
+        dict :
+            Request cost by (repo_name, content).
+
+        """
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT repo_name, content, request_cost FROM tasks"
+                " WHERE id IN (SELECT MAX(id) FROM tasks"
+                " WHERE state = ? AND request_cost IS NOT NULL"
+                " GROUP BY repo_name, content)",
+                (TaskLedger.FINISHED,)).fetchall()
+        return {(repo_name, content): request_cost
+                for repo_name, content, request_cost in rows}
+
+    def close(self):
+        """Closes the database connection."""
+
+        with self.lock:
+            self.connection.close()
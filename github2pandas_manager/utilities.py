@@ -3,8 +3,9 @@ from github import Github
 import argparse
 import os
 import sys
-import time
-import math
+import threading
+
+from github2pandas_manager import connection_pool
 
 def check_file_path(file_path_name):
     if os.path.isfile(file_path_name):
@@ -12,9 +13,22 @@ def check_file_path(file_path_name):
     else:
         raise argparse.ArgumentTypeError(f"{file_path_name} is not a valid file")
 
+# Clients shared by all modules and threads of the process, by token
+GITHUB_USERS = {}
+GITHUB_USERS_LOCK = threading.Lock()
+
 def get_github_user(github_token):
-    git_user = Github(github_token, retry=10, timeout=10, per_page=1000)
-    return git_user
+    """Returns the process-wide client of a token.
+
+    All clients send their requests through the shared sessions of the
+    connection pool, which keeps connections alive between requests.
+    """
+    connection_pool.install()
+    with GITHUB_USERS_LOCK:
+        if github_token not in GITHUB_USERS:
+            GITHUB_USERS[github_token] = Github(github_token, retry=10,
+                                                timeout=10, per_page=1000)
+        return GITHUB_USERS[github_token]
 
 def check_attributes_in_dict(mandatory_list, parameter_dict, stop_if_fails = True):
     mandatory = set(mandatory_list)
@@ -68,35 +82,23 @@ def progressbar(it, prefix="", size=60, file=sys.stdout):
     file.write("\n")
     file.flush()
     
-def check_github_requests_limits(github_token, min_limit=100, show_msg=False):
-    github_user = get_github_user(github_token)
-    requests_remaning, requests_limit = github_user.rate_limiting
-    if show_msg:
-        print(requests_remaning, requests_limit)
-    if ((requests_limit == 5000) & (requests_remaning < min_limit)):
-        print("Waiting for request limit refresh ...")
-        reset_timestamp = github_user.rate_limiting_resettime
-        seconds_until_reset = reset_timestamp - time.time()
-        sleep_step_width = 1
-        sleeping_range = range(int(seconds_until_reset / sleep_step_width))
-        for i in progressbar(sleeping_range, "Sleeping : ", 60):
-            time.sleep(sleep_step_width)
-        requests_remaning, requests_limit = github_user.rate_limiting
-        if show_msg:
-            print("Remaining request limit {0:5d} / {1:5d}".format(
-                                                    requests_remaning,
-                                                    requests_limit))
-    return requests_remaning
+def get_parameter(parameters, name, default=None):
+    """Returns an optional config parameter or its default value."""
+    return getattr(parameters, name, default)
+
+def get_github_tokens(parameters):
+    """Collects the GitHub tokens of the config file or the environment.
 
-def check_github_search_limits(github_user, min_limit=10, show_msg=False):
-    search_rate_limit = github_user.get_rate_limit()
-    reset_timestamp = search_rate_limit.search.raw_data["reset"]
-    remaning_rate = search_rate_limit.search.remaining
-    seconds_to_reset = math.ceil(reset_timestamp - time.time())
-    if (seconds_to_reset <= 0) or (remaning_rate < min_limit):
-        if show_msg:
-            print(
-                f"Running low on search rate ... waiting for" 
-                f" {seconds_to_reset} seconds to refresh"
-            )
-        time.sleep(abs(seconds_to_reset))
+    Tokens are taken from the `github_tokens` list of the config file,
+    entries starting with `$` name environment variables. Without such a
+    list the comma separated TOKENS or the single TOKEN environment
+    variable is used.
+    """
+    github_tokens = get_parameter(parameters, "github_tokens", [])
+    github_tokens = [os.getenv(token[1:]) if token.startswith("$") else token
+                     for token in github_tokens]
+    if not github_tokens and os.getenv("TOKENS"):
+        github_tokens = os.getenv("TOKENS").split(",")
+    if not github_tokens and os.getenv("TOKEN"):
+        github_tokens = [os.getenv("TOKEN")]
+    return [token.strip() for token in github_tokens if token]
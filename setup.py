@@ -22,6 +22,9 @@ setup(
    install_requires=[
       "github2pandas",
    ], 
+   extras_require={
+      "parquet": ["pyarrow"],
+   },
    classifiers=[
       "Programming Language :: Python :: 3",
       "Operating System :: OS Independent",
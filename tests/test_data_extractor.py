@@ -0,0 +1,151 @@
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+from github2pandas.core import Core
+from github2pandas.github2pandas import GitHub2Pandas
+
+from github2pandas_manager.data_extractor import Github_data_extractor
+from github2pandas_manager.rate_limit import GOVERNOR, TokenPool
+from github2pandas_manager.task_ledger import TaskLedger
+
+TOKEN = "stub-token"
+REPO = "owner/repo"
+
+
+class SlowUser():
+    """PyGithub user stub, reading its name widens the window between
+    reading and rewriting Users.p in Core.extract_user_data."""
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.login = node_id
+        self.email = None
+
+    @property
+    def name(self):
+        time.sleep(0.05)
+        return self.node_id
+
+
+def extract_users(github_token, project_folder, repo_full_name, contents,
+                  graphql_content=(), graphql_url=None):
+    """Stub of Github_data_extractor.extract_repository, every content type
+    adds its users to Users.p like github2pandas."""
+    core = Core(None, SimpleNamespace(full_name=repo_full_name),
+                Path(project_folder), None)
+    results = []
+    for content_element, _ in contents:
+        started_at = pd.Timestamp.now()
+        for index in range(3):
+            core.extract_user_data(SlowUser(f"{content_element}-{index}"))
+        results.append((content_element, {
+            "started_at": started_at, "finished_at": pd.Timestamp.now(),
+            "request_cost": 0}))
+    return results
+
+
+def extract_exclusively(github_token, project_folder, repo_full_name,
+                        contents, graphql_content=(), graphql_url=None):
+    """Stub of Github_data_extractor.extract_repository, which fails if
+    another task of the repository runs at the same time. Lock files are
+    visible to the threads and the processes of the extraction."""
+    lock_path = Path(project_folder, repo_full_name.replace("/", "__"))
+    try:
+        with open(lock_path, "x"):
+            pass
+    except FileExistsError:
+        raise RuntimeError(f"{repo_full_name} is extracted twice")
+    try:
+        time.sleep(0.05)
+        if repo_full_name == "owner/broken":
+            raise RuntimeError("repository not found")
+    finally:
+        lock_path.unlink()
+    return [(content_element, {
+                "started_at": pd.Timestamp.now(),
+                "finished_at": pd.Timestamp.now(), "request_cost": 1})
+            for content_element, _ in contents]
+
+
+class TestConcurrentExtraction(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.project_folder = temp_dir.name
+        GOVERNOR.update(TOKEN, "core", 5000, 5000, time.time() + 3600)
+
+    def run_tasks(self, tasks):
+        status = {REPO: {}}
+        ledger = TaskLedger(self.project_folder)
+        parameters = SimpleNamespace(project_folder=self.project_folder)
+        with mock.patch.object(Github_data_extractor, "extract_repository",
+                               extract_users):
+            Github_data_extractor._run_concurrent(
+                TokenPool.from_tokens(TOKEN), parameters, tasks, status,
+                ledger, workers=2, version_workers=1)
+        ledger.close()
+        return status
+
+    def test_content_schedule_keeps_users_of_all_content_types(self):
+        contents = [("Issues", None), ("PullRequests", None)]
+        tasks = Github_data_extractor.schedule_tasks(
+            {REPO: contents}, ["Issues", "PullRequests"],
+            Github_data_extractor.SCHEDULE_CONTENT)
+        self.assertEqual(len(tasks), 2)
+        status = self.run_tasks(tasks)
+        users = Core.get_pandas_data_frame(
+            Path(self.project_folder, REPO), Core.UserFiles.USERS)
+        self.assertEqual(sorted(users["id"]), [
+            f"{content}-{index}" for content in ("Issues", "PullRequests")
+            for index in range(3)])
+        self.assertEqual(sorted(status[REPO]), ["Issues", "PullRequests"])
+
+    def test_tasks_of_a_repository_run_one_at_a_time(self):
+        repositories = [REPO, "owner/other", "owner/broken"]
+        content_elements = ["Issues", "PullRequests", "Version"]
+        # Version tasks run in the process pool
+        tasks = Github_data_extractor.schedule_tasks(
+            {repo_full_name: [(content_element, None)
+                              for content_element in content_elements]
+             for repo_full_name in repositories},
+            content_elements, Github_data_extractor.SCHEDULE_CONTENT)
+        status = {repo_full_name: {} for repo_full_name in repositories}
+        ledger = TaskLedger(self.project_folder)
+        ledger.start_run()
+        parameters = SimpleNamespace(project_folder=self.project_folder)
+        with mock.patch.object(Github_data_extractor, "extract_repository",
+                               extract_exclusively):
+            Github_data_extractor._run_concurrent(
+                TokenPool.from_tokens(TOKEN), parameters, tasks, status,
+                ledger, workers=4, version_workers=2)
+        states = ledger.get_latest_states()
+        ledger.close()
+        self.assertEqual(len(states), 9)
+        failed = states[states["state"] == TaskLedger.FAILED]
+        self.assertEqual(sorted(failed["repo_name"].unique()),
+                         ["owner/broken"])
+        self.assertTrue(failed["message"].eq("repository not found").all())
+        self.assertEqual(len(failed), 3)
+        for repo_full_name in (REPO, "owner/other"):
+            self.assertEqual(sorted(status[repo_full_name]),
+                             sorted(content_elements))
+        self.assertEqual(status["owner/broken"], {})
+
+    def test_register_repositories(self):
+        tasks = [(REPO, [("Issues", None)]), (REPO, [("Version", None)]),
+                 ("owner/other", [("Issues", None)])]
+        registered = list(Github_data_extractor.register_repositories(
+            iter(tasks), self.project_folder))
+        self.assertEqual(registered, tasks)
+        self.assertEqual(GitHub2Pandas.get_full_names_of_repositories(
+            self.project_folder), [REPO, "owner/other"])
+
+
+if __name__ == "__main__":
+    unittest.main()
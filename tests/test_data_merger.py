@@ -0,0 +1,413 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+import contextlib
+import io
+import pickle
+import sqlite3
+import tempfile
+import unittest
+
+import pandas as pd
+from github2pandas.core import Core
+from github2pandas.issues import Issues
+
+from github2pandas_manager import parquet_output
+from github2pandas_manager.data_merger import Github_data_merger
+from github2pandas_manager.dataset import ProjectDataset
+from github2pandas_manager.merge_manifest import MergeManifest
+from github2pandas_manager.merge_pipeline import MergePipeline
+
+REPOSITORIES = ["a/one", "b/two"]
+
+
+def get_project_folder(test_case):
+    """Returns a temporary project folder removed after the test."""
+    temp_dir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(temp_dir.cleanup)
+    return temp_dir.name
+
+
+def write_issues(project_folder, repo_full_name, ids):
+    data_dir = Path(project_folder, repo_full_name, Issues.Files.DATA_DIR)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame({"id": ids, "title": [f"issue\n{id}" for id in ids]})
+    with open(Path(data_dir, Issues.Files.ISSUES), "wb") as f:
+        pickle.dump(df, f)
+
+
+def read_output(project_folder, output_format):
+    """Returns the sorted (repo_name, id) pairs of a merged Issues table."""
+    path = Github_data_merger.get_output_path(project_folder, "Issues",
+                                              output_format)
+    if output_format == "parquet":
+        df = parquet_output.read_table(path)
+    elif output_format == "csv":
+        df = pd.read_csv(path)
+    elif output_format == "pickle":
+        df = pd.read_pickle(path)
+    else:
+        with sqlite3.connect(path) as connection:
+            df = pd.read_sql_query("SELECT * FROM Issues", connection)
+    return sorted(zip(df["repo_name"].astype(str), df["id"].astype(int)))
+
+
+class TestIncrementalMerge(unittest.TestCase):
+
+    def merge(self, project_folder, output_formats, repositories=REPOSITORIES,
+              **settings):
+        parameters = SimpleNamespace(project_folder=project_folder,
+                                     **settings)
+        request_handler = SimpleNamespace(
+            request=SimpleNamespace(parameters=parameters),
+            repository_list=[
+                SimpleNamespace(full_name=full_name,
+                                name=full_name.split("/")[1])
+                for full_name in repositories])
+        manifest = MergeManifest(project_folder)
+        with ThreadPoolExecutor(max_workers=2) as load_pool:
+            output_paths, report = Github_data_merger.merge_table(
+                request_handler, Path(project_folder),
+                Github_data_merger.get_Issues, load_pool, output_formats,
+                manifest)
+        manifest.save()
+        return report
+
+    def test_all_format_combinations(self):
+        formats = Github_data_merger.OUTPUT_FORMATS
+        if not parquet_output.is_available():
+            formats = [output_format for output_format in formats
+                       if output_format != "parquet"]
+        for size in range(1, len(formats) + 1):
+            for output_formats in combinations(formats, size):
+                with self.subTest(output_formats=output_formats):
+                    project_folder = get_project_folder(self)
+                    write_issues(project_folder, "a/one", [1, 2])
+                    write_issues(project_folder, "b/two", [3])
+                    self.merge(project_folder, list(output_formats))
+                    write_issues(project_folder, "a/one", [1, 2, 4])
+                    self.merge(project_folder, list(output_formats))
+                    expected = [("one", 1), ("one", 2), ("one", 4),
+                                ("two", 3)]
+                    for output_format in output_formats:
+                        self.assertEqual(
+                            read_output(project_folder, output_format),
+                            expected, output_format)
+
+    @unittest.skipUnless(parquet_output.is_available(), "requires pyarrow")
+    def test_repositories_sharing_a_name(self):
+        repositories = ["a/utils", "b/utils"]
+        for streaming_merge in (False, True):
+            with self.subTest(streaming_merge=streaming_merge):
+                project_folder = get_project_folder(self)
+                write_issues(project_folder, "a/utils", [1])
+                write_issues(project_folder, "b/utils", [2])
+                self.merge(project_folder, ["parquet", "sqlite"],
+                           repositories, streaming_merge=streaming_merge)
+                write_issues(project_folder, "a/utils", [1, 3])
+                self.merge(project_folder, ["parquet", "sqlite"],
+                           repositories, streaming_merge=streaming_merge)
+                path = Github_data_merger.get_output_path(
+                    project_folder, "Issues", "parquet")
+                self.assertEqual(
+                    sorted(partition_dir.name
+                           for partition_dir in path.glob("repo=*")),
+                    ["repo=a__utils", "repo=b__utils"])
+                for output_format in ("parquet", "sqlite"):
+                    self.assertEqual(
+                        read_output(project_folder, output_format),
+                        [("utils", 1), ("utils", 2), ("utils", 3)])
+                issues = ProjectDataset(project_folder)["Issues"]
+                self.assertEqual(
+                    sorted(issues.filter(repos="a/utils").read()["id"]),
+                    [1, 3])
+                self.assertEqual(
+                    sorted(issues.filter(repos="utils").read()["id"]),
+                    [1, 2, 3])
+
+    def test_pickle_output_drops_the_partition_column(self):
+        project_folder = get_project_folder(self)
+        write_issues(project_folder, "a/utils", [1])
+        write_issues(project_folder, "b/utils", [2])
+        self.merge(project_folder, ["pickle"], ["a/utils", "b/utils"])
+        df = pd.read_pickle(Github_data_merger.get_output_path(
+            project_folder, "Issues", "pickle"))
+        self.assertNotIn(parquet_output.PARTITION_COLUMN, df.columns)
+        self.assertEqual(read_output(project_folder, "pickle"),
+                         [("utils", 1), ("utils", 2)])
+
+    def test_changed_settings_merge_completely(self):
+        project_folder = get_project_folder(self)
+        write_issues(project_folder, "a/one", [1, 2])
+        write_issues(project_folder, "b/two", [3])
+        self.merge(project_folder, ["pickle"])
+        self.assertTrue(self.merge(project_folder, ["pickle"])["unchanged"])
+        report = self.merge(project_folder, ["pickle"], compact_dtypes=True)
+        self.assertNotIn("unchanged", report)
+        df = pd.read_pickle(Github_data_merger.get_output_path(
+            project_folder, "Issues", "pickle"))
+        self.assertIsInstance(df["repo_name"].dtype, pd.CategoricalDtype)
+        report = self.merge(project_folder, ["pickle"], compact_dtypes=True,
+                            sanitize_newlines=False)
+        self.assertNotIn("unchanged", report)
+        df = pd.read_pickle(Github_data_merger.get_output_path(
+            project_folder, "Issues", "pickle"))
+        self.assertEqual(df["title"].tolist()[0], "issue\n1")
+
+    def test_streaming_merge_removes_previous_pickle(self):
+        project_folder = get_project_folder(self)
+        write_issues(project_folder, "a/one", [1, 2])
+        write_issues(project_folder, "b/two", [3])
+        self.merge(project_folder, ["csv", "pickle"])
+        pickle_path = Github_data_merger.get_output_path(
+            project_folder, "Issues", "pickle")
+        self.assertTrue(pickle_path.is_file())
+        write_issues(project_folder, "a/one", [1, 2, 4])
+        self.merge(project_folder, ["csv", "pickle"], streaming_merge=True)
+        self.assertFalse(pickle_path.exists())
+        self.assertEqual(
+            MergeManifest(project_folder).tables["Issues"]["skipped_formats"],
+            ["pickle"])
+        # The dataset falls back to the streamed csv file
+        issues = ProjectDataset(project_folder)["Issues"]
+        self.assertEqual(issues.get_source(), "csv")
+        self.assertEqual(sorted(issues.read()["id"]), [1, 2, 3, 4])
+
+    def test_default_output_formats(self):
+        parameters = SimpleNamespace(project_folder=get_project_folder(self))
+        self.assertEqual(Github_data_merger.get_output_formats(parameters),
+                         ["csv", "pickle"])
+
+
+def write_labeled_issues(project_folder, repo_full_name, ids):
+    """Writes issues with a label column of few distinct values, two of
+    them only differ by a new line, and two authors."""
+    data_dir = Path(project_folder, repo_full_name, Issues.Files.DATA_DIR)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    labels = ["bug\nfix", "bug fix", "feature"]
+    df = pd.DataFrame({"id": ids,
+                       "title": [f"issue\n{id}" for id in ids],
+                       "label": [labels[id % 3] for id in ids],
+                       "author": [f"user{id % 2}" for id in ids],
+                       "created_at": [f"2021-01-{id % 28 + 1:02d}T10:00:00Z"
+                                      for id in ids]})
+    with open(Path(data_dir, Issues.Files.ISSUES), "wb") as f:
+        pickle.dump(df, f)
+
+
+def read_table(project_folder, output_format):
+    path = Github_data_merger.get_output_path(project_folder, "Issues",
+                                              output_format)
+    if output_format == "parquet":
+        df = parquet_output.read_table(path)
+    elif output_format == "csv":
+        df = pd.read_csv(path)
+    elif output_format == "pickle":
+        df = pd.read_pickle(path)
+    else:
+        with sqlite3.connect(path) as connection:
+            df = pd.read_sql_query("SELECT * FROM Issues", connection)
+    return df.sort_values("id").reset_index(drop=True)
+
+
+class TestCompactDtypes(unittest.TestCase):
+
+    merge = TestIncrementalMerge.merge
+
+    def check_outputs(self, project_folder, output_formats, ids):
+        for output_format in output_formats:
+            df = read_table(project_folder, output_format)
+            self.assertEqual(df["id"].astype(int).tolist(), ids,
+                             output_format)
+            sanitized = output_format in ("csv", "pickle")
+            labels = ["bug fix" if sanitized else "bug\nfix", "bug fix",
+                      "feature"]
+            self.assertEqual(df["label"].astype(str).tolist(),
+                             [labels[id % 3] for id in ids], output_format)
+            separator = " " if sanitized else "\n"
+            self.assertEqual(df["title"].astype(str).tolist(),
+                             [f"issue{separator}{id}" for id in ids],
+                             output_format)
+            self.assertEqual(
+                pd.to_datetime(df["created_at"], utc=True).dt.day.tolist(),
+                [id % 28 + 1 for id in ids], output_format)
+
+    def test_compact_tables_in_all_formats(self):
+        output_formats = Github_data_merger.OUTPUT_FORMATS
+        if not parquet_output.is_available():
+            output_formats = [output_format
+                              for output_format in output_formats
+                              if output_format != "parquet"]
+        project_folder = get_project_folder(self)
+        ids = list(range(1, 9))
+        write_labeled_issues(project_folder, "a/one", ids[:5])
+        write_labeled_issues(project_folder, "b/two", ids[5:])
+        report = self.merge(project_folder, output_formats,
+                            compact_dtypes=True)
+        self.assertLessEqual(report["compact_memory_mb"],
+                             report["memory_mb"])
+        df = pd.read_pickle(Github_data_merger.get_output_path(
+            project_folder, "Issues", "pickle"))
+        self.assertEqual(df["id"].dtype, "int8")
+        self.assertIsInstance(df["label"].dtype, pd.CategoricalDtype)
+        # Categories only differing by a new line are merged
+        self.assertEqual(sorted(df["label"].cat.categories),
+                         ["bug fix", "feature"])
+        # Free text stays a string column, however few values it has
+        self.assertNotIsInstance(df["author"].dtype, pd.CategoricalDtype)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(
+            df["created_at"]))
+        self.check_outputs(project_folder, output_formats, ids)
+        # Ids exceeding int8 do not fit the stored Parquet schema
+        ids.append(300)
+        write_labeled_issues(project_folder, "a/one", ids[:5] + [300])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            report = self.merge(project_folder, output_formats,
+                                compact_dtypes=True)
+        self.assertNotIn("unchanged", report)
+        if "parquet" in output_formats:
+            self.assertIn("merged completely", output.getvalue())
+        self.check_outputs(project_folder, output_formats, ids)
+        df = pd.read_pickle(Github_data_merger.get_output_path(
+            project_folder, "Issues", "pickle"))
+        self.assertEqual(df["id"].dtype, "int16")
+
+
+class TestUsers(unittest.TestCase):
+
+    def test_users_are_merged_once_with_memberships(self):
+        project_folder = get_project_folder(self)
+        for index, repo_full_name in enumerate(REPOSITORIES):
+            Path(project_folder, repo_full_name).mkdir(parents=True)
+            with open(Path(project_folder, repo_full_name,
+                           Core.UserFiles.USERS), "wb") as f:
+                pickle.dump(pd.DataFrame({"id": [f"user-{index}", "shared"]}),
+                            f)
+        parameters = SimpleNamespace(project_folder=project_folder)
+        request_handler = SimpleNamespace(
+            request=SimpleNamespace(parameters=parameters),
+            repository_list=[
+                SimpleNamespace(full_name=full_name,
+                                name=full_name.split("/")[1])
+                for full_name in REPOSITORIES])
+        with ThreadPoolExecutor(max_workers=2) as load_pool:
+            for merge_fct in Github_data_merger.CLASSES["Users"]:
+                Github_data_merger.merge_table(
+                    request_handler, Path(project_folder), merge_fct,
+                    load_pool, ["pickle"])
+        users = pd.read_pickle(Github_data_merger.get_output_path(
+            project_folder, "Users", "pickle"))
+        self.assertEqual(sorted(users["id"]), ["shared", "user-0", "user-1"])
+        self.assertNotIn("repo_name", users.columns)
+        memberships = pd.read_pickle(Github_data_merger.get_output_path(
+            project_folder, "UsersMembership", "pickle"))
+        self.assertEqual(
+            sorted(zip(memberships["id"], memberships["repo_name"])),
+            [("shared", "one"), ("shared", "two"), ("user-0", "one"),
+             ("user-1", "two")])
+
+
+class TestMergePipeline(unittest.TestCase):
+
+    def run_pipeline(self, project_folder, handed, finish=True, **settings):
+        parameters = SimpleNamespace(project_folder=project_folder,
+                                     content=["Issues"],
+                                     incremental_merge=True, **settings)
+        request_handler = SimpleNamespace(
+            request=SimpleNamespace(parameters=parameters),
+            repository_list=[
+                SimpleNamespace(full_name=full_name,
+                                name=full_name.split("/")[1])
+                for full_name in REPOSITORIES])
+        pipeline = MergePipeline(request_handler)
+        pipeline.start()
+        for repo_full_name in handed:
+            pipeline.repo_finished(repo_full_name)
+        if finish:
+            pipeline.finish()
+        else:
+            # Waits for the consumer only, like an interrupted run
+            pipeline.queue.put(None)
+            pipeline.thread.join()
+        return pipeline
+
+    @unittest.skipUnless(parquet_output.is_available(), "requires pyarrow")
+    def test_interrupted_stream_keeps_previous_outputs(self):
+        project_folder = get_project_folder(self)
+        write_issues(project_folder, "a/one", [1, 2])
+        write_issues(project_folder, "b/two", [3])
+        settings = {"output_formats": ["parquet", "sqlite", "csv"],
+                    "streaming_merge": True}
+        self.run_pipeline(project_folder, REPOSITORIES, **settings)
+        expected = [("one", 1), ("one", 2), ("two", 3)]
+        write_issues(project_folder, "a/one", [1, 2, 4])
+        self.run_pipeline(project_folder, REPOSITORIES, finish=False,
+                          **settings)
+        for output_format in ("parquet", "sqlite", "csv"):
+            self.assertEqual(read_output(project_folder, output_format),
+                             expected, output_format)
+        self.run_pipeline(project_folder, REPOSITORIES, **settings)
+        for output_format in ("parquet", "sqlite", "csv"):
+            self.assertEqual(read_output(project_folder, output_format),
+                             sorted(expected + [("one", 4)]), output_format)
+
+    def test_failed_repository_writes_are_not_duplicated(self):
+        project_folder = get_project_folder(self)
+        write_issues(project_folder, "a/one", [1, 2])
+        write_issues(project_folder, "b/two", [3])
+        get_output_table = Github_data_merger.get_output_table
+        failures = []
+
+        def failing_output_table(parameters, df, table_name, output_format):
+            # The csv part of the first repository cannot be written
+            if output_format == "csv" and table_name == "Issues" and \
+                    not failures:
+                failures.append(table_name)
+                raise OSError("disk full")
+            return get_output_table(parameters, df, table_name,
+                                    output_format)
+
+        with mock.patch.object(Github_data_merger, "get_output_table",
+                               failing_output_table):
+            self.run_pipeline(project_folder, REPOSITORIES,
+                              output_formats=["sqlite", "csv"],
+                              streaming_merge=True)
+        expected = [("one", 1), ("one", 2), ("two", 3)]
+        for output_format in ("sqlite", "csv"):
+            self.assertEqual(read_output(project_folder, output_format),
+                             expected, output_format)
+
+    @unittest.skipUnless(parquet_output.is_available(), "requires pyarrow")
+    def test_streams_replace_changed_repositories(self):
+        project_folder = get_project_folder(self)
+        write_issues(project_folder, "a/one", [1, 2])
+        write_issues(project_folder, "b/two", [3])
+        settings = {"output_formats": ["parquet", "sqlite"],
+                    "streaming_merge": True}
+        self.run_pipeline(project_folder, REPOSITORIES, **settings)
+        part_path = Path(parquet_output.get_partition_dir(
+            Github_data_merger.get_output_path(project_folder, "Issues",
+                                               "parquet"), "b__two"),
+            "part-0.parquet")
+        mtime = part_path.stat().st_mtime_ns
+        write_issues(project_folder, "a/one", [1, 2, 4])
+        pipeline = self.run_pipeline(project_folder, REPOSITORIES, **settings)
+        self.assertEqual(pipeline.streams["Issues"]["repo_names"], {"one"})
+        # The unchanged repository is kept
+        self.assertEqual(part_path.stat().st_mtime_ns, mtime)
+        expected = [("one", 1), ("one", 2), ("one", 4), ("two", 3)]
+        for output_format in ("parquet", "sqlite"):
+            self.assertEqual(read_output(project_folder, output_format),
+                             expected, output_format)
+        # Repositories not handed to the pipeline are merged at the end
+        write_issues(project_folder, "b/two", [3, 5])
+        self.run_pipeline(project_folder, [], **settings)
+        self.assertEqual(read_output(project_folder, "parquet"),
+                         expected + [("two", 5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+import pickle
+import tempfile
+import unittest
+
+import pandas as pd
+from github2pandas.core import Core
+from github2pandas.issues import Issues
+
+from github2pandas_manager import parquet_output
+from github2pandas_manager.data_merger import Github_data_merger
+from github2pandas_manager.dataset import ProjectDataset
+
+REPOSITORIES = ["a/one", "b/two"]
+
+
+def write_raw(project_folder, repo_full_name, data_dir, file_name, df):
+    path = Path(project_folder, repo_full_name, data_dir, file_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(df, f)
+
+
+def merge(project_folder, merge_fct, output_formats):
+    parameters = SimpleNamespace(project_folder=project_folder)
+    request_handler = SimpleNamespace(
+        request=SimpleNamespace(parameters=parameters),
+        repository_list=[
+            SimpleNamespace(full_name=full_name,
+                            name=full_name.split("/")[1])
+            for full_name in REPOSITORIES])
+    with ThreadPoolExecutor(max_workers=2) as load_pool:
+        Github_data_merger.merge_table(
+            request_handler,
+            Path(project_folder, Github_data_merger.RAW_DATA_FOLDER),
+            merge_fct, load_pool, output_formats)
+
+
+class TestProjectDataset(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.project_folder = temp_dir.name
+        for index, repo_full_name in enumerate(REPOSITORIES):
+            write_raw(self.project_folder, repo_full_name,
+                      Issues.Files.DATA_DIR, Issues.Files.ISSUES,
+                      pd.DataFrame({"id": [2 * index, 2 * index + 1],
+                                    "created_at": ["2021-01-01",
+                                                   "2022-01-01"]}))
+            write_raw(self.project_folder, repo_full_name, "",
+                      Core.UserFiles.USERS,
+                      pd.DataFrame({"id": [f"user-{index}", "shared"]}))
+        self.dataset = ProjectDataset(self.project_folder)
+
+    def test_source_order(self):
+        issues = self.dataset["Issues"]
+        filtered = issues.filter(repos="a/one")
+        self.assertEqual(issues.get_source(), "raw")
+        merge(self.project_folder, Github_data_merger.get_Issues, ["csv"])
+        self.assertEqual(issues.get_source(), "csv")
+        # Repository filters read the raw files instead of a full output
+        self.assertEqual(filtered.get_source(), "raw")
+        merge(self.project_folder, Github_data_merger.get_Issues,
+              ["csv", "pickle"])
+        self.assertEqual(issues.get_source(), "pickle")
+        merge(self.project_folder, Github_data_merger.get_Issues,
+              ["csv", "pickle", "sqlite"])
+        self.assertEqual(issues.get_source(), "sqlite")
+        self.assertEqual(filtered.get_source(), "sqlite")
+        if parquet_output.is_available():
+            merge(self.project_folder, Github_data_merger.get_Issues,
+                  ["csv", "pickle", "sqlite", "parquet"])
+            self.assertEqual(issues.get_source(), "parquet")
+            self.assertEqual(filtered.get_source(), "parquet")
+        self.assertEqual(sorted(filtered.read()["id"]), [0, 1])
+        self.assertEqual(
+            filtered.filter(since="2021-06-01").read()["id"].tolist(), [1])
+        self.assertEqual(sorted(issues.read()["id"]), [0, 1, 2, 3])
+
+    def test_untagged_tables_are_filtered_by_raw_files(self):
+        users = self.dataset["Users"]
+        merge(self.project_folder, Github_data_merger.get_Users,
+              ["pickle", "sqlite"])
+        self.assertEqual(users.get_source(), "sqlite")
+        self.assertEqual(sorted(users.read()["id"]),
+                         ["shared", "user-0", "user-1"])
+        filtered = users.filter(repos="b/two")
+        self.assertEqual(filtered.get_source(), "raw")
+        self.assertEqual(sorted(filtered.read()["id"]), ["shared", "user-1"])
+        self.assertEqual(sorted(users.filter(repos="one").read()["id"]),
+                         ["shared", "user-0"])
+
+    def test_missing_data(self):
+        with self.assertRaises(FileNotFoundError):
+            ProjectDataset(Path(self.project_folder, "missing"))
+        with self.assertRaises(KeyError):
+            self.dataset["Unknown"]
+        # Neither merged outputs nor raw files
+        workflows = self.dataset["Workflows"]
+        self.assertNotIn("Workflows", self.dataset.get_table_names())
+        with self.assertRaises(FileNotFoundError):
+            workflows.get_source()
+        with self.assertRaises(FileNotFoundError):
+            workflows.read()
+
+
+if __name__ == "__main__":
+    unittest.main()
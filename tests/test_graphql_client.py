@@ -0,0 +1,138 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import threading
+import time
+import unittest
+
+from github2pandas_manager.graphql_client import GraphQLClient
+from github2pandas_manager.rate_limit import GOVERNOR
+
+TOKEN = "stub-token"
+# Number of repositories by organization of the stub server
+ORGANIZATIONS = {"big": 250, "small": 3, "holes": 5, "broken": 2}
+
+
+def get_node(full_name):
+    name = full_name.split("/")[1]
+    return {"databaseId": abs(hash(full_name)) % 10 ** 6,
+            "nameWithOwner": full_name, "name": name, "diskUsage": 3,
+            "pushedAt": "2021-01-01T10:00:00Z",
+            "defaultBranchRef": {"name": "main"}}
+
+
+class StubGraphQLHandler(BaseHTTPRequestHandler):
+    """Answers aliased repository and organization queries like GitHub.
+
+    Repositories named "missing" and unknown organizations are null with
+    an alias error, "holes" holds null nodes and "broken" a node without
+    databaseId. Organization connections page with numeric cursors.
+    """
+
+    queries = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        variables = body["variables"]
+        StubGraphQLHandler.queries.append(variables)
+        data = {}
+        errors = []
+        index = 0
+        while f"owner{index}" in variables:
+            full_name = f"{variables[f'owner{index}']}/" \
+                f"{variables[f'name{index}']}"
+            if variables[f"name{index}"] == "missing":
+                data[f"r{index}"] = None
+                errors.append({"type": "NOT_FOUND", "path": [f"r{index}"],
+                               "message": f"Could not resolve {full_name}"})
+            else:
+                data[f"r{index}"] = get_node(full_name)
+            index += 1
+        index = 0
+        while f"login{index}" in variables:
+            org_name = variables[f"login{index}"]
+            data[f"o{index}"] = self.get_page(
+                org_name, int(variables[f"cursor{index}"] or 0))
+            if data[f"o{index}"] is None:
+                errors.append({"type": "NOT_FOUND", "path": [f"o{index}"],
+                               "message": f"Could not resolve {org_name}"})
+            index += 1
+        result = {"data": data, "errors": errors} if errors else {"data": data}
+        content = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Remaining", "4990")
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Reset", str(int(time.time() + 3600)))
+        self.send_header("X-RateLimit-Resource", "graphql")
+        self.end_headers()
+        self.wfile.write(content)
+
+    @staticmethod
+    def get_page(org_name, cursor):
+        if org_name not in ORGANIZATIONS:
+            return None
+        total = ORGANIZATIONS[org_name]
+        nodes = [get_node(f"{org_name}/r{index}")
+                 for index in range(cursor, min(total, cursor + 100))]
+        if org_name == "holes":
+            nodes[1] = None
+        if org_name == "broken":
+            del nodes[1]["databaseId"]
+        return {"repositories": {
+            "pageInfo": {"hasNextPage": cursor + 100 < total,
+                         "endCursor": str(cursor + 100)},
+            "nodes": nodes}}
+
+
+class TestGraphQLClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), StubGraphQLHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/graphql"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        GOVERNOR.update(TOKEN, "graphql", 5000, 5000, time.time() + 3600)
+        StubGraphQLHandler.queries.clear()
+        self.client = GraphQLClient(TOKEN, self.url)
+
+    def test_resolve_repositories(self):
+        repo_names = [f"o/r{index}" for index in range(150)]
+        repo_names.insert(120, "o/missing")
+        repositories, failures = self.client.resolve_repositories(
+            repo_names, workers=2)
+        self.assertEqual([repo.full_name for repo in repositories],
+                         [name for name in repo_names if name != "o/missing"])
+        self.assertEqual(list(failures), ["o/missing"])
+        self.assertIn("Could not resolve", failures["o/missing"])
+        self.assertEqual(len(StubGraphQLHandler.queries), 2)
+
+    def test_list_organizations(self):
+        org_names = ["small", "nope", "big", "holes", "broken"]
+        repositories, failures = self.client.list_organizations(
+            org_names, workers=2)
+        expected = [f"small/r{index}" for index in range(3)] + \
+            [f"big/r{index}" for index in range(250)] + \
+            [f"holes/r{index}" for index in range(5) if index != 1]
+        self.assertEqual([repo.full_name for repo in repositories], expected)
+        self.assertEqual(sorted(failures), ["broken", "nope"])
+        self.assertIn("Could not resolve", failures["nope"])
+        # All organizations in the first query, big pages twice more
+        self.assertEqual([len(variables) // 2 for variables
+                          in StubGraphQLHandler.queries], [5, 1, 1])
+        self.assertEqual(
+            [variables["cursor0"] for variables
+             in StubGraphQLHandler.queries[1:]], ["100", "200"])
+
+
+if __name__ == "__main__":
+    unittest.main()
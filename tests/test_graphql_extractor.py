@@ -0,0 +1,153 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+import base64
+import json
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+
+import pandas as pd
+from github2pandas.issues import Issues
+
+from github2pandas_manager.graphql_client import GraphQLClient
+from github2pandas_manager.graphql_extractor import GraphQLExtractor, \
+    get_database_id
+from github2pandas_manager.incremental import Incremental_updater
+from github2pandas_manager.rate_limit import GOVERNOR
+
+TOKEN = "stub-token"
+
+
+def get_event_id(database_id):
+    """Legacy node id of a closed event."""
+    return base64.b64encode(
+        f"010:ClosedEvent{database_id}".encode("ascii")).decode("ascii")
+
+
+def get_connection(nodes):
+    return {"totalCount": len(nodes),
+            "pageInfo": {"hasNextPage": False, "endCursor": None},
+            "nodes": nodes}
+
+
+def get_issue_node(number):
+    actor = {"login": "user", "id": "U_kgDOADP9xw", "name": None,
+             "email": ""}
+    return {
+        "id": f"I_{number}", "databaseId": 1000 + number, "number": number,
+        "title": "title", "body": "body", "state": "CLOSED",
+        "locked": False, "activeLockReason": None,
+        "createdAt": "2021-01-01T00:00:00Z",
+        "updatedAt": f"2021-02-{number:02d}T00:00:00Z",
+        "closedAt": "2021-01-05T00:00:00Z", "author": actor,
+        "assignees": get_connection([]), "labels": get_connection([]),
+        "comments": get_connection([]), "reactions": get_connection([]),
+        "timelineItems": get_connection([
+            {"__typename": "ClosedEvent", "id": get_event_id(number),
+             "createdAt": "2021-01-05T00:00:00Z", "actor": actor,
+             "closer": None},
+            # Not an issue event of the REST API
+            {"__typename": "IssueComment", "id": "IC_1"},
+        ]),
+    }
+
+
+class StubGraphQLHandler(BaseHTTPRequestHandler):
+    """Returns the issue 1 and the pull request 2 of a repository."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if "issues(" in body["query"]:
+            data = {"issues": get_connection([get_issue_node(1)])}
+        else:
+            data = {"pullRequests": get_connection([get_issue_node(2)])}
+        content = json.dumps({"data": {"repository": data}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StubRepository():
+    """PyGithub repository listing the REST issues."""
+
+    def get_issues(self, **arguments):
+        return [SimpleNamespace(number=2, id=42),
+                SimpleNamespace(number=1, id=1001)]
+
+
+class TestGraphQLExtractor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), StubGraphQLHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/graphql"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        GOVERNOR.update(TOKEN, "graphql", 5000, 5000, time.time() + 3600)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.repo_base_folder = Path(temp_dir.name, "owner", "repo")
+        self.extractor = GraphQLExtractor(
+            GraphQLClient(TOKEN, self.url), StubRepository(), "owner/repo",
+            self.repo_base_folder)
+
+    def read(self, file_name):
+        return pd.read_pickle(Path(self.repo_base_folder,
+                                   Issues.Files.DATA_DIR, file_name))
+
+    def test_get_database_id(self):
+        self.assertEqual(get_database_id("U_kgDOADP9xw"), 3407303)
+        self.assertEqual(get_database_id("MDQ6VXNlcjM0MDczMDM="), 3407303)
+        self.assertIsNone(get_database_id("IC_1"))
+        self.assertIsNone(get_database_id(None))
+
+    def test_rest_compatible_ids(self):
+        self.extractor.extract("Issues")
+        issues = self.read(Issues.Files.ISSUES)
+        self.assertEqual(issues["id"].tolist(), [1001, 42])
+        events = self.read(Issues.Files.EVENTS)
+        self.assertEqual(events["id"].tolist(), [1, 2])
+        self.assertEqual(events["issue_id"].tolist(), [1001, 42])
+        self.assertEqual(events["event"].tolist(), ["closed", "closed"])
+
+    def test_upsert_replaces_rest_rows(self):
+        data_dir = Path(self.repo_base_folder, Issues.Files.DATA_DIR)
+        data_dir.mkdir(parents=True)
+        # Rows of a previous REST extraction
+        rest_tables = {
+            Issues.Files.ISSUES: pd.DataFrame({"id": [42, 7],
+                                               "title": ["old", "other"]}),
+            Issues.Files.COMMENTS: pd.DataFrame(),
+            Issues.Files.EVENTS: pd.DataFrame({"id": [2], "issue_id": [42]}),
+            Issues.Files.ISSUES_REACTIONS: pd.DataFrame(),
+        }
+        for file_name, df in rest_tables.items():
+            with open(Path(data_dir, file_name), "wb") as f:
+                pickle.dump(df, f)
+        old_tables = Incremental_updater.load_tables(self.repo_base_folder,
+                                                     "Issues")
+        self.extractor.extract("Issues", pd.Timestamp("2021-01-01", tz="UTC"))
+        Incremental_updater.upsert_tables(self.repo_base_folder, "Issues",
+                                          old_tables)
+        issues = self.read(Issues.Files.ISSUES)
+        self.assertEqual(sorted(issues["id"]), [7, 42, 1001])
+        self.assertEqual(
+            issues.loc[issues["id"] == 42, "title"].tolist(), ["title"])
+        self.assertEqual(sorted(self.read(Issues.Files.EVENTS)["id"]), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
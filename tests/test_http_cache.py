@@ -0,0 +1,134 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from github2pandas_manager import connection_pool
+from github2pandas_manager.http_cache import ConditionalRequestCache
+
+ETAG = '"v1"'
+
+
+class StubRESTHandler(BaseHTTPRequestHandler):
+    """Answers GET requests with an ETag, revalidated ones with 304."""
+
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        StubRESTHandler.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        content = b'{"id": 1}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestConditionalRequestCache(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache = ConditionalRequestCache(temp_dir.name)
+        self.addCleanup(self.cache.close)
+
+    def get_accessed_at(self, key):
+        with sqlite3.connect(self.cache.path) as connection:
+            return connection.execute(
+                "SELECT accessed_at FROM responses WHERE key = ?",
+                (key,)).fetchone()[0]
+
+    def test_key_ignores_token(self):
+        url = "https://api.github.com/repos/owner/repo/issues?page=2"
+        key = ConditionalRequestCache.get_key(
+            url, {"Authorization": "token one", "Accept": "application/json"})
+        self.assertEqual(key, ConditionalRequestCache.get_key(
+            url, {"Authorization": "token two", "Accept": "application/json"}))
+        self.assertNotEqual(key, ConditionalRequestCache.get_key(
+            url, {"Authorization": "token one",
+                  "Accept": "application/vnd.github.v3.star+json"}))
+        self.assertNotEqual(key, ConditionalRequestCache.get_key(
+            url.replace("page=2", "page=3"), {"Accept": "application/json"}))
+
+    def test_eviction_order(self):
+        self.cache.max_size = 10
+        with mock.patch("github2pandas_manager.http_cache.time.time",
+                        side_effect=[1, 2, 3, 4]):
+            for key in ("a", "b", "c"):
+                self.cache.store(key, key, {"ETag": key}, b"12345")
+            # Most recently used
+            self.assertIsNotNone(self.cache.get("a"))
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+    def test_close_writes_access_times(self):
+        with mock.patch("github2pandas_manager.http_cache.time.time",
+                        side_effect=[1, 2]):
+            self.cache.store("a", "a", {"ETag": "a"}, b"body")
+            self.cache.get("a")
+        self.assertEqual(self.get_accessed_at("a"), 1)
+        self.cache.close()
+        self.assertEqual(self.get_accessed_at("a"), 2)
+        # The cache opens a new connection after close
+        self.assertIsNotNone(self.cache.get("a"))
+
+
+class TestRevalidation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), StubRESTHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubRESTHandler.requests.clear()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.previous_cache = connection_pool.SharedSessionConnection.cache
+        cache = ConditionalRequestCache(temp_dir.name)
+        self.addCleanup(cache.close)
+        connection_pool.SharedSessionConnection.cache = cache
+
+    def tearDown(self):
+        connection_pool.SharedSessionConnection.cache = self.previous_cache
+
+    def request(self, token):
+        connection = connection_pool.SharedSessionHTTPConnection(
+            "127.0.0.1", self.server.server_port)
+        connection.request("GET", "/repos/owner/repo", None,
+                           {"Authorization": f"token {token}",
+                            "Accept": "application/json"})
+        return connection.getresponse()
+
+    def test_not_modified_response_uses_cached_body(self):
+        self.assertEqual(self.request("one").read(), '{"id": 1}')
+        requests_before = connection_pool.get_request_count()
+        # Another token of the pool revalidates the same response
+        response = self.request("two")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), '{"id": 1}')
+        self.assertEqual(StubRESTHandler.requests[1]["If-None-Match"], ETAG)
+        self.assertEqual(connection_pool.get_request_count(),
+                         requests_before)
+
+
+if __name__ == "__main__":
+    unittest.main()
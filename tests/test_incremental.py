@@ -0,0 +1,215 @@
+from email.utils import formatdate
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+import datetime
+import pickle
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+from github2pandas.issues import Issues
+
+from github2pandas_manager import connection_pool
+from github2pandas_manager.data_extractor import Github_data_extractor
+from github2pandas_manager.incremental import Incremental_updater, \
+    UpdatedSinceRepository
+from github2pandas_manager.rate_limit import GOVERNOR, TokenPool
+
+TOKEN = "stub-token"
+SINCE = pd.Timestamp("2021-03-01 12:00", tz="UTC")
+
+
+class StubPaginatedList():
+    """Paginated list stub counting the items requested so far."""
+
+    def __init__(self, items):
+        self.items = items
+        self.requested = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.requested += 1
+            yield item
+
+
+class StubRepository():
+    """PyGithub repository stub recording the arguments of the requests."""
+
+    def __init__(self, items=()):
+        self.list = StubPaginatedList(list(items))
+        self.arguments = {}
+
+    def get_list(self, name, kwargs):
+        self.arguments[name] = kwargs
+        return self.list
+
+    def get_issues(self, *args, **kwargs):
+        return self.get_list("get_issues", kwargs)
+
+    def get_pulls(self, *args, **kwargs):
+        return self.get_list("get_pulls", kwargs)
+
+    def get_workflow_runs(self, *args, **kwargs):
+        return self.get_list("get_workflow_runs", kwargs)
+
+
+def get_item(number, updated_at, created_at=None):
+    return SimpleNamespace(number=number, updated_at=updated_at,
+                           created_at=created_at or updated_at)
+
+
+class TestUpdatedSinceRepository(unittest.TestCase):
+
+    def test_since_is_passed(self):
+        repo = StubRepository()
+        updated_since_repo = UpdatedSinceRepository(repo, SINCE)
+        updated_since_repo.get_issues(state="all")
+        self.assertEqual(repo.arguments["get_issues"],
+                         {"state": "all",
+                          "since": datetime.datetime(2021, 3, 1, 12)})
+        # github2pandas continues long lists with a later since
+        later = datetime.datetime(2021, 3, 2)
+        updated_since_repo.get_issues(state="all", since=later)
+        self.assertEqual(repo.arguments["get_issues"]["since"], later)
+        updated_since_repo.get_issues(since=datetime.datetime(2021, 1, 1))
+        self.assertEqual(repo.arguments["get_issues"]["since"],
+                         datetime.datetime(2021, 3, 1, 12))
+
+    def test_pulls_are_truncated(self):
+        repo = StubRepository([
+            get_item(3, datetime.datetime(2021, 3, 3)),
+            get_item(1, datetime.datetime(2021, 3, 1, 12)),
+            get_item(2, datetime.datetime(2021, 3, 1, 11)),
+            get_item(4, datetime.datetime(2021, 2, 1)),
+        ])
+        pulls = UpdatedSinceRepository(repo, SINCE).get_pulls(state="all")
+        self.assertEqual([pull.number for pull in pulls], [3, 1])
+        self.assertEqual(pulls.totalCount, 2)
+        self.assertEqual([pull.number for pull in pulls.reversed], [1, 3])
+        # No item is requested after the first older one
+        self.assertEqual(repo.list.requested, 3)
+        self.assertEqual(repo.arguments["get_pulls"], {
+            "state": "all", "sort": "updated", "direction": "desc"})
+
+    def test_workflow_runs_by_creation(self):
+        repo = StubRepository([
+            get_item(3, datetime.datetime(2021, 3, 2),
+                     datetime.datetime(2021, 3, 2)),
+            # Re-run after the last extraction
+            get_item(2, datetime.datetime(2021, 3, 5),
+                     datetime.datetime(2021, 2, 20)),
+            get_item(1, datetime.datetime(2021, 2, 10),
+                     datetime.datetime(2021, 2, 10)),
+            get_item(0, datetime.datetime(2021, 3, 6),
+                     datetime.datetime(2021, 1, 1)),
+        ])
+        runs = UpdatedSinceRepository(repo, SINCE).get_workflow_runs()
+        self.assertEqual([run.number for run in runs], [2, 3])
+        self.assertEqual(repo.list.requested, 4)
+
+
+class TestIncrementalUpdater(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.repo_base_folder = Path(temp_dir.name)
+
+    def test_upsert_keeps_last_rows(self):
+        data_dir = Path(self.repo_base_folder, Issues.Files.DATA_DIR)
+        data_dir.mkdir(parents=True)
+        old_tables = {
+            file_name: pd.DataFrame()
+            for file_name in Incremental_updater.TABLES["Issues"][1]}
+        old_tables[Issues.Files.ISSUES] = pd.DataFrame({
+            "id": [1, 2, None], "title": ["one", "old", "no id"]})
+        new_tables = dict(old_tables, **{
+            Issues.Files.ISSUES: pd.DataFrame({
+                "id": [2, 3, None], "title": ["new", "three", "no id"]})})
+        for file_name, df in new_tables.items():
+            with open(Path(data_dir, file_name), "wb") as f:
+                pickle.dump(df, f)
+        Incremental_updater.upsert_tables(self.repo_base_folder, "Issues",
+                                          old_tables)
+        issues = pd.read_pickle(Path(data_dir, Issues.Files.ISSUES))
+        self.assertEqual(issues["title"].tolist(),
+                         ["one", "no id", "new", "three", "no id"])
+
+    def test_get_since(self):
+        last_extraction = pd.Timestamp("2021-03-01 13:00")
+        since = Incremental_updater.get_since(last_extraction)
+        self.assertEqual(since.tzname(), "UTC")
+        self.assertEqual(
+            since.tz_convert(None) + Incremental_updater.OVERLAP,
+            last_extraction.tz_localize(
+                datetime.datetime.now().astimezone().tzinfo).tz_convert(None))
+
+
+class TestServerTime(unittest.TestCase):
+
+    def tearDown(self):
+        connection_pool.SharedSessionConnection.clock_offset = 0.0
+
+    def test_date_header_sets_clock_offset(self):
+        response = SimpleNamespace(headers={
+            "Date": formatdate(time.time() + 600, usegmt=True)})
+        connection_pool.note_server_time(response)
+        offset = (connection_pool.get_server_now()
+                  - datetime.datetime.now()).total_seconds()
+        self.assertAlmostEqual(offset, 600, delta=2)
+        # Responses without a valid Date header keep the offset
+        connection_pool.note_server_time(SimpleNamespace(headers={}))
+        connection_pool.note_server_time(
+            SimpleNamespace(headers={"Date": "yesterday"}))
+        self.assertAlmostEqual(
+            connection_pool.SharedSessionConnection.clock_offset, 600,
+            delta=2)
+
+
+def fail_issues(github_token, project_folder, repo_full_name, contents,
+                graphql_content=(), graphql_url=None):
+    """Stub of Github_data_extractor.extract_repository, Issues fail."""
+    return [(content_element, RuntimeError("stub error"))
+            if content_element == "Issues" else
+            (content_element, {"started_at": pd.Timestamp("2021-03-02"),
+                               "finished_at": pd.Timestamp("2021-03-02"),
+                               "request_cost": 1})
+            for content_element, _ in contents]
+
+
+class TestAggregationHistory(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.project_folder = temp_dir.name
+
+    def test_failed_tasks_keep_last_extraction(self):
+        GOVERNOR.update(TOKEN, "core", 5000, 5000, time.time() + 3600)
+        output_path = Path(self.project_folder,
+                           Github_data_extractor.AGG_HISTORY_FILE)
+        pd.DataFrame([{"Issues": "2021-03-01 00:00:00",
+                       "Workflows": "2021-03-01 00:00:00",
+                       "repo_name": "owner/repo"}]).to_csv(output_path)
+        parameters = SimpleNamespace(project_folder=self.project_folder,
+                                     content=["Issues", "Workflows"],
+                                     incremental=True)
+        request_handler = SimpleNamespace(
+            request=SimpleNamespace(parameters=parameters),
+            stream_discovery=False,
+            iter_repository_list=lambda: iter(
+                [SimpleNamespace(full_name="owner/repo")]))
+        with mock.patch.object(Github_data_extractor, "extract_repository",
+                               fail_issues):
+            Github_data_extractor.start(TokenPool.from_tokens(TOKEN),
+                                        request_handler)
+        self.assertEqual(
+            Github_data_extractor.get_last_extractions(output_path), {
+                ("owner/repo", "Issues"): pd.Timestamp("2021-03-01"),
+                ("owner/repo", "Workflows"): pd.Timestamp("2021-03-02")})
+
+
+if __name__ == "__main__":
+    unittest.main()
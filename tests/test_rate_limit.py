@@ -0,0 +1,119 @@
+from unittest import mock
+import tempfile
+import time
+import unittest
+
+from github2pandas_manager.data_extractor import Github_data_extractor
+from github2pandas_manager.rate_limit import RateLimitGovernor, TokenPool, \
+    GOVERNOR
+from github2pandas_manager.task_ledger import TaskLedger
+
+TOKEN = "stub-token"
+OTHER_TOKEN = "other-stub-token"
+
+
+class TestRateLimitGovernor(unittest.TestCase):
+
+    def setUp(self):
+        self.governor = RateLimitGovernor()
+
+    def test_reservation_waits_for_reset(self):
+        self.governor.update(TOKEN, "core", 50, 5000, time.time() + 3600)
+        with mock.patch.object(RateLimitGovernor, "_wait") as wait:
+            wait.side_effect = lambda *args: self.governor.update(
+                TOKEN, "core", 5000, 5000, time.time() + 3600)
+            remaining = self.governor.acquire(TOKEN, "core", cost=40,
+                                              min_limit=20)
+        wait.assert_called_once()
+        self.assertEqual(remaining, 4960)
+
+    def test_reservation_larger_than_window(self):
+        # A full bucket grants reservations which never fit into it
+        self.governor.update(TOKEN, "core", 60, 60, time.time() + 3600)
+        with mock.patch.object(RateLimitGovernor, "_wait") as wait:
+            remaining = self.governor.acquire(TOKEN, "core", cost=50,
+                                              min_limit=100)
+        wait.assert_not_called()
+        self.assertEqual(remaining, 10)
+
+    def test_reservation_survives_header_updates(self):
+        self.governor.update(TOKEN, "core", 1000, 5000, time.time() + 3600)
+        self.assertEqual(self.governor._try_acquire(TOKEN, "core", 600, 100),
+                         (400, 0))
+        # The server reports the first request of the reserving task
+        headers = {"X-RateLimit-Remaining": "999",
+                   "X-RateLimit-Limit": "5000",
+                   "X-RateLimit-Reset": str(int(time.time() + 3600))}
+        self.governor.update_from_headers(TOKEN, headers)
+        self.assertEqual(self.governor.get_bucket(TOKEN)["reserved"], 599)
+        # Another task does not fit into the unspent reservation
+        self.assertIsNone(
+            self.governor._try_acquire(TOKEN, "core", 600, 100))
+        self.governor.release(TOKEN, "core", 0)
+        self.assertEqual(self.governor.get_bucket(TOKEN)["reserved"], 0)
+        self.assertIsNotNone(
+            self.governor._try_acquire(TOKEN, "core", 600, 100))
+
+    def test_single_reservations_end_with_the_window(self):
+        self.governor.update(TOKEN, "core", 1000, 5000, time.time() - 1)
+        self.governor.acquire(TOKEN, "core", cost=500)
+        self.assertEqual(self.governor.get_bucket(TOKEN)["reserved"], 0)
+
+    def test_wait_is_never_negative(self):
+        with mock.patch("github2pandas_manager.rate_limit.time.sleep") \
+                as sleep:
+            self.governor._wait("core", -5, show_msg=False)
+        sleep.assert_called_once_with(0)
+
+
+class TestRequestCost(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.project_folder = temp_dir.name
+
+    def test_token_with_budget_for_the_task(self):
+        GOVERNOR.update(TOKEN, "core", 300, 5000, time.time() + 3600)
+        GOVERNOR.update(OTHER_TOKEN, "core", 200, 5000, time.time() + 3600)
+        token_pool = TokenPool([TOKEN, OTHER_TOKEN])
+        self.assertEqual(token_pool.acquire("core", cost=150,
+                                            min_limit=100),
+                         (TOKEN, 150))
+        # Both tokens would drop below the minimum with the next task
+        with mock.patch.object(RateLimitGovernor, "_wait") as wait:
+            wait.side_effect = lambda *args: GOVERNOR.update(
+                OTHER_TOKEN, "core", 5000, 5000, time.time() + 3600)
+            self.assertEqual(token_pool.acquire("core", cost=150,
+                                                min_limit=100),
+                             (OTHER_TOKEN, 4850))
+
+    def test_reserve_releases_unspent_budget(self):
+        token = "reserving-stub-token"
+        GOVERNOR.update(token, "core", 1000, 5000, time.time() + 3600)
+        token_pool = TokenPool([token])
+        with token_pool.reservation("core", cost=300) as (github_token,
+                                                          remaining):
+            self.assertEqual((github_token, remaining), (token, 700))
+            self.assertEqual(GOVERNOR.get_bucket(token)["reserved"], 300)
+        self.assertEqual(GOVERNOR.get_bucket(token)["reserved"], 0)
+
+    def test_recorded_cost_is_reserved(self):
+        ledger = TaskLedger(self.project_folder)
+        ledger.start_run()
+        ledger.record("owner/repo", "Issues", TaskLedger.FINISHED,
+                      request_cost=700)
+        ledger.record("owner/repo", "Issues", TaskLedger.FINISHED,
+                      request_cost=300)
+        ledger.record("owner/repo", "Workflows", TaskLedger.FAILED)
+        request_costs = ledger.get_request_costs()
+        ledger.close()
+        self.assertEqual(request_costs, {("owner/repo", "Issues"): 300})
+        task = ("owner/repo", [("Issues", None), ("Workflows", None)])
+        self.assertEqual(
+            Github_data_extractor.get_request_cost(request_costs, task),
+            300 + Github_data_extractor.DEFAULT_REQUEST_COST)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+import json
+import re
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from github2pandas_manager.discovery_cache import RepositoryDescriptor
+from github2pandas_manager.repository_handler import RequestHandler, \
+    RepositoriesByRepoNames, RepositoriesByQuery, CombinedRequestHandler
+
+TOKEN = "stub-token"
+
+
+class StubResolution():
+    """Stub of RepositoriesByRepoNames.resolve_repository, names in
+    `missing` can not be resolved."""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.resolved = []
+
+    def __call__(self, handler, repo_name):
+        self.resolved.append(repo_name)
+        if repo_name in self.missing:
+            handler.record_failure(repo_name, "repository does not exist")
+            return None
+        return RepositoryDescriptor(abs(hash(repo_name)), repo_name,
+                                    repo_name.split("/")[1])
+
+
+class TestDiscoveryCache(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.project_folder = temp_dir.name
+
+    def discover(self, resolution, repos_names=("a/one", "b/two",
+                                                 "c/three")):
+        parameters = SimpleNamespace(project_folder=self.project_folder,
+                                     repos_names=list(repos_names))
+        # Functions are bound to the handler, unlike callable objects
+        with mock.patch.object(RepositoriesByRepoNames, "resolve_repository",
+                               lambda handler, repo_name:
+                               resolution(handler, repo_name)):
+            return RepositoriesByRepoNames(
+                TOKEN, SimpleNamespace(parameters=parameters))
+
+    def test_only_failed_names_are_resolved_again(self):
+        resolution = StubResolution(missing=["b/two"])
+        handler = self.discover(resolution)
+        self.assertEqual([repo.full_name for repo in handler.repository_list],
+                         ["a/one", "c/three"])
+        failures_path = Path(self.project_folder,
+                             RequestHandler.DISCOVERY_FAILURES_FILE)
+        self.assertTrue(failures_path.is_file())
+        with open(handler.discovery_cache.path) as f:
+            manifest = json.load(f)
+        self.assertEqual(list(manifest["failed_names"]), ["b/two"])
+
+        resolution = StubResolution()
+        handler = self.discover(resolution)
+        self.assertEqual(resolution.resolved, ["b/two"])
+        self.assertEqual([repo.full_name for repo in handler.repository_list],
+                         ["a/one", "c/three", "b/two"])
+        self.assertFalse(failures_path.is_file())
+        with open(handler.discovery_cache.path) as f:
+            updated_manifest = json.load(f)
+        self.assertEqual(updated_manifest["failed_names"], {})
+        # The time to live still starts at the first discovery
+        self.assertEqual(updated_manifest["created_at"],
+                         manifest["created_at"])
+
+        resolution = StubResolution()
+        self.discover(resolution)
+        self.assertEqual(resolution.resolved, [])
+
+    def test_selections_have_their_own_manifest(self):
+        self.discover(StubResolution())
+        resolution = StubResolution()
+        handler = self.discover(resolution, ["a/one"])
+        self.assertEqual(resolution.resolved, ["a/one"])
+        self.assertIsInstance(handler.repository_list[0],
+                              RepositoryDescriptor)
+
+
+def stub_handler_type(repositories, stream_discovery=False):
+    """Returns a request handler class discovering the given descriptors,
+    without mandatory parameters the factory never selects it."""
+
+    class StubHandler(RequestHandler):
+
+        def __init__(self, github_token, request_params):
+            super().__init__(github_token, request_params)
+            self.stream_discovery = stream_discovery
+            self.iterated = []
+            if not stream_discovery:
+                self.generate_repository_list()
+
+        def get_repository_list(self):
+            return self.repository_list
+
+        def generate_repository_list(self):
+            for repo in repositories:
+                self.add_repository(repo)
+
+        def iter_repository_list(self):
+            if not self.stream_discovery:
+                yield from self.repository_list
+                return
+            for repo in repositories:
+                self.iterated.append(repo.full_name)
+                if self.add_repository(repo):
+                    yield repo
+
+    return StubHandler
+
+
+class TestDeduplication(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.parameters = SimpleNamespace(project_folder=temp_dir.name,
+                                          discovery_ttl_hours=0)
+
+    def test_renamed_repositories_are_listed_once(self):
+        # Both names resolve to the same repository
+        ids = {"old-owner/tool": 1, "new-owner/tool": 1, "b/two": 2}
+        self.parameters.repos_names = list(ids)
+        with mock.patch.object(
+                RepositoriesByRepoNames, "resolve_repository",
+                lambda handler, repo_name: RepositoryDescriptor(
+                    ids[repo_name], repo_name, repo_name.split("/")[1])):
+            handler = RepositoriesByRepoNames(
+                TOKEN, SimpleNamespace(parameters=self.parameters))
+        self.assertEqual([repo.full_name for repo in handler.repository_list],
+                         ["old-owner/tool", "b/two"])
+        self.assertEqual(handler.repository_ids, {1, 2})
+        self.assertFalse(handler.add_repository(
+            RepositoryDescriptor(2, "c/two", "two")))
+
+    def test_overlapping_handlers(self):
+        first = [RepositoryDescriptor(1, "a/one", "one"),
+                 RepositoryDescriptor(2, "b/two", "two")]
+        # A renamed repository and an overlap with the first handler
+        second = [RepositoryDescriptor(2, "b/renamed", "renamed"),
+                  RepositoryDescriptor(3, "c/three", "three"),
+                  RepositoryDescriptor(1, "a/one", "one")]
+        for stream_discovery in (False, True):
+            with self.subTest(stream_discovery=stream_discovery):
+                handler = CombinedRequestHandler(
+                    TOKEN, SimpleNamespace(parameters=self.parameters),
+                    [stub_handler_type(first),
+                     stub_handler_type(second, stream_discovery)])
+                self.assertEqual(handler.stream_discovery, stream_discovery)
+                expected = ["a/one", "b/two", "c/three"]
+                self.assertEqual(
+                    [repo.full_name
+                     for repo in handler.iter_repository_list()], expected)
+                self.assertEqual(
+                    [repo.full_name for repo in handler.repository_list],
+                    expected)
+                # A second iteration does not discover again
+                self.assertEqual(
+                    [repo.full_name
+                     for repo in handler.iter_repository_list()], expected)
+                if stream_discovery:
+                    self.assertEqual(handler.handlers[1].iterated,
+                                     ["b/renamed", "c/three", "a/one"])
+
+
+class StubSearch():
+    """Stub of RepositoriesByQuery.search_repositories counting the
+    creation times within the created qualifier, both of its dates are
+    included like in the GitHub search."""
+
+    def __init__(self, created_at):
+        self.created_at = pd.Series(sorted(created_at))
+
+    def count(self, left, right):
+        return int(((self.created_at >= left) &
+                    (self.created_at <= right)).sum())
+
+    def __call__(self, handler, query, min_limit=1, all_pages=False):
+        left, right = re.search(r"created:(\S+)\.\.(\S+)", query).groups()
+        return SimpleNamespace(totalCount=self.count(pd.Timestamp(left),
+                                                     pd.Timestamp(right)))
+
+
+class TestTimeSlotBisection(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.project_folder = temp_dir.name
+
+    def test_slots_are_contiguous_and_not_over_full(self):
+        start = pd.Timestamp("2020-01-01")
+        end = pd.Timestamp("2020-01-11")
+        random = np.random.default_rng(0)
+        seconds = random.integers(0, int((end - start).total_seconds()),
+                                  9000)
+        created_at = [start + pd.Timedelta(seconds=int(second))
+                      for second in seconds]
+        # Repositories created on the boundaries of possible slots
+        created_at += [start + pd.Timedelta(hours=hours)
+                       for hours in (1, 24, 60, 120, 200)]
+        search = StubSearch(created_at)
+        parameters = SimpleNamespace(project_folder=self.project_folder,
+                                     stream_discovery=True,
+                                     discovery_ttl_hours=0)
+        handler = RepositoriesByQuery(TOKEN,
+                                      SimpleNamespace(parameters=parameters))
+        interval = pd.Interval(start, end, closed="left")
+        with mock.patch.object(RepositoriesByQuery, "search_repositories",
+                               lambda handler, query, **kwargs:
+                               search(handler, query, **kwargs)):
+            slots = list(handler._bisect_time_slot(
+                "Python", ">0", interval,
+                search.count(start, end - pd.Timedelta(seconds=1))))
+        self.assertEqual(slots, handler.get_time_slot_list())
+        self.assertEqual(slots[0].left, start)
+        self.assertEqual(slots[-1].right, end)
+        for slot, next_slot in zip(slots, slots[1:]):
+            self.assertEqual(slot.right, next_slot.left)
+        # The first split is in the middle of the interval
+        self.assertIn(start + pd.Timedelta(hours=120),
+                      [slot.left for slot in slots])
+        counts = []
+        for slot in slots:
+            query = handler.generate_slot_query("Python", ">0", slot)
+            counts.append(search(handler, query).totalCount)
+        self.assertTrue(all(count < RepositoriesByQuery.SEARCH_RESULT_LIMIT
+                            for count in counts))
+        # Every repository is found in exactly one slot
+        self.assertEqual(sum(counts), len(created_at))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+from unittest import mock
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+
+from github2pandas_manager.data_extractor import Github_data_extractor
+from github2pandas_manager.rate_limit import GOVERNOR, TokenPool
+from github2pandas_manager.task_ledger import TaskLedger
+
+TOKEN = "stub-token"
+REPOSITORIES = ["owner/one", "owner/two", "owner/three"]
+
+
+class StubExtraction():
+    """Stub of Github_data_extractor.extract_repository recording the
+    extracted repositories, the run is interrupted at `interrupt_at`."""
+
+    def __init__(self, interrupt_at=None):
+        self.interrupt_at = interrupt_at
+        self.extracted = []
+
+    def __call__(self, github_token, project_folder, repo_full_name,
+                 contents, graphql_content=(), graphql_url=None):
+        if repo_full_name == self.interrupt_at:
+            raise KeyboardInterrupt()
+        self.extracted.append(repo_full_name)
+        return [(content_element, {
+                    "started_at": pd.Timestamp.now(),
+                    "finished_at": pd.Timestamp.now(),
+                    "request_cost": 1})
+                for content_element, _ in contents]
+
+
+class TestTaskLedger(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.project_folder = temp_dir.name
+        GOVERNOR.update(TOKEN, "core", 5000, 5000, time.time() + 3600)
+
+    def test_resume_interrupted_run(self):
+        ledger = TaskLedger(self.project_folder)
+        self.assertFalse(ledger.start_run(resume=True))
+        ledger.record("owner/one", "Issues", TaskLedger.FINISHED,
+                      started_at=pd.Timestamp("2026-01-01 10:00"))
+        ledger.record("owner/two", "Issues", TaskLedger.FAILED,
+                      message="error")
+        ledger.close()
+
+        ledger = TaskLedger(self.project_folder)
+        self.assertTrue(ledger.start_run(resume=True))
+        self.assertEqual(ledger.get_finished_tasks(), {
+            ("owner/one", "Issues"): pd.Timestamp("2026-01-01 10:00")})
+        ledger.record("owner/two", "Issues", TaskLedger.FINISHED)
+        ledger.finish_run()
+        ledger.close()
+
+        ledger = TaskLedger(self.project_folder)
+        self.assertFalse(ledger.start_run(resume=True))
+        self.assertEqual(ledger.get_finished_tasks(), {})
+        ledger.close()
+
+    def test_new_run_ignores_previous_tasks(self):
+        ledger = TaskLedger(self.project_folder)
+        ledger.start_run()
+        ledger.record("owner/one", "Issues", TaskLedger.FINISHED)
+        ledger.close()
+        ledger = TaskLedger(self.project_folder)
+        self.assertFalse(ledger.start_run(resume=False))
+        self.assertEqual(ledger.get_finished_tasks(), {})
+        ledger.close()
+
+    def start(self, extraction, resume):
+        parameters = SimpleNamespace(project_folder=self.project_folder,
+                                     content=["Issues"])
+        request_handler = SimpleNamespace(
+            request=SimpleNamespace(parameters=parameters),
+            stream_discovery=False,
+            iter_repository_list=lambda: iter(
+                [SimpleNamespace(full_name=full_name)
+                 for full_name in REPOSITORIES]))
+        with mock.patch.object(Github_data_extractor, "extract_repository",
+                               extraction):
+            Github_data_extractor.start(TokenPool.from_tokens(TOKEN),
+                                        request_handler, resume=resume)
+
+    def test_resume_through_extractor(self):
+        extraction = StubExtraction(interrupt_at="owner/two")
+        with self.assertRaises(KeyboardInterrupt):
+            self.start(extraction, resume=False)
+        self.assertEqual(extraction.extracted, ["owner/one"])
+
+        extraction = StubExtraction()
+        self.start(extraction, resume=True)
+        self.assertEqual(extraction.extracted, ["owner/two", "owner/three"])
+
+        # The last run finished, a resume extracts everything again
+        extraction = StubExtraction()
+        self.start(extraction, resume=True)
+        self.assertEqual(extraction.extracted, REPOSITORIES)
+
+
+if __name__ == "__main__":
+    unittest.main()